@@ -0,0 +1,227 @@
+import sys
+from array import array
+
+import numpy as np
+
+from membresia import Membresia, TIPOS_MEMBRESIA, crear_membresia
+from transiciones import DIAS_REGALO, aplicar_transicion
+
+
+class AlmacenCompacto:
+    """
+    Almacenamiento compacto de membresías en arreglos tipados.
+
+    En lugar de mantener un objeto con su propio ``__dict__`` por suscriptor, el tipo de
+    membresía, los días de regalo y el contador de contenido sin conexión se guardan en
+    arreglos de enteros. La parte local del correo y el número de tarjeta se guardan como
+    bytes UTF-8 en un único búfer con arreglos de posiciones, y los dominios de correo, que
+    se repiten entre millones de suscriptores, se guardan una sola vez como cadenas internadas.
+    Al acceder a un suscriptor se entrega una vista liviana que se comporta como la clase de
+    membresía correspondiente (Gratis, Basica, Familiar, SinConexión o Pro).
+    """
+
+    def __init__(self):
+        """
+        Inicializa un almacén vacío.
+        """
+        self._tipos = array("b")
+        self._dias_regalo = array("H")
+        self._contenido_sin_conexion = array("I")
+        self._textos = bytearray()
+        self._inicios = array("Q")
+        self._largos_correo = array("H")
+        self._largos_tarjeta = array("B")
+        self._dominios = array("I")
+        self._tabla_dominios = []
+        self._codigos_dominio = {}
+
+    def __len__(self):
+        return len(self._tipos)
+
+    def agregar(self, membresia: Membresia) -> int:
+        """
+        Agrega una membresía al almacén.
+
+        Args:
+            membresia (Membresia): Membresía a almacenar.
+
+        Returns:
+            int: Índice asignado dentro del almacén.
+        """
+        self._tipos.append(membresia._codigo)
+        self._dias_regalo.append(getattr(membresia, "_dias_regalo", 0))
+        self._contenido_sin_conexion.append(getattr(membresia, "_contenido_sin_conexion", 0))
+        self._inicios.append(0)
+        self._largos_correo.append(0)
+        self._largos_tarjeta.append(0)
+        self._dominios.append(0)
+        indice = len(self._tipos) - 1
+        self._guardar_textos(indice, membresia.correo, membresia.numero_tarjeta)
+        return indice
+
+    def reemplazar(self, indice: int, membresia: Membresia):
+        """
+        Reemplaza la membresía almacenada en un índice.
+
+        Args:
+            indice (int): Índice de la membresía a reemplazar.
+            membresia (Membresia): Nueva membresía.
+        """
+        self._tipos[indice] = membresia._codigo
+        self._dias_regalo[indice] = getattr(membresia, "_dias_regalo", 0)
+        self._contenido_sin_conexion[indice] = getattr(membresia, "_contenido_sin_conexion", 0)
+        if membresia.correo != self._correo(indice) or membresia.numero_tarjeta != self._tarjeta(indice):
+            # Los bytes anteriores quedan sin uso en el búfer; los cambios de membresía
+            # conservan correo y tarjeta, por lo que esto solo ocurre al corregir datos
+            self._guardar_textos(indice, membresia.correo, membresia.numero_tarjeta)
+
+    def _guardar_textos(self, indice, correo, numero_tarjeta):
+        local, arroba, dominio = correo.rpartition("@")
+        if not arroba:
+            local, dominio = dominio, ""
+        codigo_dominio = self._codigos_dominio.get(dominio)
+        if codigo_dominio is None:
+            codigo_dominio = len(self._tabla_dominios)
+            self._tabla_dominios.append(sys.intern(dominio))
+            self._codigos_dominio[dominio] = codigo_dominio
+
+        local = local.encode("utf-8")
+        tarjeta = numero_tarjeta.encode("utf-8")
+        self._inicios[indice] = len(self._textos)
+        self._largos_correo[indice] = len(local)
+        self._largos_tarjeta[indice] = len(tarjeta)
+        self._dominios[indice] = codigo_dominio
+        self._textos += local
+        self._textos += tarjeta
+
+    def _correo(self, indice):
+        inicio = self._inicios[indice]
+        local = self._textos[inicio:inicio + self._largos_correo[indice]].decode("utf-8")
+        dominio = self._tabla_dominios[self._dominios[indice]]
+        return f"{local}@{dominio}" if dominio else local
+
+    def _tarjeta(self, indice):
+        inicio = self._inicios[indice] + self._largos_correo[indice]
+        return self._textos[inicio:inicio + self._largos_tarjeta[indice]].decode("utf-8")
+
+    def obtener(self, indice: int) -> Membresia:
+        """
+        Devuelve una vista de la membresía almacenada en un índice.
+
+        Args:
+            indice (int): Índice de la membresía.
+
+        Returns:
+            Membresia: Vista que se comporta como la clase de membresía almacenada. Las
+                       modificaciones de sus contadores se escriben directamente en el almacén.
+        """
+        return _VISTAS[self._tipos[indice]](self, indice)
+
+    def cambiar_membresia(self, indice: int, tipo_membresia: int) -> Membresia:
+        """
+        Aplica un cambio de membresía según las reglas de la membresía almacenada.
+
+        Args:
+            indice (int): Índice de la membresía.
+            tipo_membresia (int): Identificador numérico del tipo de membresía deseado.
+
+        Returns:
+            Membresia: Vista de la membresía resultante.
+        """
+        vista = self.obtener(indice)
+        nueva_membresia = vista.cambiar_membresia(tipo_membresia)
+        if nueva_membresia is not vista:
+            self.reemplazar(indice, nueva_membresia)
+        return self.obtener(indice)
+
+    def aplicar_transicion(self, tipo_destino: int, tipo_origen: int = None) -> int:
+        """
+        Aplica un cambio de membresía a todo el almacén de una vez, sin crear objetos.
+
+        Los suscriptores cuyo cambio es aceptado reciben los días de regalo del nuevo tipo y
+        su contador de contenido sin conexión vuelve a cero, igual que al crear la nueva
+        membresía con cambiar_membresia.
+
+        Args:
+            tipo_destino (int): Tipo de membresía solicitado.
+            tipo_origen (int, optional): Si se indica, solo se consideran los suscriptores de este tipo.
+
+        Returns:
+            int: Cantidad de suscriptores cuyo cambio fue aceptado.
+        """
+        # Las vistas de numpy se liberan al terminar, porque un array con búferes
+        # exportados no puede crecer
+        tipos = np.frombuffer(self._tipos, dtype=np.int8)
+        dias_regalo = np.frombuffer(self._dias_regalo, dtype=np.uint16)
+        contenido = np.frombuffer(self._contenido_sin_conexion, dtype=np.uint32)
+        try:
+            nuevos, aceptados, _ = aplicar_transicion(tipos, tipo_destino)
+            if tipo_origen is not None:
+                aceptados &= tipos == tipo_origen
+            tipos[aceptados] = nuevos[aceptados]
+            dias_regalo[aceptados] = DIAS_REGALO[nuevos[aceptados]]
+            contenido[aceptados] = 0
+            return int(np.count_nonzero(aceptados))
+        finally:
+            del tipos, dias_regalo, contenido
+
+
+def _campo_texto(lector):
+    """Crea una propiedad de solo lectura que decodifica un texto del almacén."""
+    return property(lambda self: lector(self._almacen, self._indice))
+
+
+def _campo_arreglo(nombre_arreglo):
+    """Crea una propiedad que lee y escribe un arreglo del almacén en la posición de la vista."""
+    def leer(self):
+        return getattr(self._almacen, nombre_arreglo)[self._indice]
+
+    def escribir(self, valor):
+        getattr(self._almacen, nombre_arreglo)[self._indice] = valor
+
+    return property(leer, escribir)
+
+
+def _crear_vista(clase):
+    """Crea la clase de vista para un tipo de membresía."""
+    ejemplo = clase("", "")
+
+    def __init__(self, almacen, indice):
+        self._almacen = almacen
+        self._indice = indice
+
+    def materializar(self):
+        """
+        Crea una membresía independiente del almacén con el estado actual de la vista.
+        """
+        membresia = clase(self._correo, self._numero_tarjeta)
+        if hasattr(ejemplo, "_dias_regalo"):
+            membresia._dias_regalo = self._dias_regalo
+        if hasattr(ejemplo, "_contenido_sin_conexion"):
+            membresia._contenido_sin_conexion = self._contenido_sin_conexion
+        return membresia
+
+    def __reduce_ex__(self, protocolo):
+        # Se serializa como la membresía original, sin referencia al almacén
+        membresia = materializar(self)
+        return crear_membresia, (clase._codigo, membresia.correo, membresia.numero_tarjeta), membresia.__dict__
+
+    atributos = {
+        "__slots__": ("_almacen", "_indice"),
+        "__init__": __init__,
+        "__reduce_ex__": __reduce_ex__,
+        "__module__": __name__,
+        "materializar": materializar,
+        "_correo": _campo_texto(AlmacenCompacto._correo),
+        "_numero_tarjeta": _campo_texto(AlmacenCompacto._tarjeta),
+    }
+    if hasattr(ejemplo, "_dias_regalo"):
+        atributos["_dias_regalo"] = _campo_arreglo("_dias_regalo")
+    if hasattr(ejemplo, "_contenido_sin_conexion"):
+        atributos["_contenido_sin_conexion"] = _campo_arreglo("_contenido_sin_conexion")
+
+    # La vista conserva el nombre de la clase para que type(membresia).__name__ no cambie
+    return type(clase.__name__, (clase,), atributos)
+
+
+_VISTAS = {codigo: _crear_vista(clase) for codigo, clase in TIPOS_MEMBRESIA.items()}
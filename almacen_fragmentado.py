@@ -0,0 +1,230 @@
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from formato_registros import codificar_filas, decodificar_filas
+from registro_clientes import RegistroClientes, fila_cliente
+
+VERSION_FRAGMENTOS = 1
+NOMBRE_MANIFIESTO = "manifiesto.json"
+
+
+def fragmento_de(correo: str, fragmentos: int) -> int:
+    """
+    Calcula el fragmento al que pertenece un correo.
+
+    Se usa un hash estable (BLAKE2b) en lugar de hash(), que varía entre ejecuciones.
+
+    Args:
+        correo (str): Correo electrónico del cliente.
+        fragmentos (int): Cantidad total de fragmentos.
+
+    Returns:
+        int: Número de fragmento, entre 0 y fragmentos - 1.
+    """
+    resumen = hashlib.blake2b(correo.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(resumen, "big") % fragmentos
+
+
+def _leer_fragmento(ruta):
+    """Lee y decodifica un archivo de fragmento. Se ejecuta en un proceso del grupo."""
+    if not os.path.exists(ruta):
+        raise ValueError(f"Falta el fragmento {ruta}.")
+    with open(ruta, "rb") as archivo:
+        return decodificar_filas(archivo.read())[0]
+
+
+def _escribir_archivo(ruta, contenido):
+    """Escribe un archivo en forma atómica (temporal + reemplazo) y lo sincroniza a disco."""
+    temporal = ruta + ".tmp"
+    with open(temporal, "wb") as archivo:
+        archivo.write(contenido)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(temporal, ruta)
+
+
+class AlmacenFragmentado:
+    """
+    Almacenamiento del registro de clientes repartido en N archivos según un hash del correo.
+
+    Cada fragmento es un archivo independiente con las filas (ver fila_cliente) de sus
+    clientes, en el formato binario de formato_registros. Al cargar, los fragmentos se decodifican en paralelo en un grupo de procesos.
+    Como oyente del registro, el almacén marca como modificado el fragmento de cada cliente
+    que cambia, y guardar() reescribe solo esos fragmentos, por lo que el costo de guardar
+    es proporcional a la porción modificada de los datos y no al total.
+    """
+
+    def __init__(self, carpeta: str = "datos_clientes", fragmentos: int = 16, trabajadores: int = None):
+        """
+        Inicializa el almacén.
+
+        Args:
+            carpeta (str): Carpeta donde se guardan los fragmentos y el manifiesto.
+            fragmentos (int): Cantidad de fragmentos. Si la carpeta ya tiene datos, se usa la
+                              cantidad registrada en su manifiesto.
+            trabajadores (int, optional): Procesos usados para cargar. Por defecto, uno por núcleo.
+        """
+        self._carpeta = carpeta
+        self._fragmentos = fragmentos
+        self._trabajadores = trabajadores or os.cpu_count() or 1
+        self._registro = None
+        self._ids_por_fragmento = [set() for _ in range(fragmentos)]
+        self._modificados = set()
+        self._leer_manifiesto()
+
+    @property
+    def registro(self) -> RegistroClientes:
+        """
+        Devuelve el registro asociado al almacén.
+        """
+        return self._registro
+
+    @property
+    def fragmentos(self) -> int:
+        """
+        Devuelve la cantidad de fragmentos del almacén.
+        """
+        return self._fragmentos
+
+    @property
+    def modificados(self) -> set:
+        """
+        Devuelve los números de los fragmentos con cambios sin guardar.
+        """
+        return set(self._modificados)
+
+    def _ruta(self, fragmento):
+        return os.path.join(self._carpeta, f"fragmento_{fragmento:04d}.dat")
+
+    def _leer_manifiesto(self):
+        ruta = os.path.join(self._carpeta, NOMBRE_MANIFIESTO)
+        if not os.path.exists(ruta):
+            return
+        with open(ruta, encoding="utf-8") as archivo:
+            manifiesto = json.load(archivo)
+        if manifiesto.get("version") != VERSION_FRAGMENTOS:
+            raise ValueError(f"Versión de manifiesto no soportada: {manifiesto.get('version')}")
+        self._fragmentos = manifiesto["fragmentos"]
+        self._ids_por_fragmento = [set() for _ in range(self._fragmentos)]
+
+    def _escribir_manifiesto(self):
+        os.makedirs(self._carpeta, exist_ok=True)
+        contenido = json.dumps({"version": VERSION_FRAGMENTOS, "fragmentos": self._fragmentos}).encode("utf-8")
+        _escribir_archivo(os.path.join(self._carpeta, NOMBRE_MANIFIESTO), contenido)
+
+    def cargar(self) -> RegistroClientes:
+        """
+        Carga todos los fragmentos en paralelo y comienza a registrar los cambios.
+
+        Returns:
+            RegistroClientes: Registro con todos los clientes, ordenados por identificador.
+        """
+        if not os.path.exists(os.path.join(self._carpeta, NOMBRE_MANIFIESTO)):
+            # Almacén nuevo: todavía no se escribió ningún fragmento
+            registro = RegistroClientes()
+            self._suscribir(registro)
+            return registro
+        rutas = [self._ruta(fragmento) for fragmento in range(self._fragmentos)]
+        trabajadores = min(self._trabajadores, self._fragmentos)
+        if trabajadores > 1:
+            with ProcessPoolExecutor(max_workers=trabajadores) as grupo:
+                por_fragmento = list(grupo.map(_leer_fragmento, rutas))
+        else:
+            por_fragmento = [_leer_fragmento(ruta) for ruta in rutas]
+
+        filas = []
+        for fragmento, filas_fragmento in enumerate(por_fragmento):
+            self._ids_por_fragmento[fragmento] = {fila[0] for fila in filas_fragmento}
+            filas.extend(filas_fragmento)
+        filas.sort(key=lambda fila: fila[0])
+
+        registro = RegistroClientes.desde_filas(filas)
+        self._modificados.clear()
+        self._suscribir(registro)
+        return registro
+
+    def conectar(self, registro: RegistroClientes):
+        """
+        Asocia al almacén un registro ya cargado en memoria y marca todos los fragmentos
+        como modificados, de modo que el siguiente guardar() escriba el registro completo.
+
+        Args:
+            registro (RegistroClientes): Registro a almacenar.
+        """
+        self._ids_por_fragmento = [set() for _ in range(self._fragmentos)]
+        for id_cliente, _, membresia in itertools.chain(registro.activos(), registro.inactivos()):
+            self._ids_por_fragmento[fragmento_de(membresia.correo, self._fragmentos)].add(id_cliente)
+        self._modificados = set(range(self._fragmentos))
+        self._suscribir(registro)
+
+    def _suscribir(self, registro):
+        if self._registro is not None:
+            self._registro.desuscribir(self.registrar_evento)
+        self._registro = registro
+        registro.suscribir(self.registrar_evento)
+
+    def registrar_evento(self, operacion, id_cliente, nombre, anterior, nueva):
+        """
+        Marca como modificado el fragmento del cliente afectado. Se usa como oyente del registro.
+
+        Args:
+            operacion (str): "registrar", "cambiar", "cancelar" o "reactivar".
+            id_cliente (int): Identificador del cliente modificado.
+            nombre (str): Nombre del cliente.
+            anterior (Membresia): Membresía previa (None al registrar).
+            nueva (Membresia): Membresía resultante.
+        """
+        fragmento = fragmento_de(nueva.correo, self._fragmentos)
+        if operacion == "registrar":
+            self._ids_por_fragmento[fragmento].add(id_cliente)
+        self._modificados.add(fragmento)
+
+    def guardar(self) -> int:
+        """
+        Reescribe los fragmentos modificados desde la última carga o guardado.
+
+        Cada fragmento se serializa en este proceso y se escribe en forma atómica; las
+        escrituras y sincronizaciones a disco se hacen en paralelo.
+
+        Returns:
+            int: Cantidad de fragmentos escritos.
+        """
+        if not self._modificados:
+            return 0
+        os.makedirs(self._carpeta, exist_ok=True)
+        nuevo = not os.path.exists(os.path.join(self._carpeta, NOMBRE_MANIFIESTO))
+        if nuevo:
+            # Se escriben todos los fragmentos, también los vacíos, para que con el manifiesto
+            # presente la falta de un fragmento indique datos perdidos
+            self._modificados.update(range(self._fragmentos))
+
+        registro = self._registro
+        modificados = sorted(self._modificados)
+        with ThreadPoolExecutor(max_workers=min(self._trabajadores, len(modificados))) as grupo:
+            escrituras = []
+            for fragmento in modificados:
+                filas = []
+                for id_cliente in sorted(self._ids_por_fragmento[fragmento]):
+                    nombre, membresia = registro.obtener(id_cliente)
+                    filas.append(fila_cliente(id_cliente, nombre, membresia, registro.esta_activo(id_cliente)))
+                contenido = codificar_filas(filas)
+                escrituras.append(grupo.submit(_escribir_archivo, self._ruta(fragmento), contenido))
+            for escritura in escrituras:
+                escritura.result()
+        if nuevo:
+            self._escribir_manifiesto()
+        self._modificados.clear()
+        return len(modificados)
+
+    def cerrar(self):
+        """
+        Guarda los fragmentos pendientes y deja de seguir los cambios del registro.
+        """
+        if self._registro is None:
+            return
+        self.guardar()
+        self._registro.desuscribir(self.registrar_evento)
+        self._registro = None
@@ -0,0 +1,550 @@
+import collections
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+
+from boveda_tarjetas import es_token
+from membresia import Membresia
+from registro_clientes import cliente_desde_fila, fila_cliente
+
+MAGIA = b"SMRM"
+VERSION_MAPEADO = 2
+# Cabecera: magia, versión, marcas, cantidad de clientes, activos, ranuras del índice de
+# correos, mayor identificador, posición del índice de correos, posición del índice de
+# identificadores. La versión 1 no tiene el byte de marcas.
+_CABECERA = struct.Struct("<4sBBQQQQQQ")
+_CABECERA_V1 = struct.Struct("<4sBQQQQQQ")
+# Marca: todas las tarjetas del archivo están tokenizadas
+MARCA_SOLO_TOKENS = 1
+# Registro: identificador, activo, tipo, contenido sin conexión, largos de nombre, correo y tarjeta
+_REGISTRO = struct.Struct("<IBBIHHB")
+# Ranura del índice de correos: hash del correo, posición del registro (0 = vacía)
+_RANURA = struct.Struct("<QQ")
+_POSICION = struct.Struct("<Q")
+
+
+def hash_correo(correo: str) -> int:
+    """
+    Calcula el hash estable de 64 bits de un correo usado por el índice.
+
+    Args:
+        correo (str): Correo electrónico.
+
+    Returns:
+        int: Hash del correo.
+    """
+    return int.from_bytes(hashlib.blake2b(correo.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _capacidad_indice(cantidad):
+    """Potencia de dos que mantiene el índice de correos a lo sumo al 75% de ocupación."""
+    capacidad = 8
+    while capacidad * 3 < cantidad * 4:
+        capacidad *= 2
+    return capacidad
+
+
+def escribir_mapeado(ruta: str, filas):
+    """
+    Escribe un archivo en el formato del almacén mapeado.
+
+    El archivo se escribe en una ruta temporal y luego reemplaza al anterior, de modo que
+    una interrupción nunca deja un archivo a medio escribir. La cabecera indica si todas
+    las tarjetas están tokenizadas, para no tener que recorrerlas al abrir el archivo.
+
+    Args:
+        ruta (str): Archivo de destino.
+        filas (iterable): Tuplas generadas por fila_cliente.
+    """
+    posiciones = {}
+    hashes = {}
+    activos = 0
+    solo_tokens = True
+    temporal = ruta + ".tmp"
+    with open(temporal, "wb") as archivo:
+        archivo.write(bytes(_CABECERA.size))
+        posicion = _CABECERA.size
+        for id_cliente, nombre, correo, numero_tarjeta, tipo, activo, contenido in filas:
+            datos_nombre = nombre.encode("utf-8")
+            datos_correo = correo.encode("utf-8")
+            datos_tarjeta = numero_tarjeta.encode("utf-8")
+            registro = _REGISTRO.pack(id_cliente, activo, tipo, contenido, len(datos_nombre), len(datos_correo),
+                                      len(datos_tarjeta))
+            archivo.write(registro + datos_nombre + datos_correo + datos_tarjeta)
+            posiciones[id_cliente] = posicion
+            hashes[id_cliente] = hash_correo(correo)
+            activos += bool(activo)
+            solo_tokens = solo_tokens and es_token(numero_tarjeta)
+            posicion += len(registro) + len(datos_nombre) + len(datos_correo) + len(datos_tarjeta)
+
+        # Índice de correos: tabla hash de direccionamiento abierto con sondeo lineal
+        capacidad = _capacidad_indice(len(posiciones))
+        ranuras = array("Q", bytes(16 * capacidad))
+        mascara = capacidad - 1
+        for id_cliente, posicion_registro in posiciones.items():
+            ranura = hashes[id_cliente] & mascara
+            while ranuras[2 * ranura + 1]:
+                ranura = (ranura + 1) & mascara
+            ranuras[2 * ranura] = hashes[id_cliente]
+            ranuras[2 * ranura + 1] = posicion_registro
+        posicion_indice_correos = posicion
+        archivo.write(ranuras.tobytes())
+
+        # Índice de identificadores: arreglo denso de posiciones
+        mayor_id = max(posiciones, default=0)
+        por_id = array("Q", bytes(8 * (mayor_id + 1)))
+        for id_cliente, posicion_registro in posiciones.items():
+            por_id[id_cliente] = posicion_registro
+        posicion_indice_ids = posicion_indice_correos + len(ranuras) * ranuras.itemsize
+        archivo.write(por_id.tobytes())
+
+        archivo.seek(0)
+        archivo.write(_CABECERA.pack(MAGIA, VERSION_MAPEADO, MARCA_SOLO_TOKENS if solo_tokens else 0,
+                                     len(posiciones), activos, capacidad, mayor_id, posicion_indice_correos,
+                                     posicion_indice_ids))
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(temporal, ruta)
+
+
+class AlmacenMapeado:
+    """
+    Registro de clientes respaldado por un archivo mapeado en memoria (mmap).
+
+    Al abrirlo solo se lee la cabecera, por lo que el costo de inicio no depende de la
+    cantidad de clientes. Los índices de ancho fijo (hash del correo → posición e
+    identificador → posición) se consultan directamente sobre el archivo, y cada registro
+    se decodifica recién cuando se accede a él. Las membresías decodificadas se guardan en
+    una caché LRU acotada, de modo que la memoria usada es proporcional a los clientes
+    consultados y no al total.
+
+    Ofrece las mismas operaciones que RegistroClientes. Los cambios se mantienen en memoria
+    hasta llamar a guardar(), que reescribe el archivo. Las membresías deben modificarse a
+    través de estas operaciones: los cambios hechos directamente sobre un objeto de la caché
+    se pierden cuando se descarta de ella.
+    """
+
+    def __init__(self, ruta: str, max_en_memoria: int = 10000):
+        """
+        Abre el almacén. Si el archivo no existe, se crea vacío.
+
+        Args:
+            ruta (str): Archivo del almacén.
+            max_en_memoria (int): Cantidad máxima de clientes decodificados que se mantienen en caché.
+
+        Raises:
+            ValueError: Si el archivo no tiene el formato esperado.
+        """
+        self._ruta = ruta
+        self._max_en_memoria = max_en_memoria
+        self._cache = collections.OrderedDict()
+        self._oyentes = []
+        self._boveda = None
+        if not os.path.exists(ruta):
+            escribir_mapeado(ruta, [])
+        self._abrir()
+
+    def _abrir(self):
+        self._archivo = open(self._ruta, "rb")
+        self._mapa = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        magia, version = struct.unpack_from("<4sB", self._mapa, 0)
+        if magia != MAGIA or version not in (1, VERSION_MAPEADO):
+            self.cerrar()
+            raise ValueError(f"{self._ruta} no es un almacén mapeado válido (versión {VERSION_MAPEADO}).")
+        if version == 1:
+            # Sin marcas: se desconoce si quedan tarjetas en claro
+            marcas = 0
+            (_, _, self._cantidad_archivo, self._activos_archivo, capacidad, self._mayor_id_archivo,
+             self._indice_correos, self._indice_ids) = _CABECERA_V1.unpack_from(self._mapa, 0)
+        else:
+            (_, _, marcas, self._cantidad_archivo, self._activos_archivo, capacidad, self._mayor_id_archivo,
+             self._indice_correos, self._indice_ids) = _CABECERA.unpack_from(self._mapa, 0)
+        self._solo_tokens = bool(marcas & MARCA_SOLO_TOKENS)
+        self._mascara = capacidad - 1
+        # Clientes modificados o nuevos desde la última escritura: id -> (nombre, membresia, activo)
+        self._cambios = {}
+        self._nuevos_por_correo = {}
+        self._siguiente_id = self._mayor_id_archivo + 1
+        self._cantidad = self._cantidad_archivo
+        self._total_activos = self._activos_archivo
+        self._cache.clear()
+
+    def cerrar(self):
+        """
+        Cierra el archivo mapeado, descartando los cambios no guardados.
+        """
+        self._mapa.close()
+        self._archivo.close()
+
+    def guardar(self):
+        """
+        Reescribe el archivo con los cambios pendientes y lo vuelve a abrir.
+        """
+        if not self._cambios:
+            return
+        escribir_mapeado(self._ruta, self.filas())
+        self.cerrar()
+        self._abrir()
+
+    def _posicion(self, id_cliente):
+        if not 0 < id_cliente <= self._mayor_id_archivo:
+            return 0
+        return _POSICION.unpack_from(self._mapa, self._indice_ids + 8 * id_cliente)[0]
+
+    def _leer_fila(self, posicion):
+        """Decodifica el registro guardado en una posición del archivo."""
+        id_cliente, activo, tipo, contenido, largo_nombre, largo_correo, largo_tarjeta = \
+            _REGISTRO.unpack_from(self._mapa, posicion)
+        inicio = posicion + _REGISTRO.size
+        fin_nombre = inicio + largo_nombre
+        fin_correo = fin_nombre + largo_correo
+        return (id_cliente, self._mapa[inicio:fin_nombre].decode("utf-8"),
+                self._mapa[fin_nombre:fin_correo].decode("utf-8"),
+                self._mapa[fin_correo:fin_correo + largo_tarjeta].decode("utf-8"), tipo, bool(activo), contenido)
+
+    def _correo_en(self, posicion):
+        _, _, _, _, largo_nombre, largo_correo, _ = _REGISTRO.unpack_from(self._mapa, posicion)
+        inicio = posicion + _REGISTRO.size + largo_nombre
+        return self._mapa[inicio:inicio + largo_correo].decode("utf-8")
+
+    def _cliente(self, id_cliente):
+        """Devuelve (nombre, membresia, activo) decodificando el registro si no está en memoria."""
+        cambio = self._cambios.get(id_cliente)
+        if cambio is not None:
+            return cambio
+        cliente = self._cache.get(id_cliente)
+        if cliente is not None:
+            self._cache.move_to_end(id_cliente)
+            return cliente
+        posicion = self._posicion(id_cliente)
+        if not posicion:
+            raise KeyError(id_cliente)
+        _, nombre, membresia, activo = cliente_desde_fila(self._leer_fila(posicion))
+        cliente = (nombre, membresia, activo)
+        self._cache[id_cliente] = cliente
+        if len(self._cache) > self._max_en_memoria:
+            self._cache.popitem(last=False)
+        return cliente
+
+    def __len__(self):
+        return self._cantidad
+
+    def __contains__(self, id_cliente):
+        return id_cliente in self._cambios or bool(self._posicion(id_cliente))
+
+    @property
+    def total_activos(self) -> int:
+        """
+        Devuelve la cantidad de clientes activos.
+        """
+        return self._total_activos
+
+    @property
+    def total_inactivos(self) -> int:
+        """
+        Devuelve la cantidad de clientes inactivos.
+        """
+        return self._cantidad - self._total_activos
+
+    @property
+    def en_memoria(self) -> int:
+        """
+        Devuelve la cantidad de clientes decodificados que se mantienen en memoria.
+        """
+        return len(self._cache) + len(self._cambios)
+
+    @property
+    def boveda(self):
+        """
+        Devuelve la bóveda de tarjetas en uso, o None si las tarjetas no se tokenizan.
+        """
+        return self._boveda
+
+    def proteger_tarjetas(self, boveda) -> int:
+        """
+        Tokeniza las tarjetas en claro del archivo y las de todos los clientes que se registren después.
+
+        Los clientes tokenizados quedan como cambios pendientes hasta el siguiente guardar().
+        Si la cabecera indica que el archivo solo tiene tokens, solo se revisan los cambios
+        pendientes, por lo que abrir un almacén ya protegido no recorre a los clientes.
+
+        Args:
+            boveda (BovedaTarjetas): Bóveda donde se guardan las tarjetas cifradas.
+
+        Returns:
+            int: Cantidad de tarjetas que estaban en claro.
+        """
+        self._boveda = boveda
+        if self._solo_tokens:
+            filas = (fila_cliente(id_cliente, *cambio) for id_cliente, cambio in self._cambios.items())
+        else:
+            filas = self.filas()
+        pendientes = [fila for fila in filas if not es_token(fila[3])]
+        if pendientes:
+            tokens = boveda.tokenizar_lote([fila[3] for fila in pendientes])
+            for fila, token in zip(pendientes, tokens):
+                id_cliente, nombre, membresia, activo = cliente_desde_fila(fila[:3] + (token,) + fila[4:])
+                self._modificar(id_cliente, nombre, membresia, activo)
+        return len(pendientes)
+
+    def _tokenizar(self, membresias):
+        pendientes = [membresia for membresia in membresias if not es_token(membresia.numero_tarjeta)]
+        if pendientes:
+            tokens = self._boveda.tokenizar_lote([membresia.numero_tarjeta for membresia in pendientes])
+            for membresia, token in zip(pendientes, tokens):
+                membresia._numero_tarjeta = token
+
+    def suscribir(self, oyente):
+        """
+        Registra una función que será notificada después de cada modificación.
+
+        Args:
+            oyente (callable): Función a notificar (ver RegistroClientes.suscribir).
+        """
+        self._oyentes.append(oyente)
+
+    def desuscribir(self, oyente):
+        """
+        Elimina un oyente previamente registrado.
+
+        Args:
+            oyente (callable): Función a eliminar.
+        """
+        self._oyentes.remove(oyente)
+
+    def _notificar(self, operacion, id_cliente, nombre, anterior, nueva):
+        for oyente in self._oyentes:
+            oyente(operacion, id_cliente, nombre, anterior, nueva)
+
+    def buscar_por_correo(self, correo: str):
+        """
+        Busca el identificador de un cliente por su correo electrónico.
+
+        Args:
+            correo (str): Correo electrónico del cliente.
+
+        Returns:
+            int: Identificador del cliente, o None si no existe.
+        """
+        id_cliente = self._nuevos_por_correo.get(correo)
+        if id_cliente is not None:
+            return id_cliente
+        buscado = hash_correo(correo)
+        ranura = buscado & self._mascara
+        while True:
+            valor_hash, posicion = _RANURA.unpack_from(self._mapa, self._indice_correos + 16 * ranura)
+            if not posicion:
+                return None
+            if valor_hash == buscado and self._correo_en(posicion) == correo:
+                return _REGISTRO.unpack_from(self._mapa, posicion)[0]
+            ranura = (ranura + 1) & self._mascara
+
+    def registrar(self, nombre: str, membresia: Membresia, id_cliente: int = None) -> int:
+        """
+        Registra un nuevo cliente activo.
+
+        Args:
+            nombre (str): Nombre completo del cliente.
+            membresia (Membresia): Membresía inicial del cliente.
+            id_cliente (int, optional): Identificador a asignar. Si se omite se usa el siguiente libre.
+
+        Returns:
+            int: Identificador asignado al cliente.
+
+        Raises:
+            ValueError: Si el correo o el identificador ya están registrados.
+        """
+        if self.buscar_por_correo(membresia.correo) is not None:
+            raise ValueError(f"El correo {membresia.correo} ya está registrado.")
+        if id_cliente is None:
+            id_cliente = self._siguiente_id
+        elif id_cliente in self:
+            raise ValueError(f"El identificador {id_cliente} ya está registrado.")
+        self._siguiente_id = max(self._siguiente_id, id_cliente + 1)
+        if self._boveda is not None:
+            self._tokenizar([membresia])
+
+        self._cambios[id_cliente] = (nombre, membresia, True)
+        self._nuevos_por_correo[membresia.correo] = id_cliente
+        self._cantidad += 1
+        self._total_activos += 1
+        self._notificar("registrar", id_cliente, nombre, None, membresia)
+        return id_cliente
+
+    def registrar_lote(self, clientes: list) -> list:
+        """
+        Registra varios clientes activos de una vez.
+
+        Args:
+            clientes (list): Lista de tuplas (nombre, membresia).
+
+        Returns:
+            list: Identificador asignado a cada cliente, o None si su correo ya estaba registrado.
+        """
+        if self._boveda is not None:
+            # Una sola escritura en la bóveda para todo el lote
+            self._tokenizar(membresia for _, membresia in clientes if self.buscar_por_correo(membresia.correo) is None)
+        ids = []
+        for nombre, membresia in clientes:
+            if self.buscar_por_correo(membresia.correo) is not None:
+                ids.append(None)
+            else:
+                ids.append(self.registrar(nombre, membresia))
+        return ids
+
+    def obtener(self, id_cliente: int) -> tuple:
+        """
+        Devuelve el cliente asociado a un identificador, decodificándolo si es necesario.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+
+        Returns:
+            tuple: Tupla (nombre, membresia).
+
+        Raises:
+            KeyError: Si el identificador no existe.
+        """
+        nombre, membresia, _ = self._cliente(id_cliente)
+        return nombre, membresia
+
+    def esta_activo(self, id_cliente: int) -> bool:
+        """
+        Indica si un cliente está activo.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+
+        Returns:
+            bool: True si el cliente existe y está activo.
+        """
+        try:
+            return self._cliente(id_cliente)[2]
+        except KeyError:
+            return False
+
+    def filas(self):
+        """
+        Recorre todos los clientes, en orden de identificador, como tuplas de fila_cliente.
+
+        Los registros del archivo se decodifican sin pasar por la caché.
+
+        Yields:
+            tuple: Una tupla por cliente.
+        """
+        for id_cliente in range(1, self._mayor_id_archivo + 1):
+            cambio = self._cambios.get(id_cliente)
+            if cambio is not None:
+                yield fila_cliente(id_cliente, *cambio)
+                continue
+            posicion = self._posicion(id_cliente)
+            if posicion:
+                yield self._leer_fila(posicion)
+        for id_cliente in sorted(i for i in self._cambios if i > self._mayor_id_archivo):
+            yield fila_cliente(id_cliente, *self._cambios[id_cliente])
+
+    def _recorrer(self, activos):
+        for fila in self.filas():
+            if fila[5] == activos:
+                id_cliente, nombre, membresia, _ = cliente_desde_fila(fila)
+                yield id_cliente, nombre, membresia
+
+    def activos(self):
+        """
+        Recorre los clientes activos en orden de identificador.
+
+        Yields:
+            tuple: Tuplas (id_cliente, nombre, membresia).
+        """
+        return self._recorrer(True)
+
+    def inactivos(self):
+        """
+        Recorre los clientes inactivos en orden de identificador.
+
+        Yields:
+            tuple: Tuplas (id_cliente, nombre, membresia).
+        """
+        return self._recorrer(False)
+
+    def _modificar(self, id_cliente, nombre, membresia, activo):
+        self._cache.pop(id_cliente, None)
+        self._cambios[id_cliente] = (nombre, membresia, activo)
+
+    def cambiar_membresia(self, id_cliente: int, tipo_membresia: int) -> Membresia:
+        """
+        Cambia la membresía de un cliente activo según las reglas de su membresía actual.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            tipo_membresia (int): Identificador numérico del tipo de membresía deseado.
+
+        Returns:
+            Membresia: Nueva membresía, si el cambio fue exitoso.
+                        Membresía actual, si el cambio no fue exitoso.
+
+        Raises:
+            KeyError: Si el cliente no existe o no está activo.
+        """
+        nombre, membresia_actual = self._obtener_activo(id_cliente)
+        nueva_membresia = membresia_actual.cambiar_membresia(tipo_membresia)
+        if nueva_membresia is not membresia_actual:
+            self._modificar(id_cliente, nombre, nueva_membresia, True)
+            self._notificar("cambiar", id_cliente, nombre, membresia_actual, nueva_membresia)
+        return nueva_membresia
+
+    def _obtener_activo(self, id_cliente):
+        try:
+            nombre, membresia, activo = self._cliente(id_cliente)
+        except KeyError:
+            activo = False
+        if not activo:
+            raise KeyError(f"No existe un cliente activo con identificador {id_cliente}.")
+        return nombre, membresia
+
+    def cancelar(self, id_cliente: int) -> Membresia:
+        """
+        Cancela la membresía de un cliente activo.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+
+        Returns:
+            Membresia: Membresía resultante de la cancelación.
+
+        Raises:
+            KeyError: Si el cliente no existe o no está activo.
+        """
+        nombre, membresia_actual = self._obtener_activo(id_cliente)
+        cancelada = membresia_actual.cancelar_membresia()
+        self._modificar(id_cliente, nombre, cancelada, False)
+        self._total_activos -= 1
+        self._notificar("cancelar", id_cliente, nombre, membresia_actual, cancelada)
+        return cancelada
+
+    def reactivar(self, id_cliente: int, nueva_membresia: Membresia) -> Membresia:
+        """
+        Reactiva a un cliente inactivo con una nueva membresía.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            nueva_membresia (Membresia): Membresía con la que se reactiva al cliente.
+
+        Returns:
+            Membresia: Membresía asignada al cliente.
+
+        Raises:
+            KeyError: Si el cliente no existe o no está inactivo.
+        """
+        try:
+            nombre, membresia_actual, activo = self._cliente(id_cliente)
+        except KeyError:
+            activo = True
+        if activo:
+            raise KeyError(f"No existe un cliente inactivo con identificador {id_cliente}.")
+        self._modificar(id_cliente, nombre, nueva_membresia, True)
+        self._total_activos += 1
+        self._notificar("reactivar", id_cliente, nombre, membresia_actual, nueva_membresia)
+        return nueva_membresia
@@ -0,0 +1,449 @@
+import contextlib
+import sqlite3
+
+from boveda_tarjetas import es_token
+from membresia import Membresia
+from registro_clientes import cliente_desde_fila
+
+VERSION_ESQUEMA = 1
+FILAS_POR_LECTURA = 1000
+
+_COLUMNAS = "id_cliente, nombre, correo, numero_tarjeta, tipo, activo, contenido_sin_conexion"
+_CREAR_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS clientes (
+    id_cliente INTEGER PRIMARY KEY,
+    nombre TEXT NOT NULL,
+    correo TEXT NOT NULL UNIQUE,
+    numero_tarjeta TEXT NOT NULL,
+    tipo INTEGER NOT NULL,
+    activo INTEGER NOT NULL,
+    contenido_sin_conexion INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS clientes_por_tipo ON clientes (tipo, activo);
+CREATE INDEX IF NOT EXISTS clientes_por_estado ON clientes (activo, id_cliente);
+"""
+_INSERTAR = f"INSERT INTO clientes ({_COLUMNAS}) VALUES (?, ?, ?, ?, ?, ?, ?)"
+_ACTUALIZAR = ("UPDATE clientes SET numero_tarjeta = ?, tipo = ?, activo = ?, contenido_sin_conexion = ? "
+               "WHERE id_cliente = ?")
+_POR_ID = f"SELECT {_COLUMNAS} FROM clientes WHERE id_cliente = ?"
+_POR_CORREO = "SELECT id_cliente FROM clientes WHERE correo = ?"
+
+
+class AlmacenSQLite:
+    """
+    Registro de clientes guardado en una base de datos SQLite.
+
+    Ofrece las mismas operaciones que RegistroClientes, pero los clientes viven en la
+    base y no en memoria: cada consulta lee solo las filas necesarias (por clave primaria,
+    por el índice único del correo o por los índices de tipo y estado). La base usa el
+    modo WAL, por lo que otros procesos pueden leerla mientras este escribe, y una
+    interrupción nunca deja una transacción a medias.
+
+    Las modificaciones se agrupan en transacciones: cada confirmar_cada operaciones se
+    confirma la transacción en curso, y en_lote() agrupa un bloque completo (por ejemplo,
+    una importación) en una sola. Las sentencias son constantes y parametrizadas, por lo
+    que el módulo sqlite3 las prepara una vez y las reutiliza desde su caché.
+
+    Como en AlmacenMapeado, las membresías deben modificarse a través de estas operaciones:
+    cada consulta devuelve un objeto nuevo, y los cambios hechos sobre él no se guardan.
+    """
+
+    def __init__(self, ruta: str = "datos_clientes.db", confirmar_cada: int = 1, sincronizar: bool = True):
+        """
+        Abre la base de datos y crea el esquema si no existe.
+
+        Args:
+            ruta (str): Archivo de la base de datos.
+            confirmar_cada (int): Cantidad de operaciones por transacción. Con 0 solo se confirma
+                                  al llamar a guardar() o cerrar().
+            sincronizar (bool): Si cada confirmación espera a que los datos lleguen al disco
+                                (synchronous=FULL). Con False, una caída del sistema puede perder
+                                las últimas transacciones, pero nunca corrompe la base.
+
+        Raises:
+            ValueError: Si la base tiene una versión de esquema posterior a la soportada.
+        """
+        self._conexion = sqlite3.connect(ruta)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute(f"PRAGMA synchronous={'FULL' if sincronizar else 'NORMAL'}")
+        version = self._conexion.execute("PRAGMA user_version").fetchone()[0]
+        if version > VERSION_ESQUEMA:
+            raise ValueError(f"Versión de esquema no soportada: {version}")
+        self._conexion.executescript(_CREAR_ESQUEMA)
+        self._conexion.execute(f"PRAGMA user_version={VERSION_ESQUEMA}")
+        self._confirmar_cada = confirmar_cada
+        self._pendientes = 0
+        self._oyentes = []
+        self._boveda = None
+        self._siguiente_id = (self._conexion.execute("SELECT MAX(id_cliente) FROM clientes").fetchone()[0] or 0) + 1
+        self._cantidad, self._total_activos = self._conexion.execute(
+            "SELECT COUNT(*), COALESCE(SUM(activo), 0) FROM clientes").fetchone()
+
+    def __len__(self):
+        return self._cantidad
+
+    def __contains__(self, id_cliente):
+        fila = self._conexion.execute("SELECT 1 FROM clientes WHERE id_cliente = ?", (id_cliente,)).fetchone()
+        return fila is not None
+
+    @property
+    def total_activos(self) -> int:
+        """
+        Devuelve la cantidad de clientes activos.
+        """
+        return self._total_activos
+
+    @property
+    def total_inactivos(self) -> int:
+        """
+        Devuelve la cantidad de clientes inactivos.
+        """
+        return self._cantidad - self._total_activos
+
+    @property
+    def boveda(self):
+        """
+        Devuelve la bóveda de tarjetas en uso, o None si las tarjetas no se tokenizan.
+        """
+        return self._boveda
+
+    def proteger_tarjetas(self, boveda) -> int:
+        """
+        Tokeniza las tarjetas en claro de la base y las de todos los clientes que se registren después.
+
+        Args:
+            boveda (BovedaTarjetas): Bóveda donde se guardan las tarjetas cifradas.
+
+        Returns:
+            int: Cantidad de tarjetas que estaban en claro.
+        """
+        self._boveda = boveda
+        pendientes = self._conexion.execute(
+            "SELECT id_cliente, numero_tarjeta FROM clientes WHERE numero_tarjeta NOT LIKE 'tok\\_%' ESCAPE '\\'"
+        ).fetchall()
+        if pendientes:
+            tokens = boveda.tokenizar_lote([numero for _, numero in pendientes])
+            with self._conexion:
+                self._conexion.executemany("UPDATE clientes SET numero_tarjeta = ? WHERE id_cliente = ?",
+                                           [(token, id_cliente) for (id_cliente, _), token in zip(pendientes, tokens)])
+        return len(pendientes)
+
+    def suscribir(self, oyente):
+        """
+        Registra una función que será notificada después de cada modificación.
+
+        Args:
+            oyente (callable): Función a notificar (ver RegistroClientes.suscribir).
+        """
+        self._oyentes.append(oyente)
+
+    def desuscribir(self, oyente):
+        """
+        Elimina un oyente previamente registrado.
+
+        Args:
+            oyente (callable): Función a eliminar.
+        """
+        self._oyentes.remove(oyente)
+
+    def _notificar(self, operacion, id_cliente, nombre, anterior, nueva):
+        for oyente in self._oyentes:
+            oyente(operacion, id_cliente, nombre, anterior, nueva)
+
+    def _escribir(self, sentencia, parametros, operaciones=1):
+        self._conexion.execute(sentencia, parametros)
+        self._pendientes += operaciones
+        if self._confirmar_cada and self._pendientes >= self._confirmar_cada:
+            self.guardar()
+
+    def guardar(self):
+        """
+        Confirma la transacción en curso.
+        """
+        self._conexion.commit()
+        self._pendientes = 0
+
+    @contextlib.contextmanager
+    def en_lote(self):
+        """
+        Agrupa las operaciones del bloque en una sola transacción, que se confirma al terminar.
+        """
+        confirmar_cada = self._confirmar_cada
+        self._confirmar_cada = 0
+        try:
+            yield self
+        finally:
+            self._confirmar_cada = confirmar_cada
+            self.guardar()
+
+    def cerrar(self):
+        """
+        Confirma la transacción en curso y cierra la base de datos.
+        """
+        self.guardar()
+        self._conexion.close()
+
+    def _cliente(self, id_cliente):
+        """Devuelve (nombre, membresia, activo) leyendo la fila del cliente."""
+        fila = self._conexion.execute(_POR_ID, (id_cliente,)).fetchone()
+        if fila is None:
+            raise KeyError(id_cliente)
+        _, nombre, membresia, activo = cliente_desde_fila(fila)
+        return nombre, membresia, bool(activo)
+
+    def buscar_por_correo(self, correo: str):
+        """
+        Busca el identificador de un cliente por su correo electrónico.
+
+        Args:
+            correo (str): Correo electrónico del cliente.
+
+        Returns:
+            int: Identificador del cliente, o None si no existe.
+        """
+        fila = self._conexion.execute(_POR_CORREO, (correo,)).fetchone()
+        return None if fila is None else fila[0]
+
+    def _fila_nueva(self, id_cliente, nombre, membresia):
+        return (id_cliente, nombre, membresia.correo, membresia.numero_tarjeta, membresia._codigo, 1,
+                getattr(membresia, "_contenido_sin_conexion", 0))
+
+    def registrar(self, nombre: str, membresia: Membresia, id_cliente: int = None) -> int:
+        """
+        Registra un nuevo cliente activo.
+
+        Args:
+            nombre (str): Nombre completo del cliente.
+            membresia (Membresia): Membresía inicial del cliente.
+            id_cliente (int, optional): Identificador a asignar. Si se omite se usa el siguiente libre.
+
+        Returns:
+            int: Identificador asignado al cliente.
+
+        Raises:
+            ValueError: Si el correo o el identificador ya están registrados.
+        """
+        if self.buscar_por_correo(membresia.correo) is not None:
+            raise ValueError(f"El correo {membresia.correo} ya está registrado.")
+        if id_cliente is None:
+            id_cliente = self._siguiente_id
+        elif id_cliente in self:
+            raise ValueError(f"El identificador {id_cliente} ya está registrado.")
+        self._siguiente_id = max(self._siguiente_id, id_cliente + 1)
+        if self._boveda is not None and not es_token(membresia.numero_tarjeta):
+            membresia._numero_tarjeta = self._boveda.tokenizar(membresia.numero_tarjeta)
+
+        self._escribir(_INSERTAR, self._fila_nueva(id_cliente, nombre, membresia))
+        self._cantidad += 1
+        self._total_activos += 1
+        self._notificar("registrar", id_cliente, nombre, None, membresia)
+        return id_cliente
+
+    def registrar_lote(self, clientes: list) -> list:
+        """
+        Registra varios clientes activos con una sola inserción preparada y una sola transacción.
+
+        Args:
+            clientes (list): Lista de tuplas (nombre, membresia).
+
+        Returns:
+            list: Identificador asignado a cada cliente, o None si su correo ya estaba registrado.
+        """
+        ids = []
+        nuevos = []
+        vistos = set()
+        for nombre, membresia in clientes:
+            if membresia.correo in vistos or self.buscar_por_correo(membresia.correo) is not None:
+                ids.append(None)
+                continue
+            vistos.add(membresia.correo)
+            ids.append(self._siguiente_id)
+            nuevos.append((self._siguiente_id, nombre, membresia))
+            self._siguiente_id += 1
+        if self._boveda is not None:
+            pendientes = [membresia for _, _, membresia in nuevos if not es_token(membresia.numero_tarjeta)]
+            tokens = self._boveda.tokenizar_lote([membresia.numero_tarjeta for membresia in pendientes])
+            for membresia, token in zip(pendientes, tokens):
+                membresia._numero_tarjeta = token
+
+        self._conexion.executemany(_INSERTAR, [self._fila_nueva(*nuevo) for nuevo in nuevos])
+        self._pendientes += len(nuevos)
+        if self._confirmar_cada:
+            self.guardar()
+        self._cantidad += len(nuevos)
+        self._total_activos += len(nuevos)
+        for id_cliente, nombre, membresia in nuevos:
+            self._notificar("registrar", id_cliente, nombre, None, membresia)
+        return ids
+
+    def obtener(self, id_cliente: int) -> tuple:
+        """
+        Devuelve el cliente asociado a un identificador.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+
+        Returns:
+            tuple: Tupla (nombre, membresia).
+
+        Raises:
+            KeyError: Si el identificador no existe.
+        """
+        nombre, membresia, _ = self._cliente(id_cliente)
+        return nombre, membresia
+
+    def esta_activo(self, id_cliente: int) -> bool:
+        """
+        Indica si un cliente está activo.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+
+        Returns:
+            bool: True si el cliente existe y está activo.
+        """
+        fila = self._conexion.execute("SELECT activo FROM clientes WHERE id_cliente = ?", (id_cliente,)).fetchone()
+        return fila is not None and bool(fila[0])
+
+    def _consultar(self, sentencia, parametros=()):
+        # Se lee por bloques desde un cursor propio, para no cargar toda la tabla en memoria
+        cursor = self._conexion.execute(sentencia, parametros)
+        while True:
+            filas = cursor.fetchmany(FILAS_POR_LECTURA)
+            if not filas:
+                return
+            yield from filas
+
+    def filas(self):
+        """
+        Recorre todos los clientes, en orden de identificador, como tuplas de fila_cliente.
+
+        Yields:
+            tuple: Una tupla por cliente.
+        """
+        for fila in self._consultar(f"SELECT {_COLUMNAS} FROM clientes ORDER BY id_cliente"):
+            yield fila[:5] + (bool(fila[5]), fila[6])
+
+    def _recorrer(self, activos, tipo=None):
+        sentencia = f"SELECT {_COLUMNAS} FROM clientes WHERE activo = ?"
+        parametros = (int(activos),)
+        if tipo is not None:
+            sentencia += " AND tipo = ?"
+            parametros += (tipo,)
+        for fila in self._consultar(sentencia + " ORDER BY id_cliente", parametros):
+            id_cliente, nombre, membresia, _ = cliente_desde_fila(fila)
+            yield id_cliente, nombre, membresia
+
+    def activos(self, tipo: int = None):
+        """
+        Recorre los clientes activos en orden de identificador.
+
+        Args:
+            tipo (int, optional): Código de membresía; si se indica, se usa el índice por tipo.
+
+        Yields:
+            tuple: Tuplas (id_cliente, nombre, membresia).
+        """
+        return self._recorrer(True, tipo)
+
+    def inactivos(self, tipo: int = None):
+        """
+        Recorre los clientes inactivos en orden de identificador.
+
+        Args:
+            tipo (int, optional): Código de membresía; si se indica, se usa el índice por tipo.
+
+        Yields:
+            tuple: Tuplas (id_cliente, nombre, membresia).
+        """
+        return self._recorrer(False, tipo)
+
+    def contar_por_tipo(self, activos: bool = True) -> dict:
+        """
+        Cuenta los clientes de cada tipo de membresía usando solo el índice por tipo.
+
+        Returns:
+            dict: Código de membresía -> cantidad de clientes.
+        """
+        return dict(self._conexion.execute(
+            "SELECT tipo, COUNT(*) FROM clientes WHERE activo = ? GROUP BY tipo", (int(activos),)))
+
+    def _modificar(self, id_cliente, membresia, activo):
+        self._escribir(_ACTUALIZAR, (membresia.numero_tarjeta, membresia._codigo, int(activo),
+                                     getattr(membresia, "_contenido_sin_conexion", 0), id_cliente))
+
+    def _obtener_activo(self, id_cliente):
+        try:
+            nombre, membresia, activo = self._cliente(id_cliente)
+        except KeyError:
+            activo = False
+        if not activo:
+            raise KeyError(f"No existe un cliente activo con identificador {id_cliente}.")
+        return nombre, membresia
+
+    def cambiar_membresia(self, id_cliente: int, tipo_membresia: int) -> Membresia:
+        """
+        Cambia la membresía de un cliente activo según las reglas de su membresía actual.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            tipo_membresia (int): Identificador numérico del tipo de membresía deseado.
+
+        Returns:
+            Membresia: Nueva membresía, si el cambio fue exitoso.
+                        Membresía actual, si el cambio no fue exitoso.
+
+        Raises:
+            KeyError: Si el cliente no existe o no está activo.
+        """
+        nombre, membresia_actual = self._obtener_activo(id_cliente)
+        nueva_membresia = membresia_actual.cambiar_membresia(tipo_membresia)
+        if nueva_membresia is not membresia_actual:
+            self._modificar(id_cliente, nueva_membresia, True)
+            self._notificar("cambiar", id_cliente, nombre, membresia_actual, nueva_membresia)
+        return nueva_membresia
+
+    def cancelar(self, id_cliente: int) -> Membresia:
+        """
+        Cancela la membresía de un cliente activo.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+
+        Returns:
+            Membresia: Membresía resultante de la cancelación.
+
+        Raises:
+            KeyError: Si el cliente no existe o no está activo.
+        """
+        nombre, membresia_actual = self._obtener_activo(id_cliente)
+        cancelada = membresia_actual.cancelar_membresia()
+        self._modificar(id_cliente, cancelada, False)
+        self._total_activos -= 1
+        self._notificar("cancelar", id_cliente, nombre, membresia_actual, cancelada)
+        return cancelada
+
+    def reactivar(self, id_cliente: int, nueva_membresia: Membresia) -> Membresia:
+        """
+        Reactiva a un cliente inactivo con una nueva membresía.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            nueva_membresia (Membresia): Membresía con la que se reactiva al cliente.
+
+        Returns:
+            Membresia: Membresía asignada al cliente.
+
+        Raises:
+            KeyError: Si el cliente no existe o no está inactivo.
+        """
+        try:
+            nombre, membresia_actual, activo = self._cliente(id_cliente)
+        except KeyError:
+            activo = True
+        if activo:
+            raise KeyError(f"No existe un cliente inactivo con identificador {id_cliente}.")
+        self._modificar(id_cliente, nueva_membresia, True)
+        self._total_activos += 1
+        self._notificar("reactivar", id_cliente, nombre, membresia_actual, nueva_membresia)
+        return nueva_membresia
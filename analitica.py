@@ -0,0 +1,296 @@
+import json
+import os
+import time
+
+from membresia import TIPOS_MEMBRESIA
+
+# Formato de la clave de cada escala de período, en hora local
+ESCALAS = {
+    "dia": "%Y-%m-%d",
+    "semana": "%G-W%V",
+    "mes": "%Y-%m",
+}
+
+
+def periodo(instante: float, escala: str = "mes") -> str:
+    """
+    Devuelve la clave del período que contiene un instante, p. ej. "2024-05" o "2024-W19".
+
+    Args:
+        instante (float): Marca de tiempo.
+        escala (str): "dia", "semana" (ISO) o "mes".
+
+    Raises:
+        KeyError: Si la escala no existe.
+    """
+    return time.strftime(ESCALAS[escala], time.localtime(instante))
+
+
+class _Periodo:
+    """Contadores de un período."""
+
+    __slots__ = ("altas", "bajas", "reactivaciones", "activos_al_inicio")
+
+    def __init__(self, activos_al_inicio):
+        self.altas = 0
+        self.bajas = 0
+        self.reactivaciones = 0
+        self.activos_al_inicio = activos_al_inicio
+
+
+class AnaliticaSuscriptores:
+    """
+    Estadísticas de suscriptores mantenidas en forma incremental.
+
+    Como oyente del registro, cada modificación actualiza en O(1) los suscriptores activos
+    por tipo, los cambios entre cada par de tipos, las altas, bajas y reactivaciones por
+    día, semana y mes, y las cohortes mensuales (clientes registrados en cada mes y
+    cuántos siguen activos). Las consultas leen esos contadores sin recorrer el registro.
+
+    Al crearla se reproduce el archivo del historial de membresías (ver
+    HistorialMembresias), que guarda cada operación con su instante; al conectarla, los
+    activos por tipo y por cohorte se toman del registro, salvo que el historial ya esté al
+    día con él (ver conectar). Ambos recorridos se hacen una sola vez, al iniciar. Los clientes anteriores al historial pertenecen a la cohorte del
+    mes en que el historial comenzó a registrarlos (operación "inicial"), sin contarse como
+    altas de ese período.
+    """
+
+    def __init__(self, ruta_historial: str = None, reloj=time.time):
+        """
+        Inicializa las estadísticas.
+
+        Args:
+            ruta_historial (str, optional): Archivo del historial de membresías a reproducir.
+            reloj (callable): Función que devuelve la marca de tiempo actual.
+        """
+        self._reloj = reloj
+        self._por_tipo = {codigo: 0 for codigo in TIPOS_MEMBRESIA}
+        self._activos = 0
+        # (tipo de origen, tipo de destino) -> cantidad de cambios
+        self._transiciones = {}
+        self._bajas_por_tipo = {codigo: 0 for codigo in TIPOS_MEMBRESIA}
+        # (escala, clave del período) -> _Periodo
+        self._periodos = {}
+        # mes -> [registrados, activos]
+        self._cohortes = {}
+        self._cohorte_de = {}
+        # Clientes del registro según la última marca "conectado" del historial y las altas posteriores
+        self._clientes = None
+        self._registro = None
+        if ruta_historial is not None and os.path.exists(ruta_historial):
+            self._reproducir(ruta_historial)
+
+    def _reproducir(self, ruta):
+        # El historial guarda el tipo resultante; el de origen es el último visto del cliente
+        tipos = {}
+        with open(ruta, "r", encoding="utf-8") as archivo:
+            for linea in archivo:
+                try:
+                    evento = json.loads(linea)
+                except json.JSONDecodeError:
+                    # Una línea incompleta al final indica una escritura interrumpida
+                    break
+                if evento["op"] == "conectado":
+                    self._clientes = evento["clientes"]
+                    continue
+                id_cliente = evento["id"]
+                self._aplicar(evento["op"], id_cliente, tipos.get(id_cliente), evento.get("tipo"), evento["ts"])
+                tipos[id_cliente] = evento.get("tipo")
+
+    def _periodos_en(self, instante):
+        periodos = []
+        for escala in ESCALAS:
+            clave = (escala, periodo(instante, escala))
+            contadores = self._periodos.get(clave)
+            if contadores is None:
+                # Sin eventos previos en el período, los activos no cambiaron desde su inicio
+                contadores = self._periodos[clave] = _Periodo(self._activos)
+            periodos.append(contadores)
+        return periodos
+
+    def _aplicar(self, operacion, id_cliente, origen, destino, instante):
+        if operacion == "cambiar":
+            if origen is not None:
+                self._por_tipo[origen] -= 1
+                self._transiciones[origen, destino] = self._transiciones.get((origen, destino), 0) + 1
+            self._por_tipo[destino] += 1
+            return
+        if operacion == "inicial":
+            # Ya estaba activo antes del historial: cuenta en los activos al inicio de los
+            # períodos siguientes, no como alta
+            mes = periodo(instante, "mes")
+            self._cohorte_de[id_cliente] = mes
+            cohorte = self._cohortes.setdefault(mes, [0, 0])
+            cohorte[0] += 1
+            cohorte[1] += 1
+            self._activos += 1
+            self._por_tipo[destino] += 1
+            return
+        periodos = self._periodos_en(instante)
+        cohorte = self._cohortes.get(self._cohorte_de.get(id_cliente))
+        if operacion == "registrar":
+            if self._clientes is not None:
+                self._clientes += 1
+            mes = periodo(instante, "mes")
+            self._cohorte_de[id_cliente] = mes
+            cohorte = self._cohortes.setdefault(mes, [0, 0])
+            cohorte[0] += 1
+            for contadores in periodos:
+                contadores.altas += 1
+        elif operacion == "cancelar":
+            for contadores in periodos:
+                contadores.bajas += 1
+            if origen is not None:
+                self._bajas_por_tipo[origen] += 1
+        else:
+            for contadores in periodos:
+                contadores.reactivaciones += 1
+        cambio = -1 if operacion == "cancelar" else 1
+        self._activos += cambio
+        if cohorte is not None:
+            cohorte[1] += cambio
+        if operacion == "cancelar":
+            if origen is not None:
+                self._por_tipo[origen] -= 1
+        else:
+            self._por_tipo[destino] += 1
+
+    def registrar_evento(self, operacion, id_cliente, nombre, anterior, nueva):
+        """
+        Actualiza las estadísticas con una modificación del registro. Se usa como oyente del registro.
+
+        Args:
+            operacion (str): "registrar", "cambiar", "cancelar" o "reactivar".
+            id_cliente (int): Identificador del cliente modificado.
+            nombre (str): Nombre del cliente.
+            anterior (Membresia): Membresía previa (None al registrar).
+            nueva (Membresia): Membresía resultante.
+        """
+        origen = None if anterior is None else anterior._codigo
+        self._aplicar(operacion, id_cliente, origen, nueva._codigo, self._reloj())
+
+    def conectar(self, registro):
+        """
+        Toma del registro los activos por tipo y por cohorte, y se suscribe a sus cambios.
+
+        Si la cantidad de clientes según el historial y los activos reproducidos coinciden con
+        los del registro, los contadores reproducidos ya están al día y no se recorre el
+        registro.
+
+        Args:
+            registro (RegistroClientes): Registro de clientes.
+        """
+        self._registro = registro
+        registro.suscribir(self.registrar_evento)
+        if (self._clientes, self._activos) == (len(registro), registro.total_activos):
+            return
+        self._por_tipo = {codigo: 0 for codigo in TIPOS_MEMBRESIA}
+        self._activos = 0
+        for cohorte in self._cohortes.values():
+            cohorte[1] = 0
+        for id_cliente, _, membresia in registro.activos():
+            self._por_tipo[membresia._codigo] += 1
+            self._activos += 1
+            cohorte = self._cohortes.get(self._cohorte_de.get(id_cliente))
+            if cohorte is not None:
+                cohorte[1] += 1
+
+    def cerrar(self):
+        """
+        Deja de seguir los cambios del registro.
+        """
+        if self._registro is not None:
+            self._registro.desuscribir(self.registrar_evento)
+            self._registro = None
+
+    def activos(self, tipo_membresia: int = None) -> int:
+        """
+        Devuelve la cantidad de suscriptores activos, en total o de un tipo de membresía.
+        """
+        if tipo_membresia is None:
+            return self._activos
+        return self._por_tipo.get(tipo_membresia, 0)
+
+    def activos_por_tipo(self) -> dict:
+        """
+        Devuelve la cantidad de suscriptores activos de cada tipo de membresía.
+
+        Returns:
+            dict: Código del tipo -> cantidad.
+        """
+        return dict(self._por_tipo)
+
+    def transiciones(self, origen: int = None, destino: int = None):
+        """
+        Devuelve los cambios de membresía entre dos tipos, o todos los pares con al menos un cambio.
+
+        Args:
+            origen (int, optional): Código del tipo de origen.
+            destino (int, optional): Código del tipo de destino.
+
+        Returns:
+            int | dict: Cantidad de cambios de origen a destino si se indican ambos; si no, un
+                        diccionario (origen, destino) -> cantidad.
+        """
+        if origen is not None and destino is not None:
+            return self._transiciones.get((origen, destino), 0)
+        return dict(self._transiciones)
+
+    def bajas_por_tipo(self) -> dict:
+        """
+        Devuelve la cantidad de cancelaciones según el tipo de membresía que se canceló.
+        """
+        return dict(self._bajas_por_tipo)
+
+    def resumen_periodo(self, instante: float = None, escala: str = "mes") -> dict:
+        """
+        Devuelve las altas, bajas y reactivaciones del período que contiene un instante.
+
+        Args:
+            instante (float, optional): Marca de tiempo; por defecto, el período actual.
+            escala (str): "dia", "semana" o "mes".
+
+        Returns:
+            dict: Claves "periodo", "altas", "bajas", "reactivaciones", "activos_al_inicio" (None
+                  si se desconoce) y "tasa_bajas" (bajas sobre los activos al inicio del período).
+
+        Raises:
+            KeyError: Si la escala no existe.
+        """
+        actual = periodo(self._reloj(), escala)
+        clave = actual if instante is None else periodo(instante, escala)
+        contadores = self._periodos.get((escala, clave))
+        if contadores is None:
+            # Un período sin eventos que no terminó empieza con los activos actuales; de uno
+            # pasado sin eventos no se conservan los activos
+            contadores = _Periodo(self._activos if clave >= actual else None)
+        return {
+            "periodo": clave,
+            "altas": contadores.altas,
+            "bajas": contadores.bajas,
+            "reactivaciones": contadores.reactivaciones,
+            "activos_al_inicio": contadores.activos_al_inicio,
+            "tasa_bajas": contadores.bajas / contadores.activos_al_inicio if contadores.activos_al_inicio else 0.0,
+        }
+
+    def cohorte(self, mes: str) -> tuple:
+        """
+        Devuelve los clientes registrados en un mes y cuántos de ellos siguen activos.
+
+        Args:
+            mes (str): Mes en formato "AAAA-MM".
+
+        Returns:
+            tuple: Tupla (registrados, activos).
+        """
+        registrados, activos = self._cohortes.get(mes, (0, 0))
+        return registrados, activos
+
+    def cohortes(self) -> list:
+        """
+        Devuelve todas las cohortes mensuales en orden cronológico.
+
+        Returns:
+            list: Tuplas (mes, registrados, activos).
+        """
+        return [(mes, registrados, activos) for mes, (registrados, activos) in sorted(self._cohortes.items())]
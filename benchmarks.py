@@ -0,0 +1,416 @@
+"""Suite de benchmarks reproducible del dominio de membresías y de la persistencia.
+
+Genera registros sintéticos de distintos tamaños y mide el rendimiento de las operaciones
+principales. Los resultados se emiten en JSON para comparar entre commits:
+
+    python benchmarks.py --escalas 1000,100000 --salida resultados.json
+    python benchmarks.py --escalas 1000,100000 --comparar resultados.json
+"""
+import argparse
+import json
+import os
+import pickle
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from almacen_sqlite import AlmacenSQLite
+from analitica import AnaliticaSuscriptores
+from bitacora import Bitacora
+from credenciales import AlmacenCredenciales
+from formato_registros import codificar_filas, decodificar_filas
+from cifrado import generar_claves_rsa, cifrar_datos_hibrido, descifrar_datos_hibrido
+from membresia import TIPOS_MEMBRESIA
+from registro_clientes import RegistroClientes
+from registro_concurrente import ConflictoVersion, RegistroConcurrente
+from sesiones import ControlSesiones
+
+ESCALAS_POR_DEFECTO = (1_000, 10_000, 100_000, 1_000_000)
+COSTOS_POR_DEFECTO = (10, 12)
+HILOS_POR_DEFECTO = (1, 4)
+SEMILLA = 20241018
+
+
+def generar_registro(cantidad: int, semilla: int = SEMILLA) -> RegistroClientes:
+    """
+    Genera un registro sintético con tipos de membresía pseudoaleatorios reproducibles.
+
+    Args:
+        cantidad (int): Cantidad de clientes.
+        semilla (int): Semilla del generador pseudoaleatorio.
+
+    Returns:
+        RegistroClientes: Registro con todos los clientes activos.
+    """
+    aleatorio = random.Random(semilla)
+    registro = RegistroClientes()
+    for i in range(cantidad):
+        tipo = aleatorio.randrange(1, len(TIPOS_MEMBRESIA))
+        registro.registrar(f"Cliente {i}", TIPOS_MEMBRESIA[tipo](f"cliente{i}@ejemplo.com", f"{4000000000000000 + i:016d}"))
+    return registro
+
+
+def cronometrar(funcion, repeticiones: int = 3) -> float:
+    """
+    Ejecuta una función varias veces y devuelve el menor tiempo en segundos.
+    """
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+class Resultados:
+    """
+    Acumula mediciones como registros JSON.
+    """
+
+    def __init__(self):
+        self.mediciones = []
+
+    def agregar(self, escala, metrica, valor, unidad):
+        """
+        Agrega una medición e imprime un resumen legible.
+        """
+        self.mediciones.append({"escala": escala, "metrica": metrica, "valor": valor, "unidad": unidad})
+        print(f"  {metrica:<32} {valor:>14.2f} {unidad}", file=sys.stderr)
+
+
+def medir_operaciones(registro: RegistroClientes, escala: int, resultados: Resultados, operaciones: int):
+    """Mide búsquedas, cambios y cancelaciones sobre un registro."""
+    aleatorio = random.Random(SEMILLA)
+    ids = [aleatorio.randrange(1, escala + 1) for _ in range(operaciones)]
+    correos = [registro.obtener(id_cliente)[1].correo for id_cliente in ids]
+
+    segundos = cronometrar(lambda: [registro.obtener(id_cliente) for id_cliente in ids])
+    resultados.agregar(escala, "busqueda_por_id", operaciones / segundos, "ops/s")
+    segundos = cronometrar(lambda: [registro.buscar_por_correo(correo) for correo in correos])
+    resultados.agregar(escala, "busqueda_por_correo", operaciones / segundos, "ops/s")
+
+    unicos = list(dict.fromkeys(ids))
+    destinos = [aleatorio.randrange(1, len(TIPOS_MEMBRESIA)) for _ in unicos]
+    inicio = time.perf_counter()
+    for id_cliente, destino in zip(unicos, destinos):
+        registro.cambiar_membresia(id_cliente, destino)
+    resultados.agregar(escala, "cambiar_membresia", len(unicos) / (time.perf_counter() - inicio), "ops/s")
+
+    inicio = time.perf_counter()
+    for id_cliente in unicos:
+        registro.cancelar(id_cliente)
+    resultados.agregar(escala, "cancelar_membresia", len(unicos) / (time.perf_counter() - inicio), "ops/s")
+
+    # Se reactivan para dejar el registro como estaba antes de las siguientes mediciones
+    for id_cliente in unicos:
+        _, membresia = registro.obtener(id_cliente)
+        registro.reactivar(id_cliente, TIPOS_MEMBRESIA[1](membresia.correo, membresia.numero_tarjeta))
+
+
+def medir_persistencia(registro: RegistroClientes, escala: int, resultados: Resultados, operaciones: int):
+    """Mide la instantánea (guardado completo), la carga y la bitácora de operaciones."""
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_bitacora = os.path.join(carpeta, "datos.log")
+        ruta_instantanea = os.path.join(carpeta, "datos.dat")
+
+        bitacora = Bitacora(ruta_bitacora, ruta_instantanea, sincronizar_cada=0, compactar_cada=0)
+        bitacora.conectar(registro)
+        segundos = cronometrar(bitacora.compactar, repeticiones=1)
+        resultados.agregar(escala, "guardar_instantanea", segundos * 1000, "ms")
+        resultados.agregar(escala, "tamano_instantanea", os.path.getsize(ruta_instantanea) / 1024, "KiB")
+
+        ids = list(range(1, min(operaciones, escala) + 1))
+        inicio = time.perf_counter()
+        for id_cliente in ids:
+            registro.cambiar_membresia(id_cliente, 4)
+            registro.cambiar_membresia(id_cliente, 1)
+        bitacora.sincronizar()
+        resultados.agregar(escala, "guardar_datos_bitacora", 2 * len(ids) / (time.perf_counter() - inicio), "ops/s")
+        bitacora.cerrar()
+
+        segundos = cronometrar(lambda: Bitacora(ruta_bitacora, ruta_instantanea).cargar(), repeticiones=1)
+        resultados.agregar(escala, "cargar_datos", segundos * 1000, "ms")
+
+
+def medir_formato(registro: RegistroClientes, escala: int, resultados: Resultados):
+    """Compara el formato binario de registros con pickle: tiempo de guardado y carga y tamaño."""
+    datos_pickle = pickle.dumps({"secuencia": 0, "registro": registro}, protocol=pickle.HIGHEST_PROTOCOL)
+    segundos = cronometrar(lambda: pickle.dumps({"secuencia": 0, "registro": registro},
+                                                protocol=pickle.HIGHEST_PROTOCOL), repeticiones=1)
+    resultados.agregar(escala, "guardar_pickle", segundos * 1000, "ms")
+    segundos = cronometrar(lambda: pickle.loads(datos_pickle), repeticiones=1)
+    resultados.agregar(escala, "cargar_pickle", segundos * 1000, "ms")
+    resultados.agregar(escala, "tamano_pickle", len(datos_pickle) / 1024, "KiB")
+
+    datos_binarios = codificar_filas(registro.filas())
+    segundos = cronometrar(lambda: codificar_filas(registro.filas()), repeticiones=1)
+    resultados.agregar(escala, "guardar_binario", segundos * 1000, "ms")
+    segundos = cronometrar(lambda: RegistroClientes.desde_filas(decodificar_filas(datos_binarios)[0]), repeticiones=1)
+    resultados.agregar(escala, "cargar_binario", segundos * 1000, "ms")
+    resultados.agregar(escala, "tamano_binario", len(datos_binarios) / 1024, "KiB")
+
+
+def medir_sqlite(registro: RegistroClientes, escala: int, resultados: Resultados, operaciones: int):
+    """
+    Mide el almacén SQLite: importación en una transacción, búsquedas por correo y
+    modificaciones confirmando cada operación o agrupadas en una sola transacción.
+    """
+    with tempfile.TemporaryDirectory() as carpeta:
+        almacen = AlmacenSQLite(os.path.join(carpeta, "datos.db"))
+        clientes = [(nombre, membresia) for _, nombre, membresia in registro.activos()]
+        inicio = time.perf_counter()
+        with almacen.en_lote():
+            almacen.registrar_lote(clientes)
+        resultados.agregar(escala, "importar_sqlite", (time.perf_counter() - inicio) * 1000, "ms")
+
+        aleatorio = random.Random(SEMILLA)
+        correos = [aleatorio.choice(clientes)[1].correo for _ in range(operaciones)]
+        inicio = time.perf_counter()
+        for correo in correos:
+            almacen.buscar_por_correo(correo)
+        resultados.agregar(escala, "buscar_por_correo_sqlite", len(correos) / (time.perf_counter() - inicio), "ops/s")
+
+        ids = [almacen.buscar_por_correo(correo) for correo in correos]
+        # Cada confirmación espera al disco; se limita la cantidad para que la medición no domine la suite
+        por_operacion = ids[:1000]
+        inicio = time.perf_counter()
+        for id_cliente in por_operacion:
+            almacen.cambiar_membresia(id_cliente, 4)
+            almacen.cambiar_membresia(id_cliente, 1)
+        resultados.agregar(escala, "modificar_sqlite_por_operacion",
+                           2 * len(por_operacion) / (time.perf_counter() - inicio), "ops/s")
+        inicio = time.perf_counter()
+        with almacen.en_lote():
+            for id_cliente in ids:
+                almacen.cambiar_membresia(id_cliente, 4)
+                almacen.cambiar_membresia(id_cliente, 1)
+        resultados.agregar(escala, "modificar_sqlite_en_lote", 2 * len(ids) / (time.perf_counter() - inicio), "ops/s")
+        almacen.cerrar()
+
+
+def medir_concurrencia(registro: RegistroClientes, escala: int, resultados: Resultados, operaciones: int, hilos):
+    """
+    Mide cambios de membresía por segundo en un RegistroConcurrente con varios hilos.
+
+    Cada hilo lee clientes con su versión y aplica el cambio con compare-and-swap,
+    reintentando ante un conflicto; los hilos eligen clientes al azar, por lo que
+    también se miden los conflictos entre ellos.
+    """
+    concurrente = RegistroConcurrente.desde_filas(registro.filas())
+    ids = [id_cliente for id_cliente, *_ in concurrente.activos()]
+    for trabajadores in hilos:
+        por_hilo = max(operaciones // trabajadores, 1)
+        conflictos = []
+
+        def trabajador(semilla):
+            aleatorio = random.Random(semilla)
+            cantidad = 0
+            for _ in range(por_hilo):
+                id_cliente = aleatorio.choice(ids)
+                while True:
+                    _, membresia, _, version = concurrente.leer(id_cliente)
+                    try:
+                        concurrente.cambiar_membresia(id_cliente, 4 if membresia._codigo != 4 else 1, version=version)
+                        break
+                    except ConflictoVersion:
+                        cantidad += 1
+            conflictos.append(cantidad)
+
+        hilos_trabajo = [threading.Thread(target=trabajador, args=(SEMILLA + i,)) for i in range(trabajadores)]
+        inicio = time.perf_counter()
+        for hilo in hilos_trabajo:
+            hilo.start()
+        for hilo in hilos_trabajo:
+            hilo.join()
+        resultados.agregar(escala, f"cambios_concurrentes_hilos{trabajadores}",
+                           por_hilo * trabajadores / (time.perf_counter() - inicio), "ops/s")
+        resultados.agregar(escala, f"conflictos_hilos{trabajadores}", sum(conflictos), "conflictos")
+
+
+def medir_sesiones(registro: RegistroClientes, escala: int, resultados: Resultados, operaciones: int):
+    """Mide admisiones de reproducción, latidos y detenciones por segundo."""
+    sesiones = ControlSesiones(registro)
+    aleatorio = random.Random(SEMILLA)
+    ids = [aleatorio.randint(1, escala) for _ in range(operaciones)]
+    inicio = time.perf_counter()
+    abiertas = []
+    for id_cliente in ids:
+        try:
+            abiertas.append(sesiones.iniciar(id_cliente, "televisor"))
+        except ValueError:
+            pass
+    resultados.agregar(escala, "admitir_reproduccion", len(ids) / (time.perf_counter() - inicio), "ops/s")
+    inicio = time.perf_counter()
+    for id_sesion in abiertas:
+        sesiones.latido(id_sesion)
+    resultados.agregar(escala, "latido_reproduccion", len(abiertas) / (time.perf_counter() - inicio), "ops/s")
+    inicio = time.perf_counter()
+    for id_sesion in abiertas:
+        sesiones.detener(id_sesion)
+    resultados.agregar(escala, "detener_reproduccion", len(abiertas) / (time.perf_counter() - inicio), "ops/s")
+    sesiones.cerrar()
+
+
+def medir_analitica(registro: RegistroClientes, escala: int, resultados: Resultados):
+    """Compara el conteo de activos por tipo recorriendo el registro con la consulta a las estadísticas."""
+    inicio = time.perf_counter()
+    analitica = AnaliticaSuscriptores()
+    analitica.conectar(registro)
+    resultados.agregar(escala, "reconstruir_analitica", (time.perf_counter() - inicio) * 1000, "ms")
+
+    def contar_recorriendo():
+        cuentas = {}
+        for _, _, membresia in registro.activos():
+            cuentas[type(membresia).__name__] = cuentas.get(type(membresia).__name__, 0) + 1
+        return cuentas
+
+    resultados.agregar(escala, "activos_por_tipo_recorrido", cronometrar(contar_recorriendo) * 1000, "ms")
+    resultados.agregar(escala, "activos_por_tipo_analitica", cronometrar(analitica.activos_por_tipo) * 1000, "ms")
+    analitica.cerrar()
+
+
+def medir_cifrado(resultados: Resultados, megabytes: int):
+    """Mide el rendimiento del cifrado híbrido en MB/s."""
+    clave_privada, clave_publica = generar_claves_rsa()
+    datos = random.Random(SEMILLA).randbytes(megabytes * 1024 * 1024)
+    cifrados = cifrar_datos_hibrido(datos, clave_publica)
+    segundos = cronometrar(lambda: cifrar_datos_hibrido(datos, clave_publica))
+    resultados.agregar(megabytes, "cifrar_datos_hibrido", megabytes / segundos, "MB/s")
+    segundos = cronometrar(lambda: descifrar_datos_hibrido(*cifrados, clave_privada))
+    resultados.agregar(megabytes, "descifrar_datos_hibrido", megabytes / segundos, "MB/s")
+
+
+def medir_credenciales(resultados: Resultados, costos, hilos, logins: int):
+    """
+    Mide inicios de sesión por segundo con cada combinación de costo de bcrypt y cantidad de hilos.
+
+    La escala de cada medición es el costo. bcrypt libera el GIL, por lo que el throughput
+    crece con los hilos hasta la cantidad de núcleos disponibles.
+    """
+    for costo in costos:
+        for trabajadores in hilos:
+            credenciales = AlmacenCredenciales(costo=costo, trabajadores=trabajadores)
+            contrasenas = [f"contrasena-{id_cliente}" for id_cliente in range(logins)]
+            for futuro in [credenciales.establecer(id_cliente, contrasena)
+                           for id_cliente, contrasena in enumerate(contrasenas)]:
+                futuro.result()
+            inicio = time.perf_counter()
+            futuros = [credenciales.verificar(id_cliente, contrasena)
+                       for id_cliente, contrasena in enumerate(contrasenas)]
+            if not all(futuro.result() for futuro in futuros):
+                raise RuntimeError("La verificación de credenciales falló.")
+            resultados.agregar(costo, f"logins_costo{costo}_hilos{trabajadores}",
+                               logins / (time.perf_counter() - inicio), "ops/s")
+            credenciales.cerrar()
+
+
+def commit_actual():
+    """Devuelve el hash del commit actual, o None si no se puede obtener."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar(escalas, operaciones: int, megabytes: int, costos=COSTOS_POR_DEFECTO, hilos=HILOS_POR_DEFECTO,
+             logins: int = 32) -> dict:
+    """
+    Ejecuta la suite completa.
+
+    Args:
+        escalas (iterable): Tamaños de registro a medir.
+        operaciones (int): Cantidad de operaciones por medición de throughput.
+        megabytes (int): Tamaño de los datos usados en las mediciones de cifrado.
+        costos (iterable): Factores de costo de bcrypt a medir.
+        hilos (iterable): Cantidades de hilos de verificación y de trabajadores concurrentes a medir.
+        logins (int): Inicios de sesión por medición de credenciales.
+
+    Returns:
+        dict: Resultados listos para serializar en JSON.
+    """
+    resultados = Resultados()
+    for escala in escalas:
+        print(f"Escala {escala}:", file=sys.stderr)
+        inicio = time.perf_counter()
+        registro = generar_registro(escala)
+        resultados.agregar(escala, "generar_registro", (time.perf_counter() - inicio) * 1000, "ms")
+        medir_operaciones(registro, escala, resultados, operaciones)
+        medir_persistencia(registro, escala, resultados, operaciones)
+        medir_formato(registro, escala, resultados)
+        medir_sqlite(registro, escala, resultados, operaciones)
+        medir_concurrencia(registro, escala, resultados, operaciones, hilos)
+        medir_sesiones(registro, escala, resultados, operaciones)
+        medir_analitica(registro, escala, resultados)
+        del registro
+
+    print("Cifrado:", file=sys.stderr)
+    medir_cifrado(resultados, megabytes)
+
+    if logins:
+        print("Credenciales:", file=sys.stderr)
+        medir_credenciales(resultados, costos, hilos, logins)
+
+    return {
+        "commit": commit_actual(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "semilla": SEMILLA,
+        "mediciones": resultados.mediciones,
+    }
+
+
+def comparar(anterior: dict, actual: dict):
+    """
+    Imprime la variación porcentual de cada medición respecto de una ejecución anterior.
+
+    La variación se expresa de modo que un valor positivo siempre es una mejora: para las
+    métricas en ops/s y MB/s un valor mayor es mejor; para ms y KiB, uno menor.
+    """
+    previas = {(m["escala"], m["metrica"]): m["valor"] for m in anterior["mediciones"]}
+    print(f"Comparación con {anterior.get('commit')}:", file=sys.stderr)
+    for medicion in actual["mediciones"]:
+        previa = previas.get((medicion["escala"], medicion["metrica"]))
+        if not previa:
+            continue
+        variacion = 100 * (medicion["valor"] - previa) / previa
+        if medicion["unidad"] not in ("ops/s", "MB/s"):
+            variacion = -variacion
+        estado = "igual" if abs(variacion) < 0.05 else "mejor" if variacion > 0 else "peor"
+        print(f"  {medicion['escala']:>10} {medicion['metrica']:<32} {variacion:>+8.1f}% ({estado})", file=sys.stderr)
+
+
+def _leer_escalas(texto):
+    return [int(float(valor)) for valor in texto.split(",") if valor.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escalas", type=_leer_escalas, default=list(ESCALAS_POR_DEFECTO),
+                        help="tamaños de registro separados por coma, p. ej. 1000,1e6,1e7")
+    parser.add_argument("--operaciones", type=int, default=10_000, help="operaciones por medición de throughput")
+    parser.add_argument("--megabytes", type=int, default=16, help="tamaño de los datos de cifrado en MB")
+    parser.add_argument("--costos", type=_leer_escalas, default=list(COSTOS_POR_DEFECTO),
+                        help="factores de costo de bcrypt separados por coma")
+    parser.add_argument("--hilos", type=_leer_escalas, default=list(HILOS_POR_DEFECTO),
+                        help="cantidades de hilos de verificación y de trabajadores separadas por coma")
+    parser.add_argument("--logins", type=int, default=32, help="inicios de sesión por medición (0 para omitir)")
+    parser.add_argument("--salida", help="archivo JSON de salida (por defecto, salida estándar)")
+    parser.add_argument("--comparar", help="archivo JSON de una ejecución anterior para comparar")
+    args = parser.parse_args()
+
+    informe = ejecutar(args.escalas, args.operaciones, args.megabytes, args.costos, args.hilos, args.logins)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            comparar(json.load(archivo), informe)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(informe, archivo, indent=2, ensure_ascii=False)
+    else:
+        json.dump(informe, sys.stdout, indent=2, ensure_ascii=False)
+        print()
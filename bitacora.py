@@ -0,0 +1,289 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from formato_registros import cargar_filas, guardar_filas
+from membresia import crear_membresia
+from registro_clientes import RegistroClientes
+
+_avisos = logging.getLogger(__name__)
+
+
+class Bitacora:
+    """
+    Bitácora de escritura anticipada (write-ahead log) para el registro de clientes.
+
+    Cada registro, cambio, cancelación o reactivación se agrega como una línea JSON al
+    archivo de bitácora, por lo que el costo de guardar depende de la cantidad de cambios
+    y no del tamaño del registro. Cada cierta cantidad de entradas se escribe una
+    instantánea completa del registro y la bitácora se trunca (compactación). Al iniciar,
+    se carga la última instantánea y se reproducen las entradas posteriores a ella.
+
+    La compactación automática puede hacerse en un hilo propio, para no detener a quien
+    modifica el registro (p. ej. el bucle de eventos del servidor). Con el registro en
+    pausa (ver RegistroConcurrente.pausar_cambios) se copian sus filas y la bitácora actual
+    se renombra a "<bitácora>.anterior"; las entradas siguientes van a una bitácora nueva.
+    La instantánea se escribe después, fuera de la pausa, y recién entonces se elimina la
+    bitácora anterior. Si el proceso se interrumpe antes, se reproducen ambas al iniciar.
+    """
+
+    def __init__(self, ruta_bitacora: str = "datos_clientes.log", ruta_instantanea: str = "datos_clientes.dat",
+                 sincronizar_cada: int = 1, compactar_cada: int = 10000, compactar_en_segundo_plano: bool = False):
+        """
+        Inicializa la bitácora.
+
+        Args:
+            ruta_bitacora (str): Archivo donde se agregan las operaciones.
+            ruta_instantanea (str): Archivo con la última instantánea del registro.
+            sincronizar_cada (int): Cantidad de entradas entre cada fsync. Con 1 cada operación
+                                    se sincroniza a disco; con 0 solo se sincroniza al llamar
+                                    a sincronizar() o cerrar().
+            compactar_cada (int): Cantidad de entradas tras las cuales se escribe una nueva
+                                  instantánea y se trunca la bitácora. Con 0 no se compacta
+                                  automáticamente.
+            compactar_en_segundo_plano (bool): Si la compactación automática se hace en un hilo
+                                               propio. Requiere un registro que implemente
+                                               pausar_cambios(), como RegistroConcurrente.
+        """
+        self._ruta_bitacora = ruta_bitacora
+        self._ruta_instantanea = ruta_instantanea
+        self._sincronizar_cada = sincronizar_cada
+        self._compactar_cada = compactar_cada
+        self._registro = None
+        self._archivo = None
+        self._secuencia = 0
+        self._pendientes = 0
+        self._desde_instantanea = 0
+        self._ruta_anterior = ruta_bitacora + ".anterior"
+        # Protege el archivo abierto, que la compactación en segundo plano reemplaza
+        self._candado_archivo = threading.Lock()
+        self._ejecutor = ThreadPoolExecutor(max_workers=1) if compactar_en_segundo_plano else None
+        self._compactacion = None
+
+    @property
+    def registro(self) -> RegistroClientes:
+        """
+        Devuelve el registro asociado a la bitácora.
+        """
+        return self._registro
+
+    def cargar(self, clase_registro=RegistroClientes) -> RegistroClientes:
+        """
+        Carga la última instantánea, reproduce la bitácora y comienza a registrar cambios.
+
+        Args:
+            clase_registro (type): Clase del registro a construir, p. ej. RegistroConcurrente.
+
+        Returns:
+            RegistroClientes: Registro con el estado más reciente.
+        """
+        registro, secuencia = self._leer_instantanea(clase_registro)
+        self._desde_instantanea = 0
+        # La bitácora anterior solo existe si una compactación en segundo plano no terminó
+        for ruta in (self._ruta_anterior, self._ruta_bitacora):
+            for entrada in self._leer_bitacora(ruta):
+                if entrada["seq"] <= secuencia:
+                    continue
+                _aplicar_entrada(registro, entrada)
+                secuencia = entrada["seq"]
+                self._desde_instantanea += 1
+
+        self._secuencia = secuencia
+        self.conectar(registro)
+        if os.path.exists(self._ruta_anterior):
+            self.compactar()
+        return registro
+
+    def conectar(self, registro: RegistroClientes):
+        """
+        Comienza a registrar en la bitácora los cambios de un registro ya cargado en memoria.
+
+        cargar() lo llama automáticamente. Para un registro construido de otra forma, conviene
+        llamar a compactar() después, de modo que la instantánea refleje su estado inicial.
+
+        Args:
+            registro (RegistroClientes): Registro cuyos cambios se agregarán a la bitácora.
+        """
+        self._registro = registro
+        self._archivo = open(self._ruta_bitacora, "a", encoding="utf-8")
+        registro.suscribir(self.registrar_evento)
+
+    def _leer_instantanea(self, clase_registro):
+        if not os.path.exists(self._ruta_instantanea):
+            return clase_registro(), 0
+        # Lanza ValueError si el archivo no está en el formato binario de registros
+        filas, secuencia = cargar_filas(self._ruta_instantanea)
+        return clase_registro.desde_filas(filas), secuencia
+
+    def _leer_bitacora(self, ruta):
+        if not os.path.exists(ruta):
+            return
+        valido = 0
+        with open(ruta, "rb") as archivo:
+            for linea in archivo:
+                # Una línea incompleta al final indica una escritura interrumpida
+                if not linea.endswith(b"\n"):
+                    break
+                try:
+                    entrada = json.loads(linea)
+                except ValueError:
+                    break
+                valido += len(linea)
+                yield entrada
+        if valido < os.path.getsize(ruta):
+            # Descarta la línea incompleta; si quedara, las entradas nuevas se agregarían
+            # detrás de ella y la próxima reproducción se detendría antes de llegar a ellas
+            os.truncate(ruta, valido)
+
+    def registrar_evento(self, operacion, id_cliente, nombre, anterior, nueva):
+        """
+        Agrega una operación del registro a la bitácora. Se usa como oyente del registro.
+
+        Args:
+            operacion (str): "registrar", "cambiar", "cancelar" o "reactivar".
+            id_cliente (int): Identificador del cliente modificado.
+            nombre (str): Nombre del cliente.
+            anterior (Membresia): Membresía previa (None al registrar).
+            nueva (Membresia): Membresía resultante.
+        """
+        self._secuencia += 1
+        entrada = {"seq": self._secuencia, "ts": time.time(), "op": operacion, "id": id_cliente}
+        if operacion == "registrar":
+            entrada["nombre"] = nombre
+            entrada["correo"] = nueva.correo
+            entrada["tarjeta"] = nueva.numero_tarjeta
+        if operacion in ("registrar", "cambiar", "reactivar"):
+            entrada["tipo"] = nueva._codigo
+
+        with self._candado_archivo:
+            self._archivo.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+        self._pendientes += 1
+        self._desde_instantanea += 1
+        if self._sincronizar_cada and self._pendientes >= self._sincronizar_cada:
+            self.sincronizar()
+        if self._compactar_cada and self._desde_instantanea >= self._compactar_cada:
+            if self._ejecutor is None:
+                try:
+                    self.compactar()
+                except Exception:
+                    # La operación ya está en la bitácora; se reintenta tras otras compactar_cada operaciones
+                    self._desde_instantanea = 0
+                    _avisos.exception("No se pudo compactar la bitácora %s.", self._ruta_bitacora)
+            elif self._compactacion is None or self._compactacion.done():
+                self._compactacion = self._ejecutor.submit(self._compactar_en_segundo_plano)
+
+    @contextlib.contextmanager
+    def en_lote(self):
+        """
+        Agrupa las operaciones del bloque en una sola sincronización a disco al terminar.
+
+        Útil para importaciones masivas, donde sincronizar cada entrada dominaría el tiempo.
+        """
+        sincronizar_cada = self._sincronizar_cada
+        self._sincronizar_cada = 0
+        try:
+            yield self
+        finally:
+            self._sincronizar_cada = sincronizar_cada
+            self.sincronizar()
+
+    def sincronizar(self):
+        """
+        Fuerza la escritura a disco de las entradas pendientes.
+        """
+        if self._archivo is None:
+            return
+        with self._candado_archivo:
+            self._archivo.flush()
+            os.fsync(self._archivo.fileno())
+        self._pendientes = 0
+
+    def vaciar(self) -> int:
+        """
+        Entrega al sistema operativo las entradas en búfer, sin esperar a que lleguen al disco.
+
+        Permite separar la parte rápida de la sincronización (que debe ejecutarse en el mismo
+        hilo que escribe) de os.fsync, que puede ejecutarse en otro hilo sobre el descriptor
+        devuelto para agrupar varias operaciones en una sola sincronización.
+
+        Returns:
+            int: Descriptor del archivo de bitácora.
+        """
+        with self._candado_archivo:
+            self._archivo.flush()
+            return self._archivo.fileno()
+
+    def compactar(self):
+        """
+        Escribe una instantánea completa del registro y trunca la bitácora.
+
+        La instantánea se escribe en un archivo temporal y luego reemplaza a la anterior,
+        de modo que una interrupción nunca deja una instantánea a medio escribir. Si el
+        proceso se interrumpe antes de truncar, las entradas ya incluidas en la instantánea
+        se descartan al reproducir la bitácora gracias a su número de secuencia.
+        """
+        self.sincronizar()
+        guardar_filas(self._ruta_instantanea, self._registro.filas(), self._secuencia)
+
+        with self._candado_archivo:
+            self._archivo.close()
+            self._archivo = open(self._ruta_bitacora, "w", encoding="utf-8")
+        self._desde_instantanea = 0
+        if os.path.exists(self._ruta_anterior):
+            os.remove(self._ruta_anterior)
+
+    def _compactar_en_segundo_plano(self):
+        try:
+            with self._registro.pausar_cambios():
+                filas = list(self._registro.filas())
+                secuencia = self._secuencia
+                # Si quedó una bitácora anterior de un intento fallido no se la reemplaza:
+                # la bitácora actual se conserva y sus entradas ya incluidas se omiten al reproducir
+                if not os.path.exists(self._ruta_anterior):
+                    with self._candado_archivo:
+                        self._archivo.flush()
+                        os.fsync(self._archivo.fileno())
+                        self._archivo.close()
+                        os.replace(self._ruta_bitacora, self._ruta_anterior)
+                        self._archivo = open(self._ruta_bitacora, "a", encoding="utf-8")
+                    self._pendientes = 0
+                self._desde_instantanea = 0
+            guardar_filas(self._ruta_instantanea, filas, secuencia)
+            os.remove(self._ruta_anterior)
+        except Exception:
+            # Las operaciones ya están en la bitácora; la próxima compactación lo reintenta
+            _avisos.exception("No se pudo compactar la bitácora %s.", self._ruta_bitacora)
+
+    def cerrar(self):
+        """
+        Espera la compactación en curso, sincroniza las entradas pendientes y cierra la bitácora.
+        """
+        if self._ejecutor is not None:
+            self._ejecutor.shutdown(wait=True)
+            self._ejecutor = None
+        if self._archivo is None:
+            return
+        self.sincronizar()
+        self._archivo.close()
+        self._archivo = None
+        self._registro.desuscribir(self.registrar_evento)
+
+
+def _aplicar_entrada(registro, entrada):
+    """Reproduce una entrada de la bitácora sobre el registro."""
+    operacion = entrada["op"]
+    id_cliente = entrada["id"]
+    if operacion == "registrar":
+        membresia = crear_membresia(entrada["tipo"], entrada["correo"], entrada["tarjeta"])
+        registro.registrar(entrada["nombre"], membresia, id_cliente)
+    elif operacion == "cambiar":
+        registro.cambiar_membresia(id_cliente, entrada["tipo"])
+    elif operacion == "cancelar":
+        registro.cancelar(id_cliente)
+    elif operacion == "reactivar":
+        _, actual = registro.obtener(id_cliente)
+        registro.reactivar(id_cliente, crear_membresia(entrada["tipo"], actual.correo, actual.numero_tarjeta))
@@ -0,0 +1,234 @@
+import hmac
+import os
+import struct
+import threading
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+MAGIA = b"SMBT"
+VERSION_BOVEDA = 1
+PREFIJO_TOKEN = "tok_"
+# Cabecera: magia, versión, verificador de la clave
+_CABECERA = struct.Struct("<4sB8s")
+# Entrada: token, nonce, largo del texto cifrado (le sigue el texto cifrado con su etiqueta)
+_ENTRADA = struct.Struct("<12s12sB")
+_LARGO_TOKEN = 12
+
+
+def cargar_clave_boveda(ruta: str = "clave_boveda.bin") -> bytes:
+    """
+    Carga la clave maestra de la bóveda; si no existe, la genera con permisos restringidos.
+
+    Args:
+        ruta (str): Archivo de la clave.
+
+    Returns:
+        bytes: Clave de 32 bytes.
+    """
+    if not os.path.exists(ruta):
+        descriptor = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, "wb") as archivo:
+            archivo.write(os.urandom(32))
+    with open(ruta, "rb") as archivo:
+        return archivo.read()
+
+
+def es_token(valor: str) -> bool:
+    """
+    Indica si un número de tarjeta ya fue reemplazado por un token de la bóveda.
+
+    Args:
+        valor (str): Número de tarjeta o token.
+
+    Returns:
+        bool: True si el valor es un token.
+    """
+    return valor.startswith(PREFIJO_TOKEN)
+
+
+class BovedaTarjetas:
+    """
+    Bóveda de tokens para los números de tarjeta.
+
+    Cada número de tarjeta se reemplaza en el registro por un token opaco, y la bóveda
+    guarda el número cifrado con AES-GCM (autenticado junto con su token), de modo que
+    la instantánea, la bitácora y cualquier listado solo contienen tokens. Los campos no
+    sensibles siguen en claro, así que listar, filtrar o facturar no descifra nada; el
+    número se descifra únicamente a pedido, de a uno o en lote para un ciclo de cobro.
+
+    El token se deriva del número con HMAC, por lo que la misma tarjeta siempre recibe el
+    mismo token y la bóveda no crece al tokenizarla de nuevo. El archivo solo se agrega:
+    cada entrada nueva se escribe (y se sincroniza a disco) antes de que el token llegue
+    a la bitácora, y una entrada incompleta al final se descarta al cargar.
+    """
+
+    def __init__(self, ruta: str = None, clave: bytes = None, sincronizar: bool = True):
+        """
+        Inicializa la bóveda y carga las entradas guardadas.
+
+        Args:
+            ruta (str, optional): Archivo de la bóveda. Sin archivo, la bóveda solo vive en memoria.
+            clave (bytes, optional): Clave maestra (ver cargar_clave_boveda). Por defecto, una clave aleatoria.
+            sincronizar (bool): Si cada escritura se sincroniza a disco con fsync.
+
+        Raises:
+            ValueError: Si el archivo fue creado con otra clave o no es una bóveda.
+        """
+        clave = os.urandom(32) if clave is None else clave
+        self._clave_tokens = hmac.digest(clave, b"tokens", "sha256")
+        self._cifrador = AESGCM(hmac.digest(clave, b"cifrado", "sha256"))
+        self._verificador = hmac.digest(clave, b"verificador", "sha256")[:8]
+        self._sincronizar = sincronizar
+        self._cifrados = {}
+        self._candado = threading.Lock()
+        self._archivo = None
+        if ruta is not None:
+            largo_valido = self._leer(ruta) if os.path.exists(ruta) else 0
+            self._archivo = open(ruta, "r+b" if largo_valido else "wb")
+            if largo_valido:
+                # Descarta una entrada a medio escribir
+                self._archivo.truncate(largo_valido)
+                self._archivo.seek(largo_valido)
+            else:
+                self._archivo.write(_CABECERA.pack(MAGIA, VERSION_BOVEDA, self._verificador))
+                self._sincronizar_archivo()
+
+    def _leer(self, ruta):
+        with open(ruta, "rb") as archivo:
+            datos = archivo.read()
+        if not datos:
+            return 0
+        if len(datos) < _CABECERA.size:
+            raise ValueError("El archivo no es una bóveda de tarjetas.")
+        magia, version, verificador = _CABECERA.unpack_from(datos)
+        if magia != MAGIA or version != VERSION_BOVEDA:
+            raise ValueError("El archivo no es una bóveda de tarjetas.")
+        if not hmac.compare_digest(verificador, self._verificador):
+            raise ValueError("La clave no corresponde a la bóveda de tarjetas.")
+        posicion = _CABECERA.size
+        while posicion + _ENTRADA.size <= len(datos):
+            token, nonce, largo = _ENTRADA.unpack_from(datos, posicion)
+            fin = posicion + _ENTRADA.size + largo
+            if fin > len(datos):
+                break
+            self._cifrados[token] = nonce + datos[posicion + _ENTRADA.size:fin]
+            posicion = fin
+        return posicion
+
+    def __len__(self):
+        return len(self._cifrados)
+
+    def __contains__(self, token):
+        return self._crudo(token) in self._cifrados
+
+    def _sincronizar_archivo(self):
+        self._archivo.flush()
+        if self._sincronizar:
+            os.fsync(self._archivo.fileno())
+
+    @staticmethod
+    def _crudo(token):
+        if not es_token(token):
+            raise ValueError("El valor no es un token de la bóveda.")
+        return bytes.fromhex(token[len(PREFIJO_TOKEN):])
+
+    def token_de(self, numero_tarjeta: str) -> str:
+        """
+        Calcula el token de un número de tarjeta sin guardarlo en la bóveda.
+        """
+        return PREFIJO_TOKEN + hmac.digest(self._clave_tokens, numero_tarjeta.encode("utf-8"),
+                                           "sha256")[:_LARGO_TOKEN].hex()
+
+    def tokenizar(self, numero_tarjeta: str) -> str:
+        """
+        Guarda un número de tarjeta cifrado y devuelve su token.
+
+        Args:
+            numero_tarjeta (str): Número de tarjeta en claro.
+
+        Returns:
+            str: Token que reemplaza al número.
+        """
+        return self.tokenizar_lote([numero_tarjeta])[0]
+
+    def tokenizar_lote(self, numeros: list) -> list:
+        """
+        Tokeniza varios números de tarjeta con una sola escritura y sincronización a disco.
+
+        Args:
+            numeros (list): Números de tarjeta en claro.
+
+        Returns:
+            list: Token de cada número, en el mismo orden.
+        """
+        tokens = [self.token_de(numero) for numero in numeros]
+        with self._candado:
+            entradas = []
+            for numero, token in zip(numeros, tokens):
+                crudo = self._crudo(token)
+                if crudo in self._cifrados:
+                    continue
+                nonce = os.urandom(12)
+                cifrado = self._cifrador.encrypt(nonce, numero.encode("utf-8"), crudo)
+                self._cifrados[crudo] = nonce + cifrado
+                entradas.append(_ENTRADA.pack(crudo, nonce, len(cifrado)) + cifrado)
+            if entradas and self._archivo is not None:
+                self._archivo.write(b"".join(entradas))
+                self._sincronizar_archivo()
+        return tokens
+
+    def revelar(self, token: str) -> str:
+        """
+        Descifra el número de tarjeta de un token.
+
+        Args:
+            token (str): Token de la bóveda.
+
+        Returns:
+            str: Número de tarjeta en claro.
+
+        Raises:
+            KeyError: Si el token no está en la bóveda.
+            ValueError: Si la entrada fue alterada.
+        """
+        crudo = self._crudo(token)
+        guardado = self._cifrados.get(crudo)
+        if guardado is None:
+            raise KeyError(f"El token {token} no está en la bóveda.")
+        try:
+            return self._cifrador.decrypt(guardado[:12], guardado[12:], crudo).decode("utf-8")
+        except InvalidTag:
+            raise ValueError(f"La entrada del token {token} fue alterada.") from None
+
+    def revelar_lote(self, valores: list) -> list:
+        """
+        Descifra varios tokens de una vez, p. ej. para un ciclo de cobro.
+
+        Cada token distinto se descifra una sola vez, aunque se repita en la lista. Los
+        valores que no son tokens (datos anteriores a la bóveda) se devuelven sin cambios.
+
+        Args:
+            valores (list): Tokens o números de tarjeta.
+
+        Returns:
+            list: Números de tarjeta en claro, en el mismo orden.
+        """
+        revelados = {}
+        resultado = []
+        for valor in valores:
+            numero = revelados.get(valor)
+            if numero is None:
+                numero = revelados[valor] = self.revelar(valor) if es_token(valor) else valor
+            resultado.append(numero)
+        return resultado
+
+    def cerrar(self):
+        """
+        Sincroniza y cierra el archivo de la bóveda.
+        """
+        if self._archivo is not None:
+            self._archivo.flush()
+            os.fsync(self._archivo.fileno())
+            self._archivo.close()
+            self._archivo = None
@@ -0,0 +1,320 @@
+import mmap
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization, hashes, padding
+from cryptography.hazmat.primitives.asymmetric import rsa, padding as asymmetric_padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+def generar_claves_rsa():
+    """Genera un par de claves RSA: clave pública y clave privada."""
+    private_key = rsa.generate_private_key(
+        public_exponent=65537,
+        key_size=2048,
+        backend=default_backend()
+    )
+    public_key = private_key.public_key()
+    return private_key, public_key
+
+def guardar_clave_privada(private_key, archivo_clave):
+    """Guarda la clave privada en un archivo."""
+    pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    with open(archivo_clave, "wb") as f:
+        f.write(pem)
+
+def guardar_clave_publica(public_key, archivo_clave):
+    """Guarda la clave pública en un archivo."""
+    pem = public_key.public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    with open(archivo_clave, "wb") as f:
+        f.write(pem)
+
+def cargar_clave_privada(archivo_clave):
+    """Carga la clave privada desde un archivo."""
+    with open(archivo_clave, "rb") as f:
+        pem = f.read()
+    private_key = serialization.load_pem_private_key(
+        pem,
+        password=None,
+        backend=default_backend()
+    )
+    return private_key
+
+def cargar_clave_publica(archivo_clave):
+    """Carga la clave pública desde un archivo."""
+    with open(archivo_clave, "rb") as f:
+        pem = f.read()
+    public_key = serialization.load_pem_public_key(
+        pem,
+        backend=default_backend()
+    )
+    return public_key
+
+def cifrar_datos_rsa(datos, public_key):
+    """Cifra los datos usando la clave pública RSA."""
+    max_chunk_size = public_key.key_size // 8 - 66  # OAEP con SHA-256 reserva 2 * 32 + 2 bytes
+    bloques_cifrados = []
+    for i in range(0, len(datos), max_chunk_size):
+        chunk = datos[i:i+max_chunk_size]
+        bloques_cifrados.append(public_key.encrypt(
+            chunk,
+            asymmetric_padding.OAEP(
+                mgf=asymmetric_padding.MGF1(algorithm=hashes.SHA256()),
+                algorithm=hashes.SHA256(),
+                label=None
+            )
+        ))
+    return b''.join(bloques_cifrados)
+
+def descifrar_datos_rsa(datos_cifrados, private_key):
+    """Descifra los datos usando la clave privada RSA."""
+    max_chunk_size = private_key.key_size // 8
+    bloques_descifrados = []
+    for i in range(0, len(datos_cifrados), max_chunk_size):
+        chunk = datos_cifrados[i:i+max_chunk_size]
+        bloques_descifrados.append(private_key.decrypt(
+            chunk,
+            asymmetric_padding.OAEP(
+                mgf=asymmetric_padding.MGF1(algorithm=hashes.SHA256()),
+                algorithm=hashes.SHA256(),
+                label=None
+            )
+        ))
+    return b''.join(bloques_descifrados)
+
+def cifrar_datos_hibrido(datos, public_key):
+    """Cifra los datos usando cifrado híbrido (RSA + AES)."""
+    # Genera una clave simétrica aleatoria
+    clave_simetrica = os.urandom(32)  # 256-bit key for AES-256
+
+    # Cifra los datos con la clave simétrica
+    datos_cifrados = cifrar_datos_simetricos(datos, clave_simetrica)
+
+    # Cifra la clave simétrica con la clave pública RSA
+    clave_simetrica_cifrada = cifrar_datos_rsa(clave_simetrica, public_key)
+
+    # Devuelve los datos cifrados y la clave simétrica cifrada
+    return datos_cifrados, clave_simetrica_cifrada
+
+def descifrar_datos_hibrido(datos_cifrados, clave_simetrica_cifrada, private_key):
+    """Descifra los datos usando cifrado híbrido (RSA + AES)."""
+    # Descifra la clave simétrica con la clave privada RSA
+    clave_simetrica = descifrar_datos_rsa(clave_simetrica_cifrada, private_key)
+
+    # Descifra los datos con la clave simétrica
+    datos_descifrados = descifrar_datos_simetricos(datos_cifrados, clave_simetrica)
+
+    return datos_descifrados
+
+def cifrar_datos_simetricos(datos, clave_simetrica):
+    """Cifra datos usando una clave simétrica AES."""
+    iv = os.urandom(16)  # IV aleatorio para cada cifrado
+    cipher = Cipher(algorithms.AES(clave_simetrica), modes.CBC(iv), backend=default_backend())
+    encryptor = cipher.encryptor()
+    padder = padding.PKCS7(algorithms.AES.block_size).padder()
+    datos_padded = padder.update(datos) + padder.finalize()  # Asegúrate de que los datos estén en bytes
+    datos_cifrados = encryptor.update(datos_padded) + encryptor.finalize()
+    return iv + datos_cifrados  # IV al dato cifrado
+
+def descifrar_datos_simetricos(datos_cifrados, clave_simetrica):
+    """Descifra datos usando una clave simétrica AES."""
+    iv = datos_cifrados[:16]  # Extrae el IV del inicio
+    datos_cifrados = datos_cifrados[16:]  # Resto de los datos cifrados
+    cipher = Cipher(algorithms.AES(clave_simetrica), modes.CBC(iv), backend=default_backend())
+    decryptor = cipher.decryptor()
+    unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
+    datos_descifrados_padded = decryptor.update(datos_cifrados) + decryptor.finalize()
+    datos_descifrados = unpadder.update(datos_descifrados_padded) + unpadder.finalize()
+    return datos_descifrados
+
+# --- Cifrado por segmentos (flujos y archivos grandes) ---
+
+MAGIA_FLUJO = b"SMCF"
+VERSION_FLUJO = 1
+SEGMENTO_POR_DEFECTO = 1024 * 1024
+
+# Cabecera: magia, versión, bytes por segmento, prefijo del nonce y largo de la clave envuelta.
+# Le sigue la clave simétrica cifrada con RSA. La clave envuelta no forma parte de los datos
+# autenticados, para que una rotación de claves RSA solo tenga que reescribir la cabecera.
+_CABECERA = struct.Struct(">4sBI8sH")
+# Cada segmento se escribe como: indicador de segmento final, largo del segmento cifrado, datos.
+_MARCO = struct.Struct(">BI")
+# Datos autenticados de cada segmento (además de la cabecera completa): índice e indicador final.
+_DATOS_AUTENTICADOS = struct.Struct(">QB")
+_LARGO_ETIQUETA = 16
+
+
+def cifrar_flujo(origen, destino, public_key, bytes_por_segmento=SEGMENTO_POR_DEFECTO, trabajadores=1):
+    """Cifra un flujo por segmentos con AES-GCM usando memoria constante.
+
+    Cada segmento se autentica junto con la cabecera fija, su índice y si es el último, por lo
+    que reordenar, eliminar o truncar segmentos se detecta al descifrar. Con más de un
+    trabajador los segmentos se cifran en paralelo en un grupo de hilos.
+    """
+    clave_simetrica = AESGCM.generate_key(bit_length=256)
+    prefijo_nonce = os.urandom(8)
+    clave_simetrica_cifrada = cifrar_datos_rsa(clave_simetrica, public_key)
+    cabecera = _CABECERA.pack(MAGIA_FLUJO, VERSION_FLUJO, bytes_por_segmento, prefijo_nonce,
+                              len(clave_simetrica_cifrada))
+    destino.write(cabecera)
+    destino.write(clave_simetrica_cifrada)
+
+    aesgcm = AESGCM(clave_simetrica)
+
+    def cifrar_segmento(indice, segmento, final):
+        return aesgcm.encrypt(_nonce(prefijo_nonce, indice), segmento,
+                              cabecera + _DATOS_AUTENTICADOS.pack(indice, final))
+
+    segmentos = _leer_segmentos(origen, bytes_por_segmento)
+    for final, segmento_cifrado in _procesar_segmentos(segmentos, cifrar_segmento, trabajadores):
+        destino.write(_MARCO.pack(final, len(segmento_cifrado)))
+        destino.write(segmento_cifrado)
+
+
+def descifrar_flujo(origen, destino, private_key, trabajadores=1, gestor=None):
+    """Descifra un flujo generado por cifrar_flujo usando memoria constante.
+
+    Los segmentos se escriben en el destino a medida que se verifican; si un segmento fue
+    alterado se lanza ValueError y el destino debe descartarse. Si se entrega un gestor de
+    claves, la clave simétrica se obtiene de su caché en lugar de descifrarla con RSA.
+    """
+    cabecera, clave_simetrica_cifrada, bytes_por_segmento, prefijo_nonce = _leer_cabecera(origen)
+    if gestor is not None:
+        clave_simetrica = gestor.desenvolver(clave_simetrica_cifrada, private_key)
+    else:
+        clave_simetrica = descifrar_datos_rsa(clave_simetrica_cifrada, private_key)
+    aesgcm = AESGCM(clave_simetrica)
+
+    def descifrar_segmento(indice, segmento_cifrado, final):
+        try:
+            return aesgcm.decrypt(_nonce(prefijo_nonce, indice), segmento_cifrado,
+                                  cabecera + _DATOS_AUTENTICADOS.pack(indice, final))
+        except InvalidTag:
+            raise ValueError(f"El segmento {indice} fue alterado o está fuera de orden.") from None
+
+    segmentos = _leer_marcos(origen, bytes_por_segmento + _LARGO_ETIQUETA)
+    for _, segmento in _procesar_segmentos(segmentos, descifrar_segmento, trabajadores):
+        destino.write(segmento)
+
+
+def cifrar_archivo(ruta_origen, ruta_destino, public_key, bytes_por_segmento=SEGMENTO_POR_DEFECTO,
+                   trabajadores=os.cpu_count()):
+    """Cifra un archivo mapeándolo en memoria y procesando sus segmentos en paralelo."""
+    with open(ruta_origen, "rb") as origen, open(ruta_destino, "wb") as destino:
+        if os.fstat(origen.fileno()).st_size == 0:
+            # mmap no admite archivos vacíos
+            cifrar_flujo(origen, destino, public_key, bytes_por_segmento, trabajadores)
+            return
+        with mmap.mmap(origen.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            cifrar_flujo(mapa, destino, public_key, bytes_por_segmento, trabajadores)
+
+
+def descifrar_archivo(ruta_origen, ruta_destino, private_key, trabajadores=os.cpu_count(), gestor=None):
+    """Descifra un archivo generado por cifrar_archivo procesando sus segmentos en paralelo."""
+    with open(ruta_origen, "rb") as origen, open(ruta_destino, "wb") as destino:
+        with mmap.mmap(origen.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            descifrar_flujo(mapa, destino, private_key, trabajadores, gestor)
+
+
+def reenvolver_archivo(ruta, desenvolver, public_key_nueva):
+    """Reemplaza la clave envuelta de un archivo cifrado por segmentos sin volver a cifrar los datos.
+
+    desenvolver recibe la clave simétrica cifrada y devuelve la clave en claro (por ejemplo,
+    GestorClaves.desenvolver con la clave privada anterior). Solo se reescribe la cabecera,
+    por lo que la clave RSA nueva debe tener el mismo tamaño que la anterior.
+    """
+    with open(ruta, "r+b") as archivo:
+        cabecera, clave_simetrica_cifrada, _, _ = _leer_cabecera(archivo)
+        clave_nueva = cifrar_datos_rsa(desenvolver(clave_simetrica_cifrada), public_key_nueva)
+        if len(clave_nueva) != len(clave_simetrica_cifrada):
+            raise ValueError("La clave RSA nueva debe tener el mismo tamaño que la anterior.")
+        archivo.seek(len(cabecera))
+        archivo.write(clave_nueva)
+
+
+def _leer_cabecera(origen):
+    """Lee la cabecera de un flujo cifrado y devuelve (cabecera fija, clave envuelta, bytes por segmento, prefijo)."""
+    cabecera = _leer_exacto(origen, _CABECERA.size)
+    magia, version, bytes_por_segmento, prefijo_nonce, largo_clave = _CABECERA.unpack(cabecera)
+    if magia != MAGIA_FLUJO or version != VERSION_FLUJO:
+        raise ValueError("El flujo no tiene un formato de cifrado por segmentos reconocido.")
+    return cabecera, _leer_exacto(origen, largo_clave), bytes_por_segmento, prefijo_nonce
+
+
+def _nonce(prefijo_nonce, indice):
+    """Construye el nonce de 96 bits de un segmento a partir del prefijo aleatorio y su índice."""
+    return prefijo_nonce + struct.pack(">I", indice)
+
+
+def _leer_exacto(origen, cantidad):
+    """Lee exactamente la cantidad de bytes pedida o lanza ValueError si el flujo termina antes."""
+    datos = origen.read(cantidad)
+    if len(datos) != cantidad:
+        raise ValueError("El flujo cifrado está truncado.")
+    return datos
+
+
+def _leer_segmentos(origen, bytes_por_segmento):
+    """Genera tuplas (índice, segmento, final) leyendo un segmento por adelantado para detectar el último."""
+    indice = 0
+    segmento = origen.read(bytes_por_segmento)
+    while True:
+        siguiente = origen.read(bytes_por_segmento) if segmento else b""
+        final = not siguiente
+        yield indice, segmento, int(final)
+        if final:
+            return
+        indice += 1
+        segmento = siguiente
+
+
+def _leer_marcos(origen, largo_maximo):
+    """Genera tuplas (índice, segmento cifrado, final) a partir de los marcos de un flujo cifrado."""
+    indice = 0
+    while True:
+        marco = origen.read(_MARCO.size)
+        if not marco:
+            raise ValueError("El flujo cifrado está truncado: falta el segmento final.")
+        if len(marco) != _MARCO.size:
+            raise ValueError("El flujo cifrado está truncado.")
+        final, largo = _MARCO.unpack(marco)
+        if largo > largo_maximo:
+            raise ValueError(f"El segmento {indice} declara un largo inválido.")
+        yield indice, _leer_exacto(origen, largo), final
+        if final:
+            if origen.read(1):
+                raise ValueError("El flujo cifrado contiene datos después del segmento final.")
+            return
+        indice += 1
+
+
+def _procesar_segmentos(segmentos, funcion, trabajadores):
+    """Aplica funcion a cada segmento y genera (final, resultado) en orden.
+
+    Con varios trabajadores se mantiene una ventana acotada de segmentos en vuelo, de modo
+    que la memoria usada depende del número de trabajadores y no del tamaño del flujo.
+    """
+    if not trabajadores or trabajadores <= 1:
+        for indice, segmento, final in segmentos:
+            yield final, funcion(indice, segmento, final)
+        return
+
+    ventana = trabajadores * 2
+    with ThreadPoolExecutor(max_workers=trabajadores) as ejecutor:
+        en_vuelo = []
+        for indice, segmento, final in segmentos:
+            en_vuelo.append((final, ejecutor.submit(funcion, indice, segmento, final)))
+            if len(en_vuelo) >= ventana:
+                final_listo, futuro = en_vuelo.pop(0)
+                yield final_listo, futuro.result()
+        for final_listo, futuro in en_vuelo:
+            yield final_listo, futuro.result()
@@ -0,0 +1,391 @@
+import json
+import os
+import threading
+import weakref
+
+from membresia import Familiar
+
+# Clasificaciones del catálogo, de menor a mayor restricción de edad
+CLASIFICACIONES = ("TE", "TE+7", "14", "18")
+BITS_POR_BLOQUE = 4096
+_NIVELES = {clasificacion: nivel for nivel, clasificacion in enumerate(CLASIFICACIONES)}
+
+
+def nivel_clasificacion(clasificacion: str) -> int:
+    """
+    Devuelve la posición de una clasificación en CLASIFICACIONES.
+
+    Raises:
+        ValueError: Si la clasificación no existe.
+    """
+    nivel = _NIVELES.get(clasificacion)
+    if nivel is None:
+        raise ValueError(f"Clasificación no válida: {clasificacion}. Opciones: {', '.join(CLASIFICACIONES)}.")
+    return nivel
+
+
+class PerfilParental:
+    """
+    Perfil de un hogar con sus reglas de control parental.
+
+    Un título es visible para el perfil si su clasificación no supera la clasificación
+    máxima y no tiene ninguna de las etiquetas bloqueadas. Cada cambio de reglas aumenta
+    la versión del perfil, lo que invalida su filtro compilado en los catálogos.
+    """
+
+    def __init__(self, nombre: str, clasificacion_maxima: str = CLASIFICACIONES[-1], etiquetas_bloqueadas=()):
+        """
+        Inicializa el perfil.
+
+        Args:
+            nombre (str): Nombre del perfil dentro del hogar.
+            clasificacion_maxima (str): Clasificación más alta permitida (ver CLASIFICACIONES).
+            etiquetas_bloqueadas (iterable): Etiquetas de los títulos que el perfil no puede ver.
+
+        Raises:
+            ValueError: Si la clasificación no existe.
+        """
+        nivel_clasificacion(clasificacion_maxima)
+        self.nombre = nombre
+        self._clasificacion_maxima = clasificacion_maxima
+        self._etiquetas_bloqueadas = frozenset(etiquetas_bloqueadas)
+        self.version = 0
+
+    @property
+    def clasificacion_maxima(self) -> str:
+        """
+        Devuelve la clasificación más alta permitida.
+        """
+        return self._clasificacion_maxima
+
+    @property
+    def etiquetas_bloqueadas(self) -> frozenset:
+        """
+        Devuelve las etiquetas bloqueadas.
+        """
+        return self._etiquetas_bloqueadas
+
+    def modificar(self, clasificacion_maxima: str = None, etiquetas_bloqueadas=None) -> bool:
+        """
+        Cambia las reglas del perfil; los argumentos omitidos conservan su valor.
+
+        Returns:
+            bool: True si alguna regla cambió.
+
+        Raises:
+            ValueError: Si la clasificación no existe.
+        """
+        if clasificacion_maxima is None:
+            clasificacion_maxima = self._clasificacion_maxima
+        nivel_clasificacion(clasificacion_maxima)
+        etiquetas = self._etiquetas_bloqueadas if etiquetas_bloqueadas is None else frozenset(etiquetas_bloqueadas)
+        if (clasificacion_maxima, etiquetas) == (self._clasificacion_maxima, self._etiquetas_bloqueadas):
+            return False
+        self._clasificacion_maxima = clasificacion_maxima
+        self._etiquetas_bloqueadas = etiquetas
+        self.version += 1
+        return True
+
+
+class LibroPerfiles:
+    """
+    Perfiles de control parental de cada hogar, por identificador de cliente.
+
+    Los perfiles se guardan aparte de la membresía, por lo que se conservan al cambiar de
+    tipo, al cancelar y al reactivar; solo pueden crearse o modificarse mientras el cliente
+    tiene una membresía Familiar o Pro. Si se indica un archivo, cada modificación se agrega
+    a él como una línea JSON con las reglas resultantes del perfil y el libro se reconstruye
+    al crearlo; cuando las líneas superan al doble de los perfiles, el archivo se reescribe.
+    """
+
+    def __init__(self, ruta: str = None):
+        """
+        Inicializa el libro.
+
+        Args:
+            ruta (str, optional): Archivo JSON por líneas donde se agregan las modificaciones.
+        """
+        self._ruta = ruta
+        # id_cliente -> nombre del perfil -> PerfilParental
+        self._por_cliente = {}
+        self._total = 0
+        self._candado = threading.Lock()
+        self._registro = None
+        self._archivo = None
+        self._lineas = 0
+        if ruta is not None:
+            if os.path.exists(ruta):
+                self._reproducir(ruta)
+            self._archivo = open(ruta, "a", encoding="utf-8")
+
+    def __len__(self):
+        return self._total
+
+    def _reproducir(self, ruta):
+        with open(ruta, "r", encoding="utf-8") as archivo:
+            for linea in archivo:
+                try:
+                    evento = json.loads(linea)
+                except json.JSONDecodeError:
+                    # Una línea incompleta al final indica una escritura interrumpida
+                    break
+                self._lineas += 1
+                self._aplicar(evento["id"], evento["perfil"], evento["clasificacion"], evento["bloqueadas"])
+
+    def _aplicar(self, id_cliente, nombre, clasificacion_maxima, etiquetas_bloqueadas):
+        perfiles = self._por_cliente.setdefault(id_cliente, {})
+        perfil = perfiles.get(nombre)
+        if perfil is None:
+            perfiles[nombre] = PerfilParental(nombre, clasificacion_maxima, etiquetas_bloqueadas)
+            self._total += 1
+        else:
+            perfil.modificar(clasificacion_maxima, etiquetas_bloqueadas)
+
+    @staticmethod
+    def _evento(id_cliente, perfil):
+        return {"id": id_cliente, "perfil": perfil.nombre, "clasificacion": perfil.clasificacion_maxima,
+                "bloqueadas": sorted(perfil.etiquetas_bloqueadas)}
+
+    def _anotar(self, evento):
+        if self._archivo is None:
+            return
+        self._archivo.write(json.dumps(evento, ensure_ascii=False) + "\n")
+        self._archivo.flush()
+        self._lineas += 1
+        if self._lineas > 2 * self._total + 1000:
+            self._compactar()
+
+    def _compactar(self):
+        """Reescribe el archivo con una línea por perfil (archivo temporal, fsync y reemplazo)."""
+        temporal = self._ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            for id_cliente, perfiles in self._por_cliente.items():
+                for perfil in perfiles.values():
+                    archivo.write(json.dumps(self._evento(id_cliente, perfil), ensure_ascii=False) + "\n")
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        self._archivo.close()
+        os.replace(temporal, self._ruta)
+        self._archivo = open(self._ruta, "a", encoding="utf-8")
+        self._lineas = self._total
+
+    def conectar(self, registro):
+        """
+        Usa el registro para conocer la membresía de cada suscriptor.
+
+        Args:
+            registro (RegistroClientes): Registro de clientes.
+        """
+        self._registro = registro
+
+    def modificar(self, id_cliente: int, perfil: str, clasificacion_maxima: str = None,
+                  etiquetas_bloqueadas=None) -> PerfilParental:
+        """
+        Crea un perfil con las reglas dadas o cambia las reglas de uno existente.
+
+        Un perfil nuevo parte sin restricciones; los argumentos omitidos conservan su valor.
+        El cambio invalida el filtro compilado del perfil en los catálogos.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            perfil (str): Nombre del perfil dentro del hogar.
+            clasificacion_maxima (str, optional): Clasificación más alta permitida (ver CLASIFICACIONES).
+            etiquetas_bloqueadas (iterable, optional): Etiquetas que el perfil no puede ver.
+
+        Returns:
+            PerfilParental: Perfil creado o modificado.
+
+        Raises:
+            KeyError: Si el cliente no existe o no está activo.
+            ValueError: Si la membresía no tiene control parental o la clasificación no existe.
+        """
+        if not self._registro.esta_activo(id_cliente):
+            raise KeyError(f"No existe un cliente activo con identificador {id_cliente}.")
+        _, membresia = self._registro.obtener(id_cliente)
+        if not isinstance(membresia, Familiar):
+            raise ValueError(f"La membresía {type(membresia).__name__} no tiene control parental.")
+        with self._candado:
+            perfiles = self._por_cliente.setdefault(id_cliente, {})
+            resultado = perfiles.get(perfil)
+            if resultado is None:
+                resultado = PerfilParental(perfil, clasificacion_maxima or CLASIFICACIONES[-1],
+                                           etiquetas_bloqueadas or ())
+                perfiles[perfil] = resultado
+                self._total += 1
+            elif not resultado.modificar(clasificacion_maxima, etiquetas_bloqueadas):
+                return resultado
+            self._anotar(self._evento(id_cliente, resultado))
+            return resultado
+
+    def perfiles(self, id_cliente: int) -> dict:
+        """
+        Devuelve los perfiles de control parental de un hogar, por nombre.
+
+        Los perfiles devueltos son los mismos objetos en cada consulta, por lo que su filtro
+        compilado se reutiliza en los catálogos.
+        """
+        with self._candado:
+            return dict(self._por_cliente.get(id_cliente, {}))
+
+    def cerrar(self):
+        """
+        Cierra el archivo.
+        """
+        self._registro = None
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+
+class Catalogo:
+    """
+    Catálogo de títulos indexado con conjuntos de bits para filtrar por perfil parental.
+
+    Cada título ocupa una posición fija, y por cada clasificación y cada etiqueta se
+    guarda un conjunto de bits cuyo bit i indica si el título i la tiene. Las reglas de
+    un perfil se compilan una vez en un conjunto de bits de títulos permitidos (unión de
+    las clasificaciones admitidas menos las etiquetas bloqueadas), de modo que filtrar
+    una página o una sección del catálogo es un AND de bits y no una evaluación de reglas
+    por título. Los conjuntos compilados se guardan en caché por perfil y se descartan
+    cuando cambia la versión del perfil o cuando se agregan títulos al catálogo.
+
+    Los conjuntos se dividen en bloques de BITS_POR_BLOQUE bits (enteros de Python), por
+    lo que una página solo opera sobre los bloques que recorre y no sobre todo el catálogo.
+    """
+
+    def __init__(self):
+        """
+        Inicializa un catálogo vacío.
+        """
+        self._titulos = []
+        self._posiciones = {}
+        # Listas de bloques; una lista más corta que el catálogo tiene ceros en los bloques faltantes
+        self._por_clasificacion = [[] for _ in CLASIFICACIONES]
+        self._por_etiqueta = {}
+        # perfil -> (versión del perfil, bloques permitidos)
+        self._compilados = weakref.WeakKeyDictionary()
+        self.compilaciones = 0
+
+    def __len__(self):
+        return len(self._titulos)
+
+    def agregar(self, titulo: str, clasificacion: str, etiquetas=()) -> int:
+        """
+        Agrega un título al catálogo.
+
+        Args:
+            titulo (str): Identificador del título.
+            clasificacion (str): Clasificación del título (ver CLASIFICACIONES).
+            etiquetas (iterable): Etiquetas del título (género, temas, etc.).
+
+        Returns:
+            int: Posición del título en el catálogo.
+
+        Raises:
+            ValueError: Si el título ya existe o la clasificación no es válida.
+        """
+        nivel = nivel_clasificacion(clasificacion)
+        if titulo in self._posiciones:
+            raise ValueError(f"El título {titulo} ya está en el catálogo.")
+        posicion = len(self._titulos)
+        bloque, desplazamiento = divmod(posicion, BITS_POR_BLOQUE)
+        self._titulos.append(titulo)
+        self._posiciones[titulo] = posicion
+        _marcar(self._por_clasificacion[nivel], bloque, desplazamiento)
+        for etiqueta in set(etiquetas):
+            _marcar(self._por_etiqueta.setdefault(etiqueta, []), bloque, desplazamiento)
+        self._compilados.clear()
+        return posicion
+
+    def _compilar(self, perfil):
+        permitidas = self._por_clasificacion[:nivel_clasificacion(perfil.clasificacion_maxima) + 1]
+        bloqueadas = [self._por_etiqueta.get(etiqueta, []) for etiqueta in perfil.etiquetas_bloqueadas]
+        compilado = []
+        for bloque in range(-(-len(self._titulos) // BITS_POR_BLOQUE)):
+            bits = 0
+            for bloques in permitidas:
+                bits |= _bloque(bloques, bloque)
+            for bloques in bloqueadas:
+                bits &= ~_bloque(bloques, bloque)
+            compilado.append(bits)
+        self.compilaciones += 1
+        return compilado
+
+    def _filtro(self, perfil):
+        compilado = self._compilados.get(perfil)
+        if compilado is None or compilado[0] != perfil.version:
+            compilado = (perfil.version, self._compilar(perfil))
+            self._compilados[perfil] = compilado
+        return compilado[1]
+
+    def permitido(self, titulo: str, perfil: PerfilParental) -> bool:
+        """
+        Indica si un perfil puede ver un título.
+
+        Raises:
+            KeyError: Si el título no está en el catálogo.
+        """
+        bloque, desplazamiento = divmod(self._posiciones[titulo], BITS_POR_BLOQUE)
+        return bool(self._filtro(perfil)[bloque] >> desplazamiento & 1)
+
+    def pagina(self, perfil: PerfilParental = None, desde: int = 0, limite: int = 20, etiqueta: str = None) -> tuple:
+        """
+        Devuelve una página de títulos visibles para un perfil, opcionalmente de una sola etiqueta.
+
+        Args:
+            perfil (PerfilParental, optional): Perfil a aplicar. Sin perfil, todos los títulos son visibles.
+            desde (int): Cursor de la página (el "siguiente" de la página anterior, o 0).
+            limite (int): Cantidad máxima de títulos.
+            etiqueta (str, optional): Solo títulos con esta etiqueta (una sección del catálogo).
+
+        Returns:
+            tuple: Tupla (titulos, siguiente); siguiente es None si no hay más títulos.
+        """
+        compilado = None if perfil is None else self._filtro(perfil)
+        seccion = None if etiqueta is None else self._por_etiqueta.get(etiqueta, [])
+        cantidad_bloques = -(-len(self._titulos) // BITS_POR_BLOQUE)
+        titulos = []
+        bloque, desplazamiento = divmod(desde, BITS_POR_BLOQUE)
+        while bloque < cantidad_bloques:
+            bits = _visibles(compilado, seccion, bloque, len(self._titulos)) >> desplazamiento
+            posicion = bloque * BITS_POR_BLOQUE + desplazamiento
+            while bits:
+                if len(titulos) == limite:
+                    return titulos, posicion
+                # Avanza hasta el bit encendido más bajo
+                salto = (bits & -bits).bit_length()
+                posicion += salto
+                bits >>= salto
+                titulos.append(self._titulos[posicion - 1])
+            bloque += 1
+            desplazamiento = 0
+            if len(titulos) == limite:
+                # El cursor solo se entrega si queda algún título visible más adelante
+                for siguiente in range(bloque, cantidad_bloques):
+                    if _visibles(compilado, seccion, siguiente, len(self._titulos)):
+                        return titulos, siguiente * BITS_POR_BLOQUE
+                return titulos, None
+        return titulos, None
+
+
+def _marcar(bloques, bloque, desplazamiento):
+    """Enciende un bit en una lista de bloques, agregando los bloques que falten."""
+    while len(bloques) <= bloque:
+        bloques.append(0)
+    bloques[bloque] |= 1 << desplazamiento
+
+
+def _bloque(bloques, bloque):
+    return bloques[bloque] if bloque < len(bloques) else 0
+
+
+def _visibles(compilado, seccion, bloque, cantidad):
+    """Bits visibles de un bloque: el filtro del perfil AND la sección, si la hay."""
+    if compilado is None:
+        # Sin perfil, todos los títulos del bloque son visibles
+        bits = (1 << min(BITS_POR_BLOQUE, cantidad - bloque * BITS_POR_BLOQUE)) - 1
+    else:
+        bits = compilado[bloque]
+    if seccion is not None:
+        bits &= _bloque(seccion, bloque)
+    return bits
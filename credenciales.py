@@ -0,0 +1,206 @@
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import bcrypt
+
+from validaciones import validar_contrasena
+
+COSTO_POR_DEFECTO = 12
+
+
+def costo_de(hash_contrasena: bytes) -> int:
+    """
+    Devuelve el factor de costo con el que se generó un hash bcrypt ($2b$<costo>$...).
+
+    Args:
+        hash_contrasena (bytes): Hash bcrypt.
+
+    Returns:
+        int: Factor de costo.
+    """
+    return int(hash_contrasena.split(b"$")[2])
+
+
+class AlmacenCredenciales:
+    """
+    Credenciales de los suscriptores protegidas con bcrypt.
+
+    bcrypt es deliberadamente lento (cientos de milisegundos con el costo por defecto) y
+    libera el GIL, por lo que el hashing y la verificación se ejecutan en un grupo acotado
+    de hilos: el bucle interactivo o el bucle de eventos del servidor nunca se bloquean y
+    varias verificaciones avanzan en paralelo. Cuando una verificación es correcta y el
+    hash fue generado con un costo distinto del configurado, se vuelve a calcular con el
+    costo actual en el mismo hilo de trabajo (rehash transparente).
+
+    Cada contraseña establecida se agrega a una bitácora junto al archivo de hashes y se
+    sincroniza a disco antes de dar la operación por terminada; guardar() reescribe el
+    archivo completo y vacía la bitácora.
+    """
+
+    def __init__(self, ruta: str = None, costo: int = COSTO_POR_DEFECTO, trabajadores: int = None):
+        """
+        Inicializa el almacén.
+
+        Args:
+            ruta (str, optional): Archivo JSON donde se guardan los hashes. Si existe, se carga junto
+                                  con su bitácora (la misma ruta terminada en ".log").
+            costo (int): Factor de costo de bcrypt (4 a 31); cada unidad duplica el tiempo de hashing.
+            trabajadores (int, optional): Hilos del grupo de hashing. Por defecto, uno por núcleo.
+        """
+        self._ruta = ruta
+        self._ruta_bitacora = None if ruta is None else ruta + ".log"
+        self._costo = costo
+        self._hashes = {}
+        self._candado = threading.Lock()
+        self._ejecutor = ThreadPoolExecutor(max_workers=trabajadores or os.cpu_count() or 1,
+                                            thread_name_prefix="bcrypt")
+        # Hash de referencia para verificar identificadores inexistentes en el mismo tiempo
+        self._hash_ficticio = bcrypt.hashpw(os.urandom(16), bcrypt.gensalt(costo))
+        self.rehashes = 0
+        if ruta is not None and os.path.exists(ruta):
+            with open(ruta, "r", encoding="utf-8") as archivo:
+                self._hashes = {int(id_cliente): valor.encode("ascii")
+                                for id_cliente, valor in json.load(archivo).items()}
+        if ruta is not None and os.path.exists(self._ruta_bitacora):
+            self._reproducir()
+
+    def _reproducir(self):
+        valido = 0
+        with open(self._ruta_bitacora, "rb") as archivo:
+            for linea in archivo:
+                try:
+                    entrada = json.loads(linea)
+                except ValueError:
+                    # Una línea incompleta al final indica una escritura interrumpida
+                    break
+                self._hashes[entrada["id"]] = entrada["hash"].encode("ascii")
+                valido += len(linea)
+        # Se descarta la cola incompleta para que las siguientes entradas no queden detrás de ella
+        if valido < os.path.getsize(self._ruta_bitacora):
+            with open(self._ruta_bitacora, "r+b") as archivo:
+                archivo.truncate(valido)
+
+    @property
+    def costo(self) -> int:
+        """
+        Devuelve el factor de costo usado para los hashes nuevos.
+        """
+        return self._costo
+
+    @costo.setter
+    def costo(self, costo: int):
+        """
+        Cambia el factor de costo; los hashes existentes se actualizan al verificarse.
+        """
+        self._costo = costo
+
+    def __contains__(self, id_cliente):
+        return id_cliente in self._hashes
+
+    def _establecer(self, id_cliente, contrasena):
+        hash_contrasena = bcrypt.hashpw(contrasena.encode("utf-8"), bcrypt.gensalt(self._costo))
+        with self._candado:
+            if self._ruta_bitacora is not None:
+                linea = json.dumps({"id": id_cliente, "hash": hash_contrasena.decode("ascii")}) + "\n"
+                descriptor = os.open(self._ruta_bitacora, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+                with os.fdopen(descriptor, "w", encoding="utf-8") as archivo:
+                    archivo.write(linea)
+                    archivo.flush()
+                    os.fsync(archivo.fileno())
+            self._hashes[id_cliente] = hash_contrasena
+
+    def _verificar(self, id_cliente, contrasena):
+        with self._candado:
+            hash_contrasena = self._hashes.get(id_cliente)
+        datos = contrasena.encode("utf-8")
+        if hash_contrasena is None:
+            bcrypt.checkpw(datos, self._hash_ficticio)
+            return False
+        if not bcrypt.checkpw(datos, hash_contrasena):
+            return False
+        if costo_de(hash_contrasena) != self._costo:
+            nuevo_hash = bcrypt.hashpw(datos, bcrypt.gensalt(self._costo))
+            with self._candado:
+                # Solo se reemplaza si la contraseña no cambió mientras tanto
+                if self._hashes.get(id_cliente) == hash_contrasena:
+                    self._hashes[id_cliente] = nuevo_hash
+                    self.rehashes += 1
+        return True
+
+    def establecer(self, id_cliente: int, contrasena: str) -> Future:
+        """
+        Establece la contraseña de un suscriptor en segundo plano.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            contrasena (str): Contraseña en claro.
+
+        Returns:
+            Future: Se completa cuando el hash quedó guardado en disco.
+
+        Raises:
+            ValueError: Si la contraseña no es válida.
+        """
+        validar_contrasena(contrasena)
+        return self._ejecutor.submit(self._establecer, id_cliente, contrasena)
+
+    def verificar(self, id_cliente: int, contrasena: str) -> Future:
+        """
+        Verifica la contraseña de un suscriptor en segundo plano.
+
+        Un identificador sin credenciales tarda lo mismo que una contraseña incorrecta, para
+        no revelar qué suscriptores tienen contraseña.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            contrasena (str): Contraseña en claro.
+
+        Returns:
+            Future: Se completa con True si la contraseña es correcta.
+        """
+        return self._ejecutor.submit(self._verificar, id_cliente, contrasena)
+
+    async def establecer_async(self, id_cliente: int, contrasena: str):
+        """
+        Versión para asyncio de establecer().
+        """
+        validar_contrasena(contrasena)
+        await asyncio.get_running_loop().run_in_executor(self._ejecutor, self._establecer, id_cliente, contrasena)
+
+    async def verificar_async(self, id_cliente: int, contrasena: str) -> bool:
+        """
+        Versión para asyncio de verificar().
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._ejecutor, self._verificar, id_cliente,
+                                                                contrasena)
+
+    def guardar(self):
+        """
+        Guarda los hashes en forma atómica (archivo temporal y reemplazo) y vacía la bitácora.
+        """
+        if self._ruta is None:
+            return
+        # Se mantiene el candado para que ninguna contraseña se agregue a la bitácora entre
+        # la copia de los hashes y el vaciado
+        with self._candado:
+            datos = {str(id_cliente): valor.decode("ascii") for id_cliente, valor in self._hashes.items()}
+            temporal = self._ruta + ".tmp"
+            descriptor = os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(descriptor, "w", encoding="utf-8") as archivo:
+                json.dump(datos, archivo)
+                archivo.flush()
+                os.fsync(archivo.fileno())
+            os.replace(temporal, self._ruta)
+            # Si se interrumpe antes de vaciarla, reproducir la bitácora sobre el archivo nuevo no cambia nada
+            if os.path.exists(self._ruta_bitacora):
+                os.remove(self._ruta_bitacora)
+
+    def cerrar(self):
+        """
+        Espera a que terminen las operaciones pendientes, guarda los hashes y libera los hilos.
+        """
+        self._ejecutor.shutdown(wait=True)
+        self.guardar()
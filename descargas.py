@@ -0,0 +1,284 @@
+import heapq
+import json
+import os
+import threading
+import time
+
+from membresia import SinConexión, Pro
+
+# Títulos que un suscriptor puede tener descargados a la vez, por tipo de membresía. Cada
+# llamada a incrementar_contenido_sin_conexion() de la membresía suma uno a la cuota.
+CUOTAS_SIN_CONEXION = {
+    SinConexión._codigo: 25,
+    Pro._codigo: 50,
+}
+DURACION_LICENCIA = 30 * 24 * 60 * 60
+
+
+class LibroDescargas:
+    """
+    Registro de las descargas para ver sin conexión, con cuotas por tipo de membresía.
+
+    Cada descarga es una licencia (suscriptor, dispositivo, título, vencimiento). Las
+    licencias se indexan por suscriptor y dispositivo, por lo que consultar qué puede
+    conservar un dispositivo recorre solo sus títulos, y la cuota del suscriptor se
+    comprueba con un contador. Los vencimientos se llevan en un montículo: vencer las
+    licencias expiradas extrae solo esas, sin recorrer el resto. Renovar una licencia
+    deja su entrada anterior en el montículo, que se descarta al llegar a la cima; si
+    las entradas descartables superan a las vigentes, el montículo se reconstruye.
+
+    Si se indica un archivo, cada descarga y devolución se agrega a él como una línea
+    JSON y el libro se reconstruye al crearlo; las licencias vencidas no se escriben, ya
+    que su vencimiento está en la propia línea de la descarga.
+    """
+
+    def __init__(self, ruta: str = None, reloj=time.time):
+        """
+        Inicializa el libro.
+
+        Args:
+            ruta (str, optional): Archivo JSON por líneas donde se agregan las operaciones.
+            reloj (callable): Función que devuelve la marca de tiempo actual.
+        """
+        self._reloj = reloj
+        self._ruta = ruta
+        # id_cliente -> dispositivo -> título -> vencimiento
+        self._por_cliente = {}
+        self._cantidades = {}
+        self._vencimientos = []
+        self._total = 0
+        self._candado = threading.Lock()
+        self._registro = None
+        self._archivo = None
+        self._lineas = 0
+        if ruta is not None:
+            if os.path.exists(ruta):
+                self._reproducir(ruta)
+            self._archivo = open(ruta, "a", encoding="utf-8")
+
+    def __len__(self):
+        return self._total
+
+    def _reproducir(self, ruta):
+        with open(ruta, "r", encoding="utf-8") as archivo:
+            for linea in archivo:
+                try:
+                    evento = json.loads(linea)
+                except json.JSONDecodeError:
+                    # Una línea incompleta al final indica una escritura interrumpida
+                    break
+                self._lineas += 1
+                if evento["op"] == "descargar":
+                    self._agregar(evento["id"], evento["dispositivo"], evento["titulo"], evento["vence"])
+                elif evento["op"] == "devolver":
+                    self._quitar(evento["id"], evento["dispositivo"], evento["titulo"])
+                else:
+                    self._quitar_cliente(evento["id"])
+        self._vencer(self._reloj())
+
+    def _anotar(self, evento):
+        if self._archivo is None:
+            return
+        self._archivo.write(json.dumps(evento, ensure_ascii=False) + "\n")
+        self._archivo.flush()
+        self._lineas += 1
+        if self._lineas > 2 * self._total + 1000:
+            self._compactar()
+
+    def _compactar(self):
+        """Reescribe el archivo solo con las licencias vigentes (archivo temporal, fsync y reemplazo)."""
+        temporal = self._ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            for id_cliente, dispositivos in self._por_cliente.items():
+                for dispositivo, titulos in dispositivos.items():
+                    for titulo, vencimiento in titulos.items():
+                        archivo.write(json.dumps({"op": "descargar", "id": id_cliente, "dispositivo": dispositivo,
+                                                  "titulo": titulo, "vence": vencimiento}, ensure_ascii=False) + "\n")
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        self._archivo.close()
+        os.replace(temporal, self._ruta)
+        self._archivo = open(self._ruta, "a", encoding="utf-8")
+        self._lineas = self._total
+
+    def _agregar(self, id_cliente, dispositivo, titulo, vencimiento):
+        titulos = self._por_cliente.setdefault(id_cliente, {}).setdefault(dispositivo, {})
+        if titulo not in titulos:
+            self._cantidades[id_cliente] = self._cantidades.get(id_cliente, 0) + 1
+            self._total += 1
+        titulos[titulo] = vencimiento
+        heapq.heappush(self._vencimientos, (vencimiento, id_cliente, dispositivo, titulo))
+        if len(self._vencimientos) > 2 * self._total + 64:
+            self._reconstruir_vencimientos()
+
+    def _reconstruir_vencimientos(self):
+        self._vencimientos = [(vencimiento, id_cliente, dispositivo, titulo)
+                              for id_cliente, dispositivos in self._por_cliente.items()
+                              for dispositivo, titulos in dispositivos.items()
+                              for titulo, vencimiento in titulos.items()]
+        heapq.heapify(self._vencimientos)
+
+    def _quitar(self, id_cliente, dispositivo, titulo):
+        dispositivos = self._por_cliente.get(id_cliente)
+        titulos = dispositivos.get(dispositivo) if dispositivos is not None else None
+        if titulos is None or titulo not in titulos:
+            return False
+        del titulos[titulo]
+        if not titulos:
+            del dispositivos[dispositivo]
+            if not dispositivos:
+                del self._por_cliente[id_cliente]
+        self._cantidades[id_cliente] -= 1
+        if not self._cantidades[id_cliente]:
+            del self._cantidades[id_cliente]
+        self._total -= 1
+        return True
+
+    def _quitar_cliente(self, id_cliente):
+        cantidad = self._cantidades.pop(id_cliente, 0)
+        self._por_cliente.pop(id_cliente, None)
+        self._total -= cantidad
+        return cantidad
+
+    def _vencer(self, ahora):
+        vencidas = 0
+        while self._vencimientos and self._vencimientos[0][0] <= ahora:
+            vencimiento, id_cliente, dispositivo, titulo = heapq.heappop(self._vencimientos)
+            # Una entrada de una licencia renovada o devuelta ya no corresponde al libro
+            vigente = self._por_cliente.get(id_cliente, {}).get(dispositivo, {}).get(titulo)
+            if vigente == vencimiento:
+                self._quitar(id_cliente, dispositivo, titulo)
+                vencidas += 1
+        return vencidas
+
+    def vencer(self) -> int:
+        """
+        Elimina todas las licencias vencidas. Las demás operaciones lo hacen automáticamente.
+
+        Returns:
+            int: Cantidad de licencias eliminadas.
+        """
+        with self._candado:
+            return self._vencer(self._reloj())
+
+    def conectar(self, registro):
+        """
+        Usa el registro para conocer la membresía de cada suscriptor y se suscribe a sus cambios.
+
+        Args:
+            registro (RegistroClientes): Registro de clientes.
+        """
+        self._registro = registro
+        registro.suscribir(self.registrar_evento)
+
+    def registrar_evento(self, operacion, id_cliente, nombre, anterior, nueva):
+        """
+        Revoca las descargas de un suscriptor que cancela o pasa a una membresía sin contenido
+        sin conexión. Se usa como oyente del registro.
+
+        Un cambio a una membresía con menor cuota no revoca las descargas existentes; la
+        nueva cuota se aplica a las descargas siguientes.
+        """
+        if operacion == "cancelar" or (operacion == "cambiar" and nueva._codigo not in CUOTAS_SIN_CONEXION):
+            with self._candado:
+                if self._quitar_cliente(id_cliente):
+                    self._anotar({"op": "revocar", "id": id_cliente})
+
+    def cuota(self, membresia) -> int:
+        """
+        Devuelve la cantidad de títulos que una membresía permite tener descargados a la vez.
+        """
+        return CUOTAS_SIN_CONEXION.get(membresia._codigo, 0) + getattr(membresia, "_contenido_sin_conexion", 0)
+
+    def descargar(self, id_cliente: int, dispositivo: str, titulo: str, duracion: float = DURACION_LICENCIA) -> float:
+        """
+        Registra la descarga de un título en un dispositivo del suscriptor.
+
+        Descargar de nuevo un título que el dispositivo ya tiene renueva su licencia sin
+        consumir cuota.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            dispositivo (str): Identificador del dispositivo.
+            titulo (str): Identificador del título.
+            duracion (float): Segundos de validez de la licencia.
+
+        Returns:
+            float: Marca de tiempo en que vence la licencia.
+
+        Raises:
+            KeyError: Si el cliente no existe o no está activo.
+            ValueError: Si la membresía no permite contenido sin conexión, o si se alcanzó su
+                        cuota de títulos o su límite de dispositivos.
+        """
+        if not self._registro.esta_activo(id_cliente):
+            raise KeyError(f"No existe un cliente activo con identificador {id_cliente}.")
+        _, membresia = self._registro.obtener(id_cliente)
+        cuota = self.cuota(membresia)
+        if not cuota:
+            raise ValueError(f"La membresía {type(membresia).__name__} no permite contenido sin conexión.")
+        with self._candado:
+            ahora = self._reloj()
+            self._vencer(ahora)
+            dispositivos = self._por_cliente.get(id_cliente, {})
+            titulos = dispositivos.get(dispositivo, {})
+            if titulo not in titulos:
+                if self._cantidades.get(id_cliente, 0) >= cuota:
+                    raise ValueError(f"Se alcanzó la cuota de {cuota} títulos sin conexión.")
+                if not titulos and len(dispositivos) >= membresia._dispositivos:
+                    raise ValueError(f"Se alcanzó el límite de {membresia._dispositivos} dispositivo(s) "
+                                     f"con contenido sin conexión.")
+            vencimiento = ahora + duracion
+            self._agregar(id_cliente, dispositivo, titulo, vencimiento)
+            self._anotar({"op": "descargar", "id": id_cliente, "dispositivo": dispositivo, "titulo": titulo,
+                          "vence": vencimiento})
+            return vencimiento
+
+    def devolver(self, id_cliente: int, dispositivo: str, titulo: str) -> bool:
+        """
+        Elimina una descarga y libera su lugar en la cuota.
+
+        Returns:
+            bool: True si la descarga existía.
+        """
+        with self._candado:
+            self._vencer(self._reloj())
+            if not self._quitar(id_cliente, dispositivo, titulo):
+                return False
+            self._anotar({"op": "devolver", "id": id_cliente, "dispositivo": dispositivo, "titulo": titulo})
+            return True
+
+    def disponibles(self, id_cliente: int, dispositivo: str) -> list:
+        """
+        Devuelve los títulos que un dispositivo puede conservar sin conexión.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            dispositivo (str): Identificador del dispositivo.
+
+        Returns:
+            list: Tuplas (titulo, vencimiento), ordenadas por vencimiento.
+        """
+        with self._candado:
+            self._vencer(self._reloj())
+            titulos = self._por_cliente.get(id_cliente, {}).get(dispositivo, {})
+            return sorted(titulos.items(), key=lambda par: par[1])
+
+    def cantidad(self, id_cliente: int) -> int:
+        """
+        Devuelve la cantidad de títulos descargados por un suscriptor, en todos sus dispositivos.
+        """
+        with self._candado:
+            self._vencer(self._reloj())
+            return self._cantidades.get(id_cliente, 0)
+
+    def cerrar(self):
+        """
+        Deja de seguir los cambios del registro y cierra el archivo.
+        """
+        if self._registro is not None:
+            self._registro.desuscribir(self.registrar_evento)
+            self._registro = None
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
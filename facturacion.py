@@ -0,0 +1,232 @@
+import time
+
+import numpy as np
+
+from membresia import TIPOS_MEMBRESIA
+
+SEGUNDOS_POR_DIA = 86400
+COSTOS = np.array([TIPOS_MEMBRESIA[codigo]._costo for codigo in sorted(TIPOS_MEMBRESIA)], dtype=np.float64)
+_SIN_CLIENTE = -1
+
+
+class ResultadoFacturacion:
+    """
+    Resultado de un ciclo de facturación.
+    """
+
+    def __init__(self, cargos: np.ndarray, ingresos_por_tipo: np.ndarray):
+        """
+        Inicializa el resultado.
+
+        Args:
+            cargos (np.ndarray): Monto a cobrar por cliente, indexado por identificador.
+            ingresos_por_tipo (np.ndarray): Ingresos del ciclo por tipo de membresía, indexado por código.
+        """
+        self.cargos = cargos
+        self.ingresos_por_tipo = ingresos_por_tipo
+
+    @property
+    def total(self) -> int:
+        """
+        Devuelve el total facturado en el ciclo.
+        """
+        return int(self.cargos.sum())
+
+    def ingresos_por_nombre(self) -> dict:
+        """
+        Devuelve los ingresos del ciclo con el nombre de cada tipo de membresía.
+        """
+        return {TIPOS_MEMBRESIA[codigo].__name__: int(monto) for codigo, monto in enumerate(self.ingresos_por_tipo)}
+
+    def cobros(self, registro, boveda=None) -> list:
+        """
+        Prepara los cobros del ciclo: solo aquí se necesitan los números de tarjeta.
+
+        Los clientes con cargo se seleccionan sobre el arreglo de cargos, sin tocar las
+        tarjetas, y sus números se descifran en un solo lote.
+
+        Args:
+            registro (RegistroClientes): Registro de clientes.
+            boveda (BovedaTarjetas, optional): Bóveda que descifra las tarjetas tokenizadas.
+
+        Returns:
+            list: Tuplas (id_cliente, numero_tarjeta, monto) de los clientes con cargo.
+        """
+        ids = [int(id_cliente) for id_cliente in np.flatnonzero(self.cargos > 0)]
+        tarjetas = [registro.obtener(id_cliente)[1].numero_tarjeta for id_cliente in ids]
+        if boveda is not None:
+            tarjetas = boveda.revelar_lote(tarjetas)
+        return [(id_cliente, tarjeta, int(self.cargos[id_cliente])) for id_cliente, tarjeta in zip(ids, tarjetas)]
+
+
+class CicloFacturacion:
+    """
+    Ciclo de facturación mensual calculado en forma columnar.
+
+    El estado de cada cliente (tipo, si está activo, inicio del tramo actual, saldo de días
+    gratis y monto acumulado de tramos anteriores) se guarda en arreglos de NumPy indexados por
+    identificador. Como oyente del registro, cada cambio, cancelación o reactivación cierra
+    el tramo del cliente afectado en O(1), prorrateando el costo según los días transcurridos.
+    Al cerrar el ciclo, los tramos abiertos de todos los clientes se calculan en una sola
+    operación vectorizada.
+    """
+
+    def __init__(self, inicio: float = None, dias_ciclo: int = 30, reloj=time.time):
+        """
+        Inicializa un ciclo vacío.
+
+        Args:
+            inicio (float, optional): Marca de tiempo del inicio del ciclo. Por defecto, el momento actual.
+            dias_ciclo (int): Duración del ciclo en días.
+            reloj (callable): Función que devuelve la marca de tiempo actual.
+        """
+        self._reloj = reloj
+        self._inicio = reloj() if inicio is None else inicio
+        self._dias_ciclo = dias_ciclo
+        self._codigos = np.full(0, _SIN_CLIENTE, dtype=np.int8)
+        self._activos = np.zeros(0, dtype=bool)
+        self._inicio_tramo = np.zeros(0, dtype=np.float64)
+        self._dias_gratis = np.zeros(0, dtype=np.float64)
+        self._acumulado = np.zeros(0, dtype=np.float64)
+        self._ingresos_cerrados = np.zeros(len(COSTOS), dtype=np.float64)
+
+    @classmethod
+    def desde_registro(cls, registro, inicio: float = None, dias_ciclo: int = 30, reloj=time.time,
+                       dias_gratis: dict = None) -> 'CicloFacturacion':
+        """
+        Crea el primer ciclo a partir del estado actual del registro y se suscribe a sus cambios.
+
+        Este es el único recorrido por cliente; los ciclos siguientes se obtienen con
+        siguiente_ciclo() a partir de los arreglos.
+
+        Los días de regalo se otorgan con el evento de registro, que los clientes ya presentes
+        en el registro no generan: comienzan sin días de regalo, salvo que su saldo se indique
+        en dias_gratis.
+
+        Args:
+            registro (RegistroClientes): Registro de clientes.
+            inicio (float, optional): Marca de tiempo del inicio del ciclo.
+            dias_ciclo (int): Duración del ciclo en días.
+            reloj (callable): Función que devuelve la marca de tiempo actual.
+            dias_gratis (dict, optional): Saldo de días de regalo de los clientes existentes,
+                                          por identificador.
+
+        Returns:
+            CicloFacturacion: Ciclo suscrito al registro.
+        """
+        ciclo = cls(inicio, dias_ciclo, reloj)
+        ids = []
+        codigos = []
+        for id_cliente, _, membresia in registro.activos():
+            ids.append(id_cliente)
+            codigos.append(membresia._codigo)
+        ciclo._asegurar_capacidad(max(ids, default=0))
+        ciclo._codigos[ids] = codigos
+        ciclo._activos[ids] = True
+        if dias_gratis:
+            ciclo._asegurar_capacidad(max(dias_gratis))
+            ciclo._dias_gratis[list(dias_gratis)] = list(dias_gratis.values())
+        registro.suscribir(ciclo.registrar_evento)
+        return ciclo
+
+    def _asegurar_capacidad(self, id_cliente):
+        capacidad = len(self._codigos)
+        if id_cliente < capacidad:
+            return
+        nueva_capacidad = max(id_cliente + 1, capacidad * 2, 1024)
+        extra = nueva_capacidad - capacidad
+        self._codigos = np.concatenate([self._codigos, np.full(extra, _SIN_CLIENTE, dtype=np.int8)])
+        self._activos = np.concatenate([self._activos, np.zeros(extra, dtype=bool)])
+        self._inicio_tramo = np.concatenate([self._inicio_tramo, np.zeros(extra)])
+        self._dias_gratis = np.concatenate([self._dias_gratis, np.zeros(extra)])
+        self._acumulado = np.concatenate([self._acumulado, np.zeros(extra)])
+
+    def _dia_actual(self):
+        dia = (self._reloj() - self._inicio) / SEGUNDOS_POR_DIA
+        return min(max(dia, 0.0), self._dias_ciclo)
+
+    def _cerrar_tramo(self, id_cliente, dia):
+        """Suma al acumulado del cliente el costo prorrateado de su tramo actual."""
+        if not self._activos[id_cliente]:
+            return
+        codigo = self._codigos[id_cliente]
+        dias = dia - self._inicio_tramo[id_cliente]
+        dias_gratis = min(self._dias_gratis[id_cliente], dias)
+        self._dias_gratis[id_cliente] -= dias_gratis
+        monto = COSTOS[codigo] * (dias - dias_gratis) / self._dias_ciclo
+        self._acumulado[id_cliente] += monto
+        self._ingresos_cerrados[codigo] += monto
+
+    def _abrir_tramo(self, id_cliente, membresia, dia):
+        self._codigos[id_cliente] = membresia._codigo
+        self._activos[id_cliente] = True
+        self._inicio_tramo[id_cliente] = dia
+
+    def registrar_evento(self, operacion, id_cliente, nombre, anterior, nueva):
+        """
+        Actualiza el ciclo ante una modificación del registro. Se usa como oyente del registro.
+
+        Args:
+            operacion (str): "registrar", "cambiar", "cancelar" o "reactivar".
+            id_cliente (int): Identificador del cliente modificado.
+            nombre (str): Nombre del cliente.
+            anterior (Membresia): Membresía previa (None al registrar).
+            nueva (Membresia): Membresía resultante.
+        """
+        dia = self._dia_actual()
+        self._asegurar_capacidad(id_cliente)
+        if operacion == "cancelar":
+            self._cerrar_tramo(id_cliente, dia)
+            self._activos[id_cliente] = False
+            self._codigos[id_cliente] = nueva._codigo
+        else:
+            self._cerrar_tramo(id_cliente, dia)
+            self._abrir_tramo(id_cliente, nueva, dia)
+            if operacion == "registrar":
+                # Los días de regalo se otorgan una sola vez, al registrarse; los cambios y las
+                # reactivaciones conservan el saldo restante en lugar de renovarlo
+                self._dias_gratis[id_cliente] = getattr(nueva, "_dias_regalo", 0)
+
+    def cerrar(self) -> ResultadoFacturacion:
+        """
+        Calcula los cargos del ciclo para todos los clientes.
+
+        Returns:
+            ResultadoFacturacion: Cargos por cliente e ingresos por tipo de membresía.
+        """
+        activos = self._activos
+        codigos = np.where(self._codigos >= 0, self._codigos, 0)
+        dias = np.maximum(self._dias_ciclo - self._inicio_tramo, 0.0)
+        dias_cobrables = np.maximum(dias - self._dias_gratis, 0.0)
+        montos_abiertos = np.where(activos, COSTOS[codigos] * dias_cobrables / self._dias_ciclo, 0.0)
+
+        cargos = np.rint(self._acumulado + montos_abiertos).astype(np.int64)
+        ingresos = self._ingresos_cerrados + np.bincount(codigos, weights=montos_abiertos, minlength=len(COSTOS))
+        return ResultadoFacturacion(cargos, np.rint(ingresos).astype(np.int64))
+
+    def siguiente_ciclo(self, registro=None) -> 'CicloFacturacion':
+        """
+        Crea el ciclo siguiente a partir de los arreglos de este, sin recorrer el registro.
+
+        Los días de regalo no consumidos pasan al ciclo siguiente; solo los clientes activos
+        los consumen, por lo que un cliente cancelado conserva su saldo para cuando se
+        reactive. Si se entrega el registro,
+        el oyente de este ciclo se reemplaza por el del nuevo.
+
+        Args:
+            registro (RegistroClientes, optional): Registro al que está suscrito este ciclo.
+
+        Returns:
+            CicloFacturacion: Nuevo ciclo que comienza al terminar este.
+        """
+        siguiente = CicloFacturacion(self._inicio + self._dias_ciclo * SEGUNDOS_POR_DIA, self._dias_ciclo, self._reloj)
+        dias = np.maximum(self._dias_ciclo - self._inicio_tramo, 0.0)
+        siguiente._codigos = self._codigos.copy()
+        siguiente._activos = self._activos.copy()
+        siguiente._inicio_tramo = np.zeros_like(self._inicio_tramo)
+        siguiente._dias_gratis = np.where(self._activos, np.maximum(self._dias_gratis - dias, 0.0), self._dias_gratis)
+        siguiente._acumulado = np.zeros_like(self._acumulado)
+        if registro is not None:
+            registro.desuscribir(self.registrar_evento)
+            registro.suscribir(siguiente.registrar_evento)
+        return siguiente
@@ -0,0 +1,218 @@
+import os
+import pickle
+import struct
+import sys
+import zlib
+from array import array
+
+from registro_clientes import RegistroClientes
+
+MAGIA = b"SMRB"
+VERSION_FORMATO = 1
+# Cabecera: magia, versión, cantidad de campos, CRC32 del resto del archivo, secuencia, cantidad de filas
+_CABECERA = struct.Struct("<4sBHIQQ")
+# Campo del esquema: tipo y largo del nombre (le sigue el nombre en UTF-8)
+_CAMPO = struct.Struct("<cB")
+# Columna: largo en bytes (le siguen los datos)
+_COLUMNA = struct.Struct("<Q")
+
+# Campos de fila_cliente, en orden. Tipos: "I" entero sin signo de 32 bits, "B" de 8 bits,
+# "?" booleano (un byte) y "s" texto UTF-8.
+ESQUEMA = (
+    ("id_cliente", "I"),
+    ("nombre", "s"),
+    ("correo", "s"),
+    ("numero_tarjeta", "s"),
+    ("tipo", "B"),
+    ("activo", "?"),
+    ("contenido_sin_conexion", "I"),
+)
+_SEPARADOR = "\0"
+
+
+def _codificar_columna(valores, tipo):
+    if tipo == "s":
+        datos = _SEPARADOR.join(valores).encode("utf-8")
+        if datos.count(b"\0") != max(len(valores) - 1, 0):
+            raise ValueError("Los textos no pueden contener el carácter nulo.")
+        return datos
+    columna = array("B" if tipo == "?" else tipo, valores)
+    if sys.byteorder == "big":
+        columna.byteswap()
+    return columna.tobytes()
+
+
+def _decodificar_columna(datos, tipo, cantidad):
+    if tipo == "s":
+        valores = datos.decode("utf-8").split(_SEPARADOR) if cantidad else []
+    else:
+        columna = array("B" if tipo == "?" else tipo)
+        columna.frombytes(datos)
+        if sys.byteorder == "big":
+            columna.byteswap()
+        valores = columna.tolist() if tipo != "?" else [valor != 0 for valor in columna]
+    if len(valores) != cantidad:
+        raise ValueError("La columna no tiene la cantidad de filas indicada en la cabecera.")
+    return valores
+
+
+def codificar_filas(filas, secuencia: int = 0) -> bytes:
+    """
+    Codifica filas de clientes (ver fila_cliente) en el formato binario de registros.
+
+    El formato es columnar: una cabecera con versión, cantidad de filas y el esquema (nombre
+    y tipo de cada campo), y luego una columna por campo. Los enteros se guardan como
+    arreglos de tamaño fijo y los textos como UTF-8 separados por un carácter nulo, por lo
+    que codificar y decodificar no recorren los bytes en Python y no se instancia ninguna
+    clase al leer (a diferencia de pickle, leer un archivo no puede ejecutar código).
+
+    Args:
+        filas (iterable): Tuplas con los campos de ESQUEMA.
+        secuencia (int): Número de secuencia de la bitácora incluido en los datos.
+
+    Returns:
+        bytes: Datos codificados.
+
+    Raises:
+        ValueError: Si un texto contiene el carácter nulo.
+        OverflowError: Si un entero no entra en el tipo de su campo.
+    """
+    filas = list(filas)
+    columnas = list(zip(*filas)) if filas else [()] * len(ESQUEMA)
+    partes = []
+    for nombre, tipo in ESQUEMA:
+        nombre = nombre.encode("utf-8")
+        partes.append(_CAMPO.pack(tipo.encode("ascii"), len(nombre)) + nombre)
+    for (_, tipo), valores in zip(ESQUEMA, columnas):
+        datos = _codificar_columna(valores, tipo)
+        partes.append(_COLUMNA.pack(len(datos)))
+        partes.append(datos)
+    cuerpo = b"".join(partes)
+    return _CABECERA.pack(MAGIA, VERSION_FORMATO, len(ESQUEMA), zlib.crc32(cuerpo), secuencia, len(filas)) + cuerpo
+
+
+def decodificar_filas(datos: bytes) -> tuple:
+    """
+    Decodifica datos producidos por codificar_filas.
+
+    Los campos se ubican por nombre según el esquema de la cabecera, por lo que una versión
+    posterior puede agregar campos sin que esta deje de leer el archivo.
+
+    Args:
+        datos (bytes): Datos codificados.
+
+    Returns:
+        tuple: Tupla (filas, secuencia), donde filas es una lista de tuplas con los campos de ESQUEMA.
+
+    Raises:
+        ValueError: Si los datos no tienen el formato, son de una versión posterior, están
+                    dañados o les falta un campo.
+    """
+    datos = memoryview(datos)
+    if len(datos) < _CABECERA.size or bytes(datos[:4]) != MAGIA:
+        raise ValueError("Los datos no están en el formato binario de registros.")
+    _, version, cantidad_campos, crc, secuencia, cantidad = _CABECERA.unpack_from(datos)
+    if version > VERSION_FORMATO:
+        raise ValueError(f"Versión de formato no soportada: {version}")
+    if zlib.crc32(datos[_CABECERA.size:]) != crc:
+        raise ValueError("Los datos están dañados (CRC incorrecto).")
+
+    posicion = _CABECERA.size
+    esquema = []
+    for _ in range(cantidad_campos):
+        tipo, largo = _CAMPO.unpack_from(datos, posicion)
+        posicion += _CAMPO.size
+        esquema.append((bytes(datos[posicion:posicion + largo]).decode("utf-8"), tipo.decode("ascii")))
+        posicion += largo
+    columnas = {}
+    for nombre, tipo in esquema:
+        (largo,) = _COLUMNA.unpack_from(datos, posicion)
+        posicion += _COLUMNA.size
+        columnas[nombre] = (tipo, datos[posicion:posicion + largo])
+        posicion += largo
+
+    valores = []
+    for nombre, tipo in ESQUEMA:
+        if columnas.get(nombre, (None,))[0] != tipo:
+            raise ValueError(f"Falta el campo {nombre} o su tipo no coincide.")
+        valores.append(_decodificar_columna(bytes(columnas[nombre][1]), tipo, cantidad))
+    return list(zip(*valores)), secuencia
+
+
+def guardar_filas(ruta: str, filas, secuencia: int = 0):
+    """
+    Guarda filas en forma atómica (archivo temporal, fsync y reemplazo).
+
+    Args:
+        ruta (str): Archivo de destino.
+        filas (iterable): Tuplas con los campos de ESQUEMA.
+        secuencia (int): Número de secuencia de la bitácora incluido en los datos.
+    """
+    datos = codificar_filas(filas, secuencia)
+    temporal = ruta + ".tmp"
+    with open(temporal, "wb") as archivo:
+        archivo.write(datos)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(temporal, ruta)
+
+
+def cargar_filas(ruta: str) -> tuple:
+    """
+    Carga las filas de un archivo guardado con guardar_filas.
+
+    Returns:
+        tuple: Tupla (filas, secuencia).
+    """
+    with open(ruta, "rb") as archivo:
+        return decodificar_filas(archivo.read())
+
+
+def cargar_pickle_legado(ruta: str) -> tuple:
+    """
+    Carga una instantánea en pickle de las versiones anteriores.
+
+    Solo debe usarse con archivos propios: cargar un pickle puede ejecutar código arbitrario.
+
+    Args:
+        ruta (str): Archivo pickle.
+
+    Returns:
+        tuple: Tupla (registro, secuencia).
+    """
+    with open(ruta, "rb") as archivo:
+        datos = pickle.load(archivo)
+    if isinstance(datos, dict):
+        return datos["registro"], datos["secuencia"]
+    if isinstance(datos, tuple):
+        # Formato anterior: tupla (clientes_activos, clientes_inactivos)
+        return RegistroClientes.desde_listas(*datos), 0
+    return datos, 0
+
+
+def migrar_pickle(ruta_pickle: str, ruta_destino: str) -> bool:
+    """
+    Convierte una instantánea en pickle al formato binario, si todavía no se convirtió.
+
+    La secuencia se conserva, por lo que la bitácora que acompañaba a la instantánea sigue
+    siendo válida. Una vez escrito el destino, el archivo pickle se elimina: puede contener
+    números de tarjeta en claro, que a partir de ahí solo quedan en el destino hasta que se
+    tokenicen. Si el destino ya existía, el pickle es una copia que dejaron versiones
+    anteriores y también se elimina.
+
+    Args:
+        ruta_pickle (str): Instantánea en pickle.
+        ruta_destino (str): Archivo en el formato binario.
+
+    Returns:
+        bool: True si se hizo la migración; False si el destino ya existía o no hay pickle.
+    """
+    if not os.path.exists(ruta_pickle):
+        return False
+    if os.path.exists(ruta_destino):
+        os.remove(ruta_pickle)
+        return False
+    registro, secuencia = cargar_pickle_legado(ruta_pickle)
+    guardar_filas(ruta_destino, registro.filas(), secuencia)
+    os.remove(ruta_pickle)
+    return True
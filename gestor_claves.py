@@ -0,0 +1,192 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from cifrado import (cargar_clave_privada, cargar_clave_publica, cifrar_datos_rsa, descifrar_datos_rsa,
+                     descifrar_datos_simetricos)
+
+
+class GestorClaves:
+    """
+    Gestor de claves con caché para el cifrado híbrido.
+
+    Mantiene en memoria las claves RSA ya cargadas (se vuelven a leer solo si el archivo PEM
+    cambia) y las claves simétricas ya desenvueltas, en una caché LRU acotada en tamaño y con
+    vencimiento por tiempo. Cada clave desenvuelta se guarda junto a la huella del par RSA
+    que la envolvió, por lo que solo se entrega desde la caché a quien presenta esa misma
+    clave privada. Permite además rotar el par de claves RSA volviendo a envolver
+    únicamente las claves simétricas, sin volver a cifrar los datos.
+    """
+
+    def __init__(self, max_claves: int = 1024, segundos_vigencia: float = 300):
+        """
+        Inicializa el gestor.
+
+        Args:
+            max_claves (int): Cantidad máxima de claves simétricas desenvueltas en caché.
+            segundos_vigencia (float): Tiempo que una clave desenvuelta permanece en caché.
+        """
+        self._max_claves = max_claves
+        self._segundos_vigencia = segundos_vigencia
+        self._claves_rsa = {}
+        self._claves_simetricas = OrderedDict()
+        self._candado = threading.Lock()
+
+    def _cargar_rsa(self, archivo_clave, cargar):
+        ruta = os.path.abspath(archivo_clave)
+        modificacion = os.stat(ruta).st_mtime_ns
+        with self._candado:
+            guardada = self._claves_rsa.get((cargar, ruta))
+        if guardada is not None and guardada[0] == modificacion:
+            return guardada[1]
+        clave = cargar(ruta)
+        with self._candado:
+            self._claves_rsa[(cargar, ruta)] = (modificacion, clave)
+        return clave
+
+    def cargar_clave_privada(self, archivo_clave: str):
+        """
+        Carga una clave privada RSA, reutilizando la ya cargada si el archivo no cambió.
+
+        Args:
+            archivo_clave (str): Ruta del archivo PEM.
+
+        Returns:
+            RSAPrivateKey: Clave privada.
+        """
+        return self._cargar_rsa(archivo_clave, cargar_clave_privada)
+
+    def cargar_clave_publica(self, archivo_clave: str):
+        """
+        Carga una clave pública RSA, reutilizando la ya cargada si el archivo no cambió.
+
+        Args:
+            archivo_clave (str): Ruta del archivo PEM.
+
+        Returns:
+            RSAPublicKey: Clave pública.
+        """
+        return self._cargar_rsa(archivo_clave, cargar_clave_publica)
+
+    def desenvolver(self, clave_simetrica_cifrada: bytes, private_key) -> bytes:
+        """
+        Devuelve la clave simétrica contenida en una clave envuelta con RSA.
+
+        Solo se ejecuta el descifrado RSA si la clave no está en caché o ya venció.
+
+        Args:
+            clave_simetrica_cifrada (bytes): Clave simétrica cifrada con la clave pública RSA.
+            private_key (RSAPrivateKey): Clave privada con la que se envolvió.
+
+        Returns:
+            bytes: Clave simétrica en claro.
+
+        Raises:
+            ValueError: Si la clave privada no corresponde a la que envolvió la clave simétrica.
+            TypeError: Si private_key no es una clave privada RSA; una clave pública nunca
+                       obtiene claves de la caché.
+        """
+        huella = (_huella_rsa(private_key), hashlib.sha256(clave_simetrica_cifrada).digest())
+        ahora = time.monotonic()
+        with self._candado:
+            guardada = self._claves_simetricas.get(huella)
+            if guardada is not None:
+                vencimiento, clave_simetrica = guardada
+                if vencimiento > ahora:
+                    self._claves_simetricas.move_to_end(huella)
+                    return clave_simetrica
+                del self._claves_simetricas[huella]
+
+        clave_simetrica = descifrar_datos_rsa(clave_simetrica_cifrada, private_key)
+        self._guardar_clave_simetrica(huella, clave_simetrica, ahora)
+        return clave_simetrica
+
+    def _guardar_clave_simetrica(self, huella, clave_simetrica, ahora):
+        with self._candado:
+            self._claves_simetricas[huella] = (ahora + self._segundos_vigencia, clave_simetrica)
+            self._claves_simetricas.move_to_end(huella)
+            while len(self._claves_simetricas) > self._max_claves:
+                self._claves_simetricas.popitem(last=False)
+
+    def descifrar_datos_hibrido(self, datos_cifrados: bytes, clave_simetrica_cifrada: bytes, private_key) -> bytes:
+        """
+        Descifra datos producidos por cifrar_datos_hibrido usando la caché de claves.
+
+        Args:
+            datos_cifrados (bytes): Datos cifrados con AES.
+            clave_simetrica_cifrada (bytes): Clave simétrica cifrada con RSA.
+            private_key (RSAPrivateKey): Clave privada RSA.
+
+        Returns:
+            bytes: Datos descifrados.
+        """
+        clave_simetrica = self.desenvolver(clave_simetrica_cifrada, private_key)
+        return descifrar_datos_simetricos(datos_cifrados, clave_simetrica)
+
+    def reenvolver(self, clave_simetrica_cifrada: bytes, private_key_anterior, public_key_nueva) -> bytes:
+        """
+        Vuelve a envolver una clave simétrica con una nueva clave pública RSA.
+
+        Args:
+            clave_simetrica_cifrada (bytes): Clave envuelta con el par de claves anterior.
+            private_key_anterior (RSAPrivateKey): Clave privada del par anterior.
+            public_key_nueva (RSAPublicKey): Clave pública del par nuevo.
+
+        Returns:
+            bytes: Clave simétrica envuelta con la clave pública nueva. Los datos cifrados con
+                   esa clave simétrica no cambian.
+        """
+        clave_simetrica = self.desenvolver(clave_simetrica_cifrada, private_key_anterior)
+        clave_nueva = cifrar_datos_rsa(clave_simetrica, public_key_nueva)
+        # La clave recién envuelta queda en caché para no descifrarla otra vez con RSA
+        self._guardar_clave_simetrica((_huella_publica(public_key_nueva), hashlib.sha256(clave_nueva).digest()),
+                                      clave_simetrica, time.monotonic())
+        return clave_nueva
+
+    def rotar(self, claves_cifradas, private_key_anterior, public_key_nueva) -> dict:
+        """
+        Rota el par de claves RSA volviendo a envolver un conjunto de claves simétricas.
+
+        Args:
+            claves_cifradas (iterable): Claves simétricas envueltas con el par anterior.
+            private_key_anterior (RSAPrivateKey): Clave privada del par anterior.
+            public_key_nueva (RSAPublicKey): Clave pública del par nuevo.
+
+        Returns:
+            dict: Diccionario {clave envuelta anterior: clave envuelta nueva}.
+        """
+        rotadas = {clave: self.reenvolver(clave, private_key_anterior, public_key_nueva)
+                   for clave in set(claves_cifradas)}
+        # Las claves envueltas con el par retirado dejan de entregarse desde la caché
+        huella_anterior = _huella_rsa(private_key_anterior)
+        with self._candado:
+            for clave in rotadas:
+                self._claves_simetricas.pop((huella_anterior, hashlib.sha256(clave).digest()), None)
+        return rotadas
+
+    def limpiar(self):
+        """
+        Elimina de la memoria todas las claves en caché.
+        """
+        with self._candado:
+            self._claves_rsa.clear()
+            self._claves_simetricas.clear()
+
+
+def _huella_rsa(clave_privada) -> bytes:
+    """Huella de un par RSA a partir de su clave privada; se rechaza cualquier otra clave."""
+    if not isinstance(clave_privada, rsa.RSAPrivateKey):
+        raise TypeError("Se esperaba una clave privada RSA.")
+    return _huella_publica(clave_privada.public_key())
+
+
+def _huella_publica(clave_publica) -> bytes:
+    """Huella de un par RSA (SHA-256 de su módulo) a partir de su clave pública."""
+    if not isinstance(clave_publica, rsa.RSAPublicKey):
+        raise TypeError("Se esperaba una clave pública RSA.")
+    modulo = clave_publica.public_numbers().n
+    return hashlib.sha256(modulo.to_bytes((modulo.bit_length() + 7) // 8, "big")).digest()
@@ -0,0 +1,296 @@
+import bisect
+import json
+import os
+import time
+
+from membresia import TIPOS_MEMBRESIA
+
+ABIERTO = float("inf")
+
+
+class IndiceIntervalos:
+    """
+    Índice de intervalos [inicio, fin) agregados en orden de inicio.
+
+    Los inicios se guardan en una lista ordenada y los fines en un árbol de segmentos de
+    máximos. Para encontrar los intervalos que se superponen con [desde, hasta) se busca
+    por bisección el prefijo con inicio < hasta y, dentro de él, se desciende solo por los
+    nodos cuyo fin máximo supera desde, por lo que la consulta cuesta O((k + 1) log n)
+    para k resultados, sin recorrer el historial completo.
+    """
+
+    def __init__(self):
+        self._inicios = []
+        self._datos = []
+        self._capacidad = 1
+        self._arbol = [-ABIERTO, -ABIERTO]
+
+    def __len__(self):
+        return len(self._inicios)
+
+    def agregar(self, inicio: float, fin: float, dato) -> int:
+        """
+        Agrega un intervalo. Los inicios deben llegar en orden no decreciente.
+
+        Args:
+            inicio (float): Comienzo del intervalo.
+            fin (float): Final del intervalo (ABIERTO si todavía no terminó).
+            dato: Valor asociado al intervalo.
+
+        Returns:
+            int: Posición del intervalo, para cerrarlo después.
+
+        Raises:
+            ValueError: Si el inicio es anterior al del último intervalo agregado.
+        """
+        if self._inicios and inicio < self._inicios[-1]:
+            raise ValueError("Los intervalos deben agregarse en orden de inicio.")
+        posicion = len(self._inicios)
+        if posicion == self._capacidad:
+            self._crecer()
+        self._inicios.append(inicio)
+        self._datos.append(dato)
+        self._fijar_fin(posicion, fin)
+        return posicion
+
+    def _crecer(self):
+        hojas = self._arbol[self._capacidad:2 * self._capacidad]
+        self._capacidad *= 2
+        self._arbol = [-ABIERTO] * (2 * self._capacidad)
+        self._arbol[self._capacidad:self._capacidad + len(hojas)] = hojas
+        for nodo in range(self._capacidad - 1, 0, -1):
+            self._arbol[nodo] = max(self._arbol[2 * nodo], self._arbol[2 * nodo + 1])
+
+    def _fijar_fin(self, posicion, fin):
+        nodo = posicion + self._capacidad
+        self._arbol[nodo] = fin
+        nodo //= 2
+        while nodo:
+            self._arbol[nodo] = max(self._arbol[2 * nodo], self._arbol[2 * nodo + 1])
+            nodo //= 2
+
+    def cerrar(self, posicion: int, fin: float):
+        """
+        Fija el final de un intervalo abierto.
+        """
+        self._fijar_fin(posicion, fin)
+
+    def intervalo(self, posicion: int) -> tuple:
+        """
+        Devuelve el intervalo de una posición como tupla (inicio, fin, dato).
+        """
+        return self._inicios[posicion], self._arbol[posicion + self._capacidad], self._datos[posicion]
+
+    def superpuestos(self, desde: float, hasta: float):
+        """
+        Recorre, en orden de inicio, los intervalos que se superponen con [desde, hasta).
+
+        Yields:
+            tuple: Tuplas (inicio, fin, dato).
+        """
+        limite = bisect.bisect_left(self._inicios, hasta)
+        pila = [(1, 0, self._capacidad)]
+        while pila:
+            nodo, izquierda, derecha = pila.pop()
+            if izquierda >= limite or self._arbol[nodo] <= desde:
+                continue
+            if nodo >= self._capacidad:
+                yield self.intervalo(izquierda)
+                continue
+            medio = (izquierda + derecha) // 2
+            pila.append((2 * nodo + 1, medio, derecha))
+            pila.append((2 * nodo, izquierda, medio))
+
+
+class HistorialMembresias:
+    """
+    Historial de los tipos de membresía de cada suscriptor a lo largo del tiempo.
+
+    Como oyente del registro, cada registro, cambio o reactivación abre un intervalo con el
+    tipo de membresía del cliente, y cada cambio o cancelación cierra el anterior. Los
+    intervalos se indexan por suscriptor (para consultar su tipo en un instante) y por tipo
+    de membresía (para consultar quiénes tuvieron un tipo durante un período). Si se indica
+    un archivo, cada evento se agrega a él y el historial se reconstruye al crearlo.
+    """
+
+    def __init__(self, ruta: str = None, reloj=time.time):
+        """
+        Inicializa el historial.
+
+        Args:
+            ruta (str, optional): Archivo JSON por líneas donde se agregan los eventos.
+            reloj (callable): Función que devuelve la marca de tiempo actual.
+        """
+        self._reloj = reloj
+        self._por_tipo = {codigo: IndiceIntervalos() for codigo in TIPOS_MEMBRESIA}
+        # id_cliente -> (inicios, [(codigo, posicion en el índice del tipo)])
+        self._por_cliente = {}
+        self._ultimo_instante = -ABIERTO
+        # Clientes y activos del registro según la última marca "conectado" y los eventos
+        # posteriores; None si el archivo no tiene marca
+        self._clientes = None
+        self._activos = None
+        self._archivo = None
+        if ruta is not None:
+            if os.path.exists(ruta):
+                self._reproducir(ruta)
+            self._archivo = open(ruta, "a", encoding="utf-8")
+
+    def _reproducir(self, ruta):
+        with open(ruta, "r", encoding="utf-8") as archivo:
+            for linea in archivo:
+                try:
+                    evento = json.loads(linea)
+                except json.JSONDecodeError:
+                    # Una línea incompleta al final indica una escritura interrumpida
+                    break
+                if evento["op"] == "conectado":
+                    self._clientes, self._activos = evento["clientes"], evento["activos"]
+                    continue
+                self._aplicar(evento["op"], evento["id"], evento.get("tipo"), evento["ts"])
+
+    def _instante(self):
+        # Los intervalos se indexan en orden de inicio: si el reloj retrocede se usa el último instante
+        self._ultimo_instante = max(self._ultimo_instante, self._reloj())
+        return self._ultimo_instante
+
+    def _aplicar(self, operacion, id_cliente, codigo, instante):
+        self._ultimo_instante = max(self._ultimo_instante, instante)
+        if operacion in ("cambiar", "cancelar"):
+            self._cerrar(id_cliente, instante)
+        if operacion in ("registrar", "inicial", "cambiar", "reactivar"):
+            self._abrir(id_cliente, codigo, instante)
+        if self._clientes is not None:
+            self._clientes += operacion == "registrar"
+            self._activos += (operacion in ("registrar", "reactivar")) - (operacion == "cancelar")
+
+    def _abrir(self, id_cliente, codigo, instante):
+        posicion = self._por_tipo[codigo].agregar(instante, ABIERTO, id_cliente)
+        inicios, tramos = self._por_cliente.setdefault(id_cliente, ([], []))
+        inicios.append(instante)
+        tramos.append((codigo, posicion))
+
+    def _cerrar(self, id_cliente, instante):
+        cliente = self._por_cliente.get(id_cliente)
+        if cliente is None:
+            return
+        codigo, posicion = cliente[1][-1]
+        indice = self._por_tipo[codigo]
+        if indice.intervalo(posicion)[1] == ABIERTO:
+            indice.cerrar(posicion, instante)
+
+    def registrar_evento(self, operacion, id_cliente, nombre, anterior, nueva):
+        """
+        Registra una modificación del registro en el historial. Se usa como oyente del registro.
+
+        Args:
+            operacion (str): "registrar", "cambiar", "cancelar", "reactivar" o "inicial" (cliente
+                             anterior al historial, ver conectar()).
+            id_cliente (int): Identificador del cliente modificado.
+            nombre (str): Nombre del cliente.
+            anterior (Membresia): Membresía previa (None al registrar).
+            nueva (Membresia): Membresía resultante.
+        """
+        instante = self._instante()
+        self._aplicar(operacion, id_cliente, nueva._codigo, instante)
+        if self._archivo is not None:
+            self._archivo.write(json.dumps({"ts": instante, "op": operacion, "id": id_cliente,
+                                            "tipo": nueva._codigo}) + "\n")
+            self._archivo.flush()
+
+    def conectar(self, registro):
+        """
+        Abre un intervalo, desde ahora, para cada cliente activo sin historial, y se suscribe al registro.
+
+        Sirve para comenzar a registrar el historial de un registro que ya tenía clientes. Esos
+        intervalos se guardan con la operación "inicial" y no como altas.
+
+        Al terminar se agrega una marca "conectado" con la cantidad de clientes y de activos
+        del registro. Si al conectar de nuevo esas cantidades, actualizadas con los eventos
+        posteriores, coinciden con las del registro, el historial ya está al día y no se
+        recorren los clientes.
+
+        Args:
+            registro (RegistroClientes): Registro de clientes.
+        """
+        if (self._clientes, self._activos) != (len(registro), registro.total_activos):
+            for id_cliente, nombre, membresia in registro.activos():
+                if id_cliente not in self._por_cliente:
+                    self.registrar_evento("inicial", id_cliente, nombre, None, membresia)
+            self._clientes, self._activos = len(registro), registro.total_activos
+            if self._archivo is not None:
+                self._archivo.write(json.dumps({"ts": self._instante(), "op": "conectado", "clientes": self._clientes,
+                                                "activos": self._activos}) + "\n")
+                self._archivo.flush()
+        registro.suscribir(self.registrar_evento)
+
+    def cerrar(self):
+        """
+        Cierra el archivo del historial.
+        """
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+    def intervalos(self, id_cliente: int) -> list:
+        """
+        Devuelve los intervalos de un suscriptor en orden cronológico.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+
+        Returns:
+            list: Tuplas (tipo, inicio, fin); fin es ABIERTO para el intervalo vigente.
+        """
+        _, tramos = self._por_cliente.get(id_cliente, ([], []))
+        resultado = []
+        for codigo, posicion in tramos:
+            inicio, fin, _ = self._por_tipo[codigo].intervalo(posicion)
+            resultado.append((codigo, inicio, fin))
+        return resultado
+
+    def tipo_en(self, id_cliente: int, instante: float):
+        """
+        Devuelve el tipo de membresía de un suscriptor en un instante.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            instante (float): Marca de tiempo.
+
+        Returns:
+            int: Código del tipo de membresía, o None si el cliente no estaba activo en ese instante.
+        """
+        cliente = self._por_cliente.get(id_cliente)
+        if cliente is None:
+            return None
+        inicios, tramos = cliente
+        i = bisect.bisect_right(inicios, instante) - 1
+        if i < 0:
+            return None
+        codigo, posicion = tramos[i]
+        _, fin, _ = self._por_tipo[codigo].intervalo(posicion)
+        return codigo if instante < fin else None
+
+    def suscriptores_en(self, tipo_membresia: int, desde: float, hasta: float) -> list:
+        """
+        Devuelve los suscriptores que tuvieron un tipo de membresía en algún momento de [desde, hasta).
+
+        Args:
+            tipo_membresia (int): Código del tipo de membresía.
+            desde (float): Comienzo del período.
+            hasta (float): Final del período (excluido).
+
+        Returns:
+            list: Identificadores de los clientes, ordenados.
+        """
+        return sorted({id_cliente for _, _, id_cliente in self._por_tipo[tipo_membresia].superpuestos(desde, hasta)})
+
+    def tramos_en(self, tipo_membresia: int, desde: float, hasta: float) -> list:
+        """
+        Devuelve los intervalos de un tipo recortados a [desde, hasta), p. ej. para conciliar ingresos.
+
+        Returns:
+            list: Tuplas (id_cliente, inicio, fin) dentro del período.
+        """
+        return [(id_cliente, max(inicio, desde), min(fin, hasta))
+                for inicio, fin, id_cliente in self._por_tipo[tipo_membresia].superpuestos(desde, hasta)]
@@ -0,0 +1,201 @@
+import contextlib
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from membresia import crear_membresia
+from validaciones import validar_nombre, validar_correo, validar_numero_tarjeta, validar_tipo_membresia
+
+COLUMNAS = ("nombre", "correo", "numero_tarjeta", "tipo_membresia")
+
+
+class ResultadoImportacion:
+    """
+    Resultado de una importación masiva de clientes.
+    """
+
+    def __init__(self):
+        """
+        Inicializa un resultado vacío.
+        """
+        self.aceptados = 0
+        self.rechazos = []
+
+    def rechazar(self, linea: int, motivo: str):
+        """
+        Registra una fila rechazada.
+
+        Args:
+            linea (int): Número de línea de la fila en el archivo.
+            motivo (str): Motivo del rechazo.
+        """
+        self.rechazos.append((linea, motivo))
+
+
+def leer_filas(ruta: str):
+    """
+    Recorre un archivo CSV o JSONL sin cargarlo completo en memoria.
+
+    Los archivos CSV deben tener encabezado con las columnas nombre, correo, numero_tarjeta
+    y tipo_membresia. Las líneas JSONL se entregan sin decodificar para que el análisis se
+    haga junto con la validación en los procesos trabajadores.
+
+    Args:
+        ruta (str): Ruta del archivo (.csv o .jsonl).
+
+    Yields:
+        tuple: Tuplas (número de línea, fila), donde fila es un diccionario o el texto de la línea JSONL.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    with open(ruta, "r", encoding="utf-8", newline="") as archivo:
+        if extension == ".csv":
+            lector = csv.DictReader(archivo)
+            faltantes = set(COLUMNAS) - set(lector.fieldnames or ())
+            if faltantes:
+                raise ValueError(f"Al archivo le faltan las columnas: {', '.join(sorted(faltantes))}.")
+            for fila in lector:
+                yield lector.line_num, fila
+        elif extension in (".jsonl", ".ndjson"):
+            for numero_linea, linea in enumerate(archivo, start=1):
+                if linea.strip():
+                    yield numero_linea, linea
+        else:
+            raise ValueError(f"Formato de archivo no soportado: {extension}")
+
+
+def validar_fila(fila) -> tuple:
+    """
+    Valida una fila de importación con las mismas reglas del registro interactivo.
+
+    Args:
+        fila (dict | str): Diccionario con las columnas de importación, o una línea JSONL.
+
+    Returns:
+        tuple: Tupla (nombre, correo, numero_tarjeta, tipo_membresia).
+
+    Raises:
+        ValueError: Si la fila no es válida.
+    """
+    if isinstance(fila, str):
+        try:
+            fila = json.loads(fila)
+        except json.JSONDecodeError:
+            raise ValueError("La línea no es un JSON válido.") from None
+        if not isinstance(fila, dict):
+            raise ValueError("La línea debe ser un objeto JSON.")
+
+    faltantes = [columna for columna in COLUMNAS if fila.get(columna) is None]
+    if faltantes:
+        raise ValueError(f"Faltan los campos: {', '.join(faltantes)}.")
+
+    nombre = validar_nombre(str(fila["nombre"]))
+    correo = validar_correo(str(fila["correo"]))
+    numero_tarjeta = validar_numero_tarjeta(str(fila["numero_tarjeta"]))
+    tipo_membresia = validar_tipo_membresia(fila["tipo_membresia"])
+    return nombre, correo, numero_tarjeta, tipo_membresia
+
+
+def validar_lote(lote: list) -> list:
+    """
+    Valida un lote de filas. Se ejecuta en los procesos trabajadores.
+
+    Args:
+        lote (list): Lista de tuplas (número de línea, fila).
+
+    Returns:
+        list: Lista de tuplas (número de línea, datos validados o None, motivo de rechazo o None).
+    """
+    resultados = []
+    for numero_linea, fila in lote:
+        try:
+            resultados.append((numero_linea, validar_fila(fila), None))
+        except ValueError as error:
+            resultados.append((numero_linea, None, str(error)))
+    return resultados
+
+
+def _agrupar(filas, tamano_lote):
+    """Agrupa las filas en listas de a lo más tamano_lote elementos."""
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _validar_lotes(lotes, trabajadores):
+    """Valida los lotes en un grupo de procesos, manteniendo una ventana acotada de lotes en vuelo."""
+    if trabajadores == 1:
+        for lote in lotes:
+            yield validar_lote(lote)
+        return
+
+    with ProcessPoolExecutor(max_workers=trabajadores) as ejecutor:
+        ventana = (trabajadores or os.cpu_count() or 1) * 2
+        en_vuelo = []
+        for lote in lotes:
+            en_vuelo.append(ejecutor.submit(validar_lote, lote))
+            if len(en_vuelo) >= ventana:
+                yield en_vuelo.pop(0).result()
+        for futuro in en_vuelo:
+            yield futuro.result()
+
+
+def importar_clientes(ruta: str, registro, trabajadores: int = None, tamano_lote: int = 5000,
+                      bitacora=None, unicidad=None) -> ResultadoImportacion:
+    """
+    Importa clientes desde un archivo CSV o JSONL.
+
+    El archivo se lee como flujo, las filas se validan por lotes en un grupo de procesos y
+    las filas aceptadas se registran por lotes. Los correos ya registrados (o repetidos
+    dentro del archivo) se rechazan indicando su número de línea; si se entrega un control
+    de unicidad, también las tarjetas repetidas.
+
+    Args:
+        ruta (str): Ruta del archivo a importar.
+        registro (RegistroClientes): Registro donde se agregan los clientes.
+        trabajadores (int, optional): Cantidad de procesos de validación. Por defecto, uno por núcleo.
+        tamano_lote (int): Cantidad de filas por lote de validación e inserción.
+        bitacora (Bitacora, optional): Bitácora del registro; si se entrega, se sincroniza una vez por lote.
+        unicidad (ControlUnicidad, optional): Control de correos y tarjetas repetidos.
+
+    Returns:
+        ResultadoImportacion: Cantidad de clientes aceptados y filas rechazadas.
+    """
+    resultado = ResultadoImportacion()
+    lotes = _agrupar(leer_filas(ruta), tamano_lote)
+    for lote_validado in _validar_lotes(lotes, trabajadores):
+        lineas = []
+        clientes = []
+        for numero_linea, datos, motivo in lote_validado:
+            if datos is None:
+                resultado.rechazar(numero_linea, motivo)
+                continue
+            nombre, correo, numero_tarjeta, tipo_membresia = datos
+            lineas.append(numero_linea)
+            clientes.append((nombre, crear_membresia(tipo_membresia, correo, numero_tarjeta)))
+
+        if unicidad is not None:
+            motivos = unicidad.reservar_lote([(membresia.correo, membresia.numero_tarjeta)
+                                              for _, membresia in clientes])
+            for numero_linea, motivo in zip(lineas, motivos):
+                if motivo:
+                    resultado.rechazar(numero_linea, motivo)
+            lineas = [numero_linea for numero_linea, motivo in zip(lineas, motivos) if not motivo]
+            clientes = [cliente for cliente, motivo in zip(clientes, motivos) if not motivo]
+
+        with bitacora.en_lote() if bitacora is not None else contextlib.nullcontext():
+            ids = registro.registrar_lote(clientes)
+        for numero_linea, id_cliente, (_, membresia) in zip(lineas, ids, clientes):
+            if id_cliente is None:
+                resultado.rechazar(numero_linea, "El correo electrónico ya está registrado.")
+                if unicidad is not None:
+                    unicidad.liberar(membresia.correo, membresia.numero_tarjeta)
+            else:
+                resultado.aceptados += 1
+    resultado.rechazos.sort()
+    return resultado
@@ -0,0 +1,278 @@
+import bisect
+
+TAMANO_BLOQUE = 1000
+
+
+class ListaOrdenada:
+    """
+    Conjunto de enteros ordenado, guardado como una lista de bloques ordenados.
+
+    Agregar o quitar un elemento cuesta O(log n + tamaño de bloque), en lugar del
+    desplazamiento O(n) de una única lista, y recorrer desde un valor cuesta
+    O(log n + elementos recorridos).
+    """
+
+    def __init__(self, valores=()):
+        """
+        Inicializa la lista.
+
+        Args:
+            valores (iterable): Valores iniciales (no necesitan estar ordenados).
+        """
+        ordenados = sorted(set(valores))
+        self._bloques = [ordenados[i:i + TAMANO_BLOQUE] for i in range(0, len(ordenados), TAMANO_BLOQUE)]
+        self._maximos = [bloque[-1] for bloque in self._bloques]
+        self._largo = len(ordenados)
+
+    def __len__(self):
+        return self._largo
+
+    def __contains__(self, valor):
+        i = bisect.bisect_left(self._maximos, valor)
+        if i == len(self._bloques):
+            return False
+        bloque = self._bloques[i]
+        j = bisect.bisect_left(bloque, valor)
+        return j < len(bloque) and bloque[j] == valor
+
+    def __iter__(self):
+        for bloque in self._bloques:
+            yield from bloque
+
+    def agregar(self, valor: int):
+        """
+        Agrega un valor si no estaba presente.
+        """
+        if not self._bloques:
+            self._bloques.append([valor])
+            self._maximos.append(valor)
+            self._largo = 1
+            return
+        i = bisect.bisect_left(self._maximos, valor)
+        if i == len(self._bloques):
+            # Mayor que todos: caso habitual, ya que los identificadores nuevos son crecientes
+            i -= 1
+        bloque = self._bloques[i]
+        j = bisect.bisect_left(bloque, valor)
+        if j < len(bloque) and bloque[j] == valor:
+            return
+        bloque.insert(j, valor)
+        self._maximos[i] = bloque[-1]
+        self._largo += 1
+        if len(bloque) > 2 * TAMANO_BLOQUE:
+            self._bloques[i:i + 1] = [bloque[:TAMANO_BLOQUE], bloque[TAMANO_BLOQUE:]]
+            self._maximos[i:i + 1] = [bloque[TAMANO_BLOQUE - 1], bloque[-1]]
+
+    def quitar(self, valor: int):
+        """
+        Quita un valor si estaba presente.
+        """
+        i = bisect.bisect_left(self._maximos, valor)
+        if i == len(self._bloques):
+            return
+        bloque = self._bloques[i]
+        j = bisect.bisect_left(bloque, valor)
+        if j == len(bloque) or bloque[j] != valor:
+            return
+        del bloque[j]
+        self._largo -= 1
+        if bloque:
+            self._maximos[i] = bloque[-1]
+        else:
+            del self._bloques[i]
+            del self._maximos[i]
+
+    def desde(self, valor: int):
+        """
+        Recorre en orden los elementos estrictamente mayores que un valor.
+
+        Args:
+            valor (int): Valor de referencia.
+
+        Yields:
+            int: Elementos mayores que valor.
+        """
+        i = bisect.bisect_right(self._maximos, valor)
+        if i == len(self._bloques):
+            return
+        bloque = self._bloques[i]
+        yield from bloque[bisect.bisect_right(bloque, valor):]
+        for bloque in self._bloques[i + 1:]:
+            yield from bloque
+
+
+def dominio_de(correo: str) -> str:
+    """
+    Devuelve el dominio de un correo en minúsculas.
+
+    Args:
+        correo (str): Correo electrónico.
+
+    Returns:
+        str: Parte posterior a la última '@'.
+    """
+    return correo.rsplit("@", 1)[-1].lower()
+
+
+class Pagina:
+    """
+    Página de un listado de clientes.
+    """
+
+    def __init__(self, clientes: list, siguiente):
+        """
+        Inicializa la página.
+
+        Args:
+            clientes (list): Tuplas (id_cliente, nombre, membresia).
+            siguiente (int): Cursor para pedir la página siguiente, o None si es la última.
+        """
+        self.clientes = clientes
+        self.siguiente = siguiente
+
+
+class IndiceClientes:
+    """
+    Índices secundarios del registro de clientes para listados paginados y filtrados.
+
+    Mantiene, por tipo de membresía, por estado (activo o inactivo) y por dominio de
+    correo, el conjunto ordenado de identificadores que cumplen cada condición. Como
+    oyente del registro, cada modificación actualiza los índices en O(log n).
+
+    Los listados se paginan con un cursor estable: el identificador del último cliente
+    entregado. A diferencia de una posición en la lista, el cursor no se desplaza cuando
+    otros clientes se cancelan o se registran. Para filtrar se recorre el índice más chico
+    entre los filtros pedidos y el resto de las condiciones se comprueban por cliente.
+
+    Los índices se construyen con el primer listado o conteo, y no al crearlos: con un
+    almacén que se abre sin leer a todos los clientes (ver AlmacenMapeado), el recorrido
+    completo no se paga al iniciar si no se pide ningún listado.
+    """
+
+    def __init__(self, registro):
+        """
+        Se suscribe a los cambios del registro; los índices se construyen al consultarlos.
+
+        Args:
+            registro (RegistroClientes): Registro a indexar.
+        """
+        self._registro = registro
+        self._indices = None
+        registro.suscribir(self.registrar_evento)
+
+    def _construidos(self):
+        if self._indices is None:
+            por_clave = {}
+            for activo, clientes in ((True, self._registro.activos()), (False, self._registro.inactivos())):
+                for id_cliente, _, membresia in clientes:
+                    for clave in self._claves(membresia, activo):
+                        por_clave.setdefault(clave, []).append(id_cliente)
+            self._indices = {clave: ListaOrdenada(ids) for clave, ids in por_clave.items()}
+        return self._indices
+
+    @staticmethod
+    def _claves(membresia, activo):
+        return ("todos",), ("activo", activo), ("tipo", membresia._codigo), ("dominio", dominio_de(membresia.correo))
+
+    def _indice(self, clave):
+        indice = self._indices.get(clave)
+        if indice is None:
+            indice = self._indices[clave] = ListaOrdenada()
+        return indice
+
+    def registrar_evento(self, operacion, id_cliente, nombre, anterior, nueva):
+        """
+        Actualiza los índices ante una modificación del registro. Se usa como oyente del registro.
+
+        Args:
+            operacion (str): "registrar", "cambiar", "cancelar" o "reactivar".
+            id_cliente (int): Identificador del cliente modificado.
+            nombre (str): Nombre del cliente.
+            anterior (Membresia): Membresía previa (None al registrar).
+            nueva (Membresia): Membresía resultante.
+        """
+        if self._indices is None:
+            # Los índices todavía no se construyeron; al construirlos ya incluirán este cambio
+            return
+        claves_nuevas = self._claves(nueva, operacion != "cancelar")
+        if anterior is not None:
+            claves_anteriores = self._claves(anterior, operacion != "reactivar")
+            for clave in claves_anteriores:
+                if clave not in claves_nuevas:
+                    self._indice(clave).quitar(id_cliente)
+        for clave in claves_nuevas:
+            self._indice(clave).agregar(id_cliente)
+
+    def cerrar(self):
+        """
+        Deja de seguir los cambios del registro.
+        """
+        self._registro.desuscribir(self.registrar_evento)
+
+    def _filtros(self, tipo, activo, dominio):
+        filtros = [("todos",)]
+        if activo is not None:
+            filtros.append(("activo", bool(activo)))
+        if tipo is not None:
+            # Se acepta el código numérico o la clase de membresía
+            filtros.append(("tipo", getattr(tipo, "_codigo", tipo)))
+        if dominio is not None:
+            filtros.append(("dominio", dominio.lower()))
+        return filtros
+
+    def contar(self, tipo=None, activo: bool = None, dominio: str = None) -> int:
+        """
+        Cuenta los clientes que cumplen un único filtro en O(1); con varios filtros recorre el índice más chico.
+
+        Args:
+            tipo (int | type, optional): Código o clase de membresía.
+            activo (bool, optional): Estado del cliente.
+            dominio (str, optional): Dominio del correo.
+
+        Returns:
+            int: Cantidad de clientes.
+        """
+        filtros = self._filtros(tipo, activo, dominio)
+        if len(filtros) <= 2:
+            return len(self._construidos().get(filtros[-1], ()))
+        return sum(1 for _ in self._recorrer(0, filtros))
+
+    def _recorrer(self, desde, filtros):
+        # El índice "todos" solo se recorre si no hay otros filtros
+        indices = [self._construidos().get(clave) for clave in filtros[1:] or filtros]
+        if any(indice is None for indice in indices):
+            return
+        indices.sort(key=len)
+        principal, resto = indices[0], indices[1:]
+        for id_cliente in principal.desde(desde):
+            if all(id_cliente in indice for indice in resto):
+                yield id_cliente
+
+    def pagina(self, desde: int = 0, limite: int = 20, tipo=None, activo: bool = None, dominio: str = None) -> Pagina:
+        """
+        Devuelve una página de clientes que cumplen los filtros, en orden de identificador.
+
+        Args:
+            desde (int): Cursor devuelto por la página anterior (0 para la primera).
+            limite (int): Cantidad máxima de clientes de la página.
+            tipo (int | type, optional): Código o clase de membresía.
+            activo (bool, optional): Estado del cliente.
+            dominio (str, optional): Dominio del correo.
+
+        Returns:
+            Pagina: Clientes de la página y cursor de la siguiente.
+
+        Raises:
+            ValueError: Si el límite es menor que 1.
+        """
+        if limite < 1:
+            raise ValueError("El límite de la página debe ser al menos 1.")
+        clientes = []
+        siguiente = None
+        for id_cliente in self._recorrer(desde, self._filtros(tipo, activo, dominio)):
+            if len(clientes) == limite:
+                siguiente = clientes[-1][0]
+                break
+            nombre, membresia = self._registro.obtener(id_cliente)
+            clientes.append((id_cliente, nombre, membresia))
+        return Pagina(clientes, siguiente)
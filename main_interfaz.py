@@ -1,153 +1,71 @@
-import pickle
 import os
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import serialization, hashes, padding
-from cryptography.hazmat.primitives.asymmetric import rsa, padding as asymmetric_padding
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from membresia import Gratis, Basica, Familiar, SinConexión, Pro
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives.serialization import load_pem_private_key
-import bcrypt
+import sys
+from getpass import getpass
+from membresia import Basica, Familiar, SinConexión, Pro, TIPOS_MEMBRESIA
+from registro_clientes import RegistroClientes
+from bitacora import Bitacora
+from almacen_sqlite import AlmacenSQLite
+from almacen_fragmentado import AlmacenFragmentado
+from almacen_mapeado import AlmacenMapeado
+from formato_registros import migrar_pickle
+from importacion import importar_clientes
+from indice_clientes import IndiceClientes
+from unicidad import ControlUnicidad, cargar_clave_huellas
+import metricas
+from historial import HistorialMembresias
+from analitica import AnaliticaSuscriptores
+from credenciales import AlmacenCredenciales
+from control_parental import LibroPerfiles, CLASIFICACIONES
+from boveda_tarjetas import BovedaTarjetas, cargar_clave_boveda
+from validaciones import validar_nombre, validar_correo, validar_numero_tarjeta, validar_tipo_membresia, validar_contrasena
 
 # Archivos de datos
 archivo_activos = "clientes_activos.pickle"
 archivo_inactivos = "clientes_inactivos.pickle"
 archivo_clave_privada = "clave_privada.pem"
 archivo_clave_publica = "clave_publica.pem"
+archivo_unicidad = "datos_clientes.unq"
+archivo_clave_huellas = "clave_huellas.bin"
+archivo_historial = "historial_membresias.log"
+archivo_credenciales = "credenciales.json"
+archivo_perfiles = "perfiles_parentales.log"
+archivo_instantanea = "datos_clientes.dat"
+# Instantánea en pickle de las versiones anteriores; se convierte al iniciar
+archivo_instantanea_pickle = "datos_clientes.pkl"
+archivo_boveda = "boveda_tarjetas.bin"
+archivo_clave_boveda = "clave_boveda.bin"
+archivo_sqlite = "datos_clientes.db"
+carpeta_fragmentos = "datos_clientes"
+archivo_mapeado = "datos_clientes.map"
 
 # Define las variables globales
-clientes_activos = []
-clientes_inactivos = []
+registro = RegistroClientes()
+# Cada operación se agrega a la bitácora; las instantáneas compactan la bitácora periódicamente
+bitacora = Bitacora("datos_clientes.log", archivo_instantanea, sincronizar_cada=1, compactar_cada=1000)
+# Con MEMBRESIAS_ALMACEN=sqlite los clientes se guardan en una base SQLite en lugar de la bitácora, y
+# con MEMBRESIAS_ALMACEN=fragmentado en archivos repartidos por un hash del correo o con
+# MEMBRESIAS_ALMACEN=mapeado en un archivo mapeado en memoria que se decodifica al consultarlo
+ALMACEN = os.environ.get("MEMBRESIAS_ALMACEN", "bitacora")
+fragmentos = AlmacenFragmentado(carpeta_fragmentos)
+# Índices por tipo, estado y dominio para los listados paginados
+indice = IndiceClientes(registro)
+TAMANO_PAGINA = 20
+# Huellas de correos y tarjetas para rechazar duplicados (se carga junto con los datos)
+unicidad = None
+# Intervalos de cada tipo de membresía por cliente, para consultas históricas
+historial = None
+# Activos por tipo, cambios, bajas por período y cohortes, actualizados con cada operación
+analitica = None
+# Contraseñas de los suscriptores; el hashing con bcrypt se hace en un grupo de hilos
+COSTO_BCRYPT = 12
+credenciales = None
+# Perfiles de control parental de los hogares Familiar y Pro, guardados aparte de la membresía
+perfiles = None
+# Números de tarjeta cifrados; el registro y los archivos de datos solo guardan tokens
+boveda = None
 clave_privada_rsa = None
 clave_publica_rsa = None
 
-def generar_claves_rsa():
-    """Genera un par de claves RSA: clave pública y clave privada."""
-    private_key = rsa.generate_private_key(
-        public_exponent=65537,
-        key_size=2048,
-        backend=default_backend()
-    )
-    public_key = private_key.public_key()
-    return private_key, public_key
-
-def guardar_clave_privada(private_key, archivo_clave):
-    """Guarda la clave privada en un archivo."""
-    pem = private_key.private_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PrivateFormat.PKCS8,
-        encryption_algorithm=serialization.NoEncryption(),
-    )
-    with open(archivo_clave, "wb") as f:
-        f.write(pem)
-
-def guardar_clave_publica(public_key, archivo_clave):
-    """Guarda la clave pública en un archivo."""
-    pem = public_key.public_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PublicFormat.SubjectPublicKeyInfo
-    )
-    with open(archivo_clave, "wb") as f:
-        f.write(pem)
-
-def cargar_clave_privada(archivo_clave):
-    """Carga la clave privada desde un archivo."""
-    with open(archivo_clave, "rb") as f:
-        pem = f.read()
-    private_key = serialization.load_pem_private_key(
-        pem,
-        password=None,
-        backend=default_backend()
-    )
-    return private_key
-
-def cargar_clave_publica(archivo_clave):
-    """Carga la clave pública desde un archivo."""
-    with open(archivo_clave, "rb") as f:
-        pem = f.read()
-    public_key = serialization.load_pem_public_key(
-        pem,
-        backend=default_backend()
-    )
-    return public_key
-
-def cifrar_datos_rsa(datos, public_key):
-    """Cifra los datos usando la clave pública RSA."""
-    max_chunk_size = public_key.key_size // 8 - 42  
-    datos_cifrados = b''
-    for i in range(0, len(datos), max_chunk_size):
-        chunk = datos[i:i+max_chunk_size]
-        datos_cifrados += public_key.encrypt(
-            chunk,
-            asymmetric_padding.OAEP(
-                mgf=asymmetric_padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
-            )
-        )
-    return datos_cifrados
-
-def descifrar_datos_rsa(datos_cifrados, private_key):
-    """Descifra los datos usando la clave privada RSA."""
-    max_chunk_size = private_key.key_size // 8
-    datos_descifrados = b''
-    for i in range(0, len(datos_cifrados), max_chunk_size):
-        chunk = datos_cifrados[i:i+max_chunk_size]
-        datos_descifrados += private_key.decrypt(
-            chunk,
-            asymmetric_padding.OAEP(
-                mgf=asymmetric_padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
-            )
-        )
-    return datos_descifrados
-
-def cifrar_datos_hibrido(datos, public_key):
-    """Cifra los datos usando cifrado híbrido (RSA + AES)."""
-    # Genera una clave simétrica aleatoria
-    clave_simetrica = os.urandom(32)  # 256-bit key for AES-256
-
-    # Cifra los datos con la clave simétrica
-    datos_cifrados = cifrar_datos_simetricos(datos, clave_simetrica)
-
-    # Cifra la clave simétrica con la clave pública RSA
-    clave_simetrica_cifrada = cifrar_datos_rsa(clave_simetrica, public_key)
-
-    # Devuelve los datos cifrados y la clave simétrica cifrada
-    return datos_cifrados, clave_simetrica_cifrada
-
-def descifrar_datos_hibrido(datos_cifrados, clave_simetrica_cifrada, private_key):
-    """Descifra los datos usando cifrado híbrido (RSA + AES)."""
-    # Descifra la clave simétrica con la clave privada RSA
-    clave_simetrica = descifrar_datos_rsa(clave_simetrica_cifrada, private_key)
-
-    # Descifra los datos con la clave simétrica
-    datos_descifrados = descifrar_datos_simetricos(datos_cifrados, clave_simetrica)
-
-    return datos_descifrados
-
-def cifrar_datos_simetricos(datos, clave_simetrica):
-    """Cifra datos usando una clave simétrica AES."""
-    iv = os.urandom(16)  # IV aleatorio para cada cifrado
-    cipher = Cipher(algorithms.AES(clave_simetrica), modes.CBC(iv), backend=default_backend())
-    encryptor = cipher.encryptor()
-    padder = padding.PKCS7(algorithms.AES.block_size).padder()
-    datos_padded = padder.update(datos) + padder.finalize()  # Asegúrate de que los datos estén en bytes
-    datos_cifrados = encryptor.update(datos_padded) + encryptor.finalize()
-    return iv + datos_cifrados  # IV al dato cifrado
-
-def descifrar_datos_simetricos(datos_cifrados, clave_simetrica):
-    """Descifra datos usando una clave simétrica AES."""
-    iv = datos_cifrados[:16]  # Extrae el IV del inicio
-    datos_cifrados = datos_cifrados[16:]  # Resto de los datos cifrados
-    cipher = Cipher(algorithms.AES(clave_simetrica), modes.CBC(iv), backend=default_backend())
-    decryptor = cipher.decryptor()
-    unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
-    datos_descifrados_padded = decryptor.update(datos_cifrados) + decryptor.finalize()
-    datos_descifrados = unpadder.update(datos_descifrados_padded) + unpadder.finalize()
-    return datos_descifrados
-
 '''def guardar_datos():
     """Guarda los datos de clientes activos en un archivo cifrado."""
     with open(archivo_activos, "wb") as f:
@@ -169,76 +87,62 @@ def cargar_datos():
 
 # --- Funciones del negocio (cliente, menú, etc) ---
 
-def registrar_cliente():
-    """Solicita la información del cliente y crea una nueva membresía."""
-    while True:
-        primer_nombre = input("Ingresa el primer nombre del cliente: ")
-        if primer_nombre.strip() == "":
-            print("El primer nombre no puede estar vacío. Intenta de nuevo.")
-        elif not all(c.isalpha() or c.isspace() for c in primer_nombre):  # Validación: solo letras y espacios
-            print("El primer nombre solo debe contener letras y espacios. Intenta de nuevo.")
-        else:
-            break
-
-    segundo_nombre = input("Ingresa el segundo nombre del cliente (opcional): ")
-    if segundo_nombre.strip() != "" and not all(c.isalpha() or c.isspace() for c in segundo_nombre):
-        print("El segundo nombre solo debe contener letras y espacios. Intenta de nuevo.")
-        segundo_nombre = ""  # limpiar para vaciar str si es invpalido
-
+def pedir_dato(mensaje, validar):
+    """Solicita un dato hasta que la función de validación lo acepte."""
     while True:
-        apellido_paterno = input("Ingresa el apellido paterno del cliente: ")
-        if apellido_paterno.strip() == "":
-            print("El apellido paterno no puede estar vacío. Intenta de nuevo.")
-        elif not all(c.isalpha() or c.isspace() for c in apellido_paterno):
-            print("El apellido paterno solo debe contener letras y espacios. Intenta de nuevo.")
-        else:
-            break
+        valor = input(mensaje)
+        try:
+            return validar(valor)
+        except ValueError as error:
+            print(f"{error} Intenta de nuevo.")
+
+def pedir_dato_opcional(mensaje, validar):
+    """Solicita un dato opcional; si es inválido se informa y se deja vacío."""
+    valor = input(mensaje)
+    try:
+        return validar(valor)
+    except ValueError as error:
+        print(f"{error} Intenta de nuevo.")
+        return ""  # limpiar para vaciar str si es inválido
+
+def validar_correo_nuevo(correo):
+    """Valida el formato del correo y que no esté registrado."""
+    validar_correo(correo)
+    if registro.buscar_por_correo(correo) is not None or (unicidad is not None and unicidad.correo_registrado(correo)):
+        raise ValueError("El correo electrónico ya está registrado.")
+    return correo
+
+def validar_tarjeta_nueva(numero_tarjeta):
+    """Valida el número de tarjeta y que no esté registrado por otro cliente."""
+    numero_tarjeta = validar_numero_tarjeta(numero_tarjeta)
+    if unicidad is not None and unicidad.tarjeta_registrada(numero_tarjeta):
+        raise ValueError("El número de tarjeta ya está registrado.")
+    return numero_tarjeta
 
-    apellido_materno = input("Ingresa el apellido materno del cliente (opcional): ")
-    if apellido_materno.strip() != "" and not all(c.isalpha() or c.isspace() for c in apellido_materno):
-        print("El apellido materno solo debe contener letras y espacios. Intenta de nuevo.")
-        apellido_materno = ""
+def registrar_cliente():
+    """Solicita la información del cliente y crea una nueva membresía."""
+    primer_nombre = pedir_dato("Ingresa el primer nombre del cliente: ",
+                               lambda valor: validar_nombre(valor, "El primer nombre"))
+    segundo_nombre = pedir_dato_opcional("Ingresa el segundo nombre del cliente (opcional): ",
+                                         lambda valor: validar_nombre(valor, "El segundo nombre", opcional=True))
+    apellido_paterno = pedir_dato("Ingresa el apellido paterno del cliente: ",
+                                  lambda valor: validar_nombre(valor, "El apellido paterno"))
+    apellido_materno = pedir_dato_opcional("Ingresa el apellido materno del cliente (opcional): ",
+                                           lambda valor: validar_nombre(valor, "El apellido materno", opcional=True))
 
     nombre_completo = f"{primer_nombre} {' ' + segundo_nombre if segundo_nombre.strip() else ''} {apellido_paterno} {' ' + apellido_materno if apellido_materno.strip() else ''}"
 
-    while True:
-        correo = input("Ingresa el correo electrónico: ")
-        if correo.strip() == "":
-            print("El correo electrónico no puede estar vacío. Intenta de nuevo.")
-        elif len(correo) < 6 or "@" not in correo:
-            print("El correo electrónico debe tener al menos 6 caracteres e incluir '@'. Intenta de nuevo.")
-        elif correo.index(".") <= correo.index("@") + 1:
-            print("El correo electrónico debe tener un '.' al menos dos posiciones después del '@'. Intenta de nuevo.")
-        elif " " in correo:
-            print("El correo electrónico no puede contener espacios. Intenta de nuevo.")
-        else:
-            break
-
-    while True:
-        numero_tarjeta = input("Ingresa el número de tarjeta (16 dígitos sin espacios): ")
-        if numero_tarjeta.strip() == "":
-            print("El número de tarjeta no puede estar vacío. Intenta de nuevo.")
-        elif not numero_tarjeta.isdigit() or len(numero_tarjeta) != 16:
-            print("El número de tarjeta debe tener 16 dígitos sin espacios. Intenta de nuevo.")
-        else:
-            break
-
-    while True:
-        try:
-            tipo_membresia = int(input(
-                "Elige el tipo de membresía:\n"
-                "1: Básica\n"
-                "2: Familiar\n"
-                "3: Sin Conexión\n"
-                "4: Pro\n"
-                "Ingresa el número: "
-            ))
-            if 1 <= tipo_membresia <= 4:
-                break
-            else:
-                print("Tipo de membresía inválido. Intenta de nuevo.")
-        except ValueError:
-            print("Ingresa un número válido. Intenta de nuevo.")
+    correo = pedir_dato("Ingresa el correo electrónico: ", validar_correo_nuevo)
+    numero_tarjeta = pedir_dato("Ingresa el número de tarjeta (16 dígitos sin espacios): ", validar_tarjeta_nueva)
+    tipo_membresia = pedir_dato(
+        "Elige el tipo de membresía:\n"
+        "1: Básica\n"
+        "2: Familiar\n"
+        "3: Sin Conexión\n"
+        "4: Pro\n"
+        "Ingresa el número: ",
+        validar_tipo_membresia
+    )
 
     if tipo_membresia == 1:
         membresia = Basica(correo, numero_tarjeta)
@@ -249,39 +153,97 @@ def registrar_cliente():
     elif tipo_membresia == 4:
         membresia = Pro(correo, numero_tarjeta)
 
+    # Agrega el cliente al registro de clientes activos
+    try:
+        id_cliente = registro.registrar(nombre_completo, membresia)
+    except ValueError as error:
+        print(f"\nNo se pudo registrar al cliente: {error}")
+        return None
+
     print(f"\nCliente registrado exitosamente!")
     print(f"Nombre: {nombre_completo}")
     print(f"Correo: {membresia.correo}")
     print(f"Membresía: {type(membresia).__name__}")
-
-    # Agrega la membresía a la lista de clientes activos
-    clientes_activos.append((nombre_completo, membresia))
+    pedir_contrasena(id_cliente)
     return membresia
 
+def pedir_contrasena(id_cliente):
+    """Solicita una contraseña opcional y la protege en segundo plano sin detener el menú."""
+    while True:
+        contrasena = getpass("Ingresa una contraseña para el cliente (Enter para omitir): ")
+        if not contrasena:
+            return
+        try:
+            validar_contrasena(contrasena)
+            break
+        except ValueError as error:
+            print(f"{error} Intenta de nuevo.")
+    # El hash se calcula en segundo plano; el menú sigue disponible mientras tanto
+    credenciales.establecer(id_cliente, contrasena).add_done_callback(
+        lambda futuro: informar_error_contrasena(id_cliente, futuro))
+    print("La contraseña se está protegiendo en segundo plano.")
+
+def informar_error_contrasena(id_cliente, futuro):
+    """Avisa si no se pudo guardar la contraseña calculada en segundo plano."""
+    error = futuro.exception()
+    if error is not None:
+        print(f"\nNo se pudo guardar la contraseña del cliente {id_cliente}: {error}")
+
 def mostrar_opciones():
     """Muestra las opciones disponibles al usuario."""
     print("\nBienvenido/a al Sistema de Membresías Streaming! \n Menú de Opciones:")
     print("1: Registrar nuevo cliente")
     print("2: Ver listado de clientes")
     print("3: Administrar membresías")
-    print("4: Salir")
+    print("4: Importar clientes desde archivo (CSV o JSONL)")
+    print("5: Ver estadísticas de suscriptores")
+    print("6: Salir")
 
-def mostrar_clientes(lista_clientes):
-    """Muestra la información de los clientes registrados."""
-    if not lista_clientes:
-        print("\nNo hay clientes registrados.")
-        return
+def mostrar_clientes(activo=True, tipo=None, dominio=None):
+    """Muestra por páginas los clientes que cumplen los filtros, junto a su identificador."""
+    desde = 0
+    while True:
+        pagina = indice.pagina(desde, TAMANO_PAGINA, tipo=tipo, activo=activo, dominio=dominio)
+        if desde == 0:
+            if not pagina.clientes:
+                print("\nNo hay clientes registrados.")
+                return
+            print("\nClientes Registrados:")
+        for id_cliente, nombre, membresia in pagina.clientes:
+            print(f"{id_cliente}. {nombre} - {membresia.correo} - {type(membresia).__name__}")
+
+        if pagina.siguiente is None:
+            return
+        if input("Presiona Enter para ver más clientes o 'q' para continuar: ").strip().lower() == "q":
+            return
+        desde = pagina.siguiente
+
+def ver_listado():
+    """Solicita los filtros del listado y muestra los clientes por páginas."""
+    estado = input("Estado (1: Activos, 2: Inactivos, Enter: Todos): ").strip()
+    tipo = input("Tipo de membresía (0: Gratis, 1: Básica, 2: Familiar, 3: Sin Conexión, 4: Pro, Enter: Todos): ").strip()
+    dominio = input("Dominio del correo, p. ej. ejemplo.com (Enter: Todos): ").strip()
+    mostrar_clientes(activo={"1": True, "2": False}.get(estado),
+                     tipo=int(tipo) if tipo.isdigit() else None,
+                     dominio=dominio or None)
+
+def seleccionar_cliente(activos):
+    """Solicita un cliente por identificador o correo y devuelve su identificador."""
+    while True:
+        entrada = input("Ingresa el número o correo del cliente: ").strip()
+        if entrada.isdigit():
+            id_cliente = int(entrada)
+        else:
+            id_cliente = registro.buscar_por_correo(entrada)
 
-    print("\nClientes Registrados:")
-    for i, (nombre, membresia) in enumerate(lista_clientes):
-        print(f"{i+1}. {nombre} - {type(membresia).__name__}")
+        if id_cliente is not None and id_cliente in registro and registro.esta_activo(id_cliente) == activos:
+            return id_cliente
+        print("Cliente inválido. Intenta de nuevo.")
 
 def administrar_membresias():
     """Menú para administrar membresías."""
-    global clientes_activos, clientes_inactivos  # Define las variables globales
-
     # Verificar si hay clientes registrados
-    if not clientes_activos and not clientes_inactivos:
+    if not len(registro):
         print("\nNo existen clientes registrados aún.")
         return  # Sale de la función si no hay clientes
 
@@ -290,7 +252,8 @@ def administrar_membresias():
         print("1: Cambiar membresía")
         print("2: Cancelar membresía")
         print("3: Reactivar cliente")
-        print("4: Volver al menú principal")
+        print("4: Control parental")
+        print("5: Volver al menú principal")
 
         opcion_membresia = input("Ingresa la opción deseada: ")
 
@@ -301,6 +264,8 @@ def administrar_membresias():
         elif opcion_membresia == "3":
             reactivar_cliente()
         elif opcion_membresia == "4":
+            modificar_control_parental()
+        elif opcion_membresia == "5":
             print("Volviendo al menú principal...")
             break
         else:
@@ -308,23 +273,13 @@ def administrar_membresias():
 
 def cambiar_membresia():
     """Permite al usuario cambiar el tipo de membresía de un cliente."""
-    global clientes_activos
-    mostrar_clientes(clientes_activos)
+    mostrar_clientes(activo=True)
 
-    if not clientes_activos:
+    if not registro.total_activos:
         return
 
-    while True:
-        try:
-            index = int(input("Ingresa el número del cliente: ")) - 1
-            if 0 <= index < len(clientes_activos):
-                break
-            else:
-                print("Número de cliente inválido. Intenta de nuevo.")
-        except ValueError:
-            print("Ingresa un número válido. Intenta de nuevo.")
-
-    nombre, membresia_actual = clientes_activos[index]
+    id_cliente = seleccionar_cliente(activos=True)
+    _, membresia_actual = registro.obtener(id_cliente)
 
     print("\nTipos de membresía disponibles:")
     print("1: Básica")
@@ -342,62 +297,37 @@ def cambiar_membresia():
         except ValueError:
             print("Ingresa un número válido. Intenta de nuevo.")
 
-    nueva_membresia = membresia_actual.cambiar_membresia(tipo_membresia)
-    if nueva_membresia:
-        clientes_activos[index] = (nombre, nueva_membresia)
+    nueva_membresia = registro.cambiar_membresia(id_cliente, tipo_membresia)
+    if nueva_membresia is not membresia_actual:
         print(f"\nMembresía cambiada exitosamente a {type(nueva_membresia).__name__}.")
     else:
         print("Cambio de membresía no válido.")
 
 def cancelar_membresia():
     """Permite al usuario cancelar la membresía de un cliente."""
-    global clientes_activos, clientes_inactivos
-    mostrar_clientes(clientes_activos)
+    mostrar_clientes(activo=True)
 
-    if not clientes_activos:
+    if not registro.total_activos:
         return
 
-    while True:
-        try:
-            index = int(input("Ingresa el número del cliente: ")) - 1
-            if 0 <= index < len(clientes_activos):
-                break
-            else:
-                print("Número de cliente inválido. Intenta de nuevo.")
-        except ValueError:
-            print("Ingresa un número válido. Intenta de nuevo.")
-
-    nombre, membresia_actual = clientes_activos[index]
-    cancelada = membresia_actual.cancelar_membresia()
+    id_cliente = seleccionar_cliente(activos=True)
+    nombre, _ = registro.obtener(id_cliente)
 
-    # Mueve al cliente a la lista de inactivos
-    clientes_inactivos.append((nombre, cancelada))
-    # Elimina el cliente de la lista de activos
-    del clientes_activos[index]
+    # Mueve al cliente al conjunto de inactivos
+    registro.cancelar(id_cliente)
 
     print(f"\nMembresía cancelada para {nombre}.")
 
 def reactivar_cliente():
     """Permite al usuario reactivar la membresía de un cliente."""
-    global clientes_inactivos  # Define la variable global clientes_inactivos
+    mostrar_clientes(activo=False)
 
-    mostrar_clientes(clientes_inactivos)
-
-    if not clientes_inactivos:
+    if not registro.total_inactivos:
         print("\nNo hay clientes inactivos en este momento.")
         return
 
-    while True:
-        try:
-            index = int(input("Ingresa el número del cliente: ")) - 1
-            if 0 <= index < len(clientes_inactivos):
-                break
-            else:
-                print("Número de cliente inválido. Intenta de nuevo.")
-        except ValueError:
-            print("Ingresa un número válido. Intenta de nuevo.")
-
-    nombre, membresia_actual = clientes_inactivos[index]
+    id_cliente = seleccionar_cliente(activos=False)
+    nombre, membresia_actual = registro.obtener(id_cliente)
 
     print("\nTipos de membresía disponibles:")
     print("1: Básica")
@@ -425,52 +355,197 @@ def reactivar_cliente():
     elif tipo_membresia == 4:
         nueva_membresia = Pro(membresia_actual.correo, membresia_actual.numero_tarjeta)
 
-    # Mueve el cliente a la lista de activos
-    clientes_activos.append((nombre, nueva_membresia))
-    # Elimina el cliente de la lista de inactivos
-    del clientes_inactivos[index]
+    # Mueve el cliente al conjunto de activos
+    registro.reactivar(id_cliente, nueva_membresia)
 
     print(f"\nMembresía reactivada para {nombre} con tipo {type(nueva_membresia).__name__}.")
 
+def modificar_control_parental():
+    """Crea o modifica un perfil de control parental de un cliente Familiar o Pro."""
+    mostrar_clientes(activo=True)
+
+    if not registro.total_activos:
+        return
+
+    id_cliente = seleccionar_cliente(activos=True)
+    existentes = perfiles.perfiles(id_cliente)
+    for perfil in existentes.values():
+        bloqueadas = ", ".join(sorted(perfil.etiquetas_bloqueadas)) or "ninguna"
+        print(f"  {perfil.nombre}: hasta {perfil.clasificacion_maxima}, etiquetas bloqueadas: {bloqueadas}")
+
+    nombre_perfil = input("Nombre del perfil: ").strip()
+    if not nombre_perfil:
+        print("El nombre del perfil no puede estar vacío.")
+        return
+    clasificacion = input(f"Clasificación máxima ({', '.join(CLASIFICACIONES)}; Enter: sin cambios): ").strip()
+    etiquetas = input("Etiquetas bloqueadas separadas por comas (Enter: sin cambios, '-': ninguna): ").strip()
+    if etiquetas == "-":
+        etiquetas_bloqueadas = []
+    elif etiquetas:
+        etiquetas_bloqueadas = [etiqueta.strip() for etiqueta in etiquetas.split(",") if etiqueta.strip()]
+    else:
+        etiquetas_bloqueadas = None
+
+    try:
+        perfiles.modificar(id_cliente, nombre_perfil, clasificacion or None, etiquetas_bloqueadas)
+    except ValueError as error:
+        print(f"\nNo se pudo modificar el control parental: {error}")
+        return
+    print(f"\nControl parental modificado para {nombre_perfil}.")
+
+def importar_desde_archivo():
+    """Importa clientes en forma masiva desde un archivo CSV o JSONL."""
+    ruta = input("Ingresa la ruta del archivo: ").strip()
+    if not os.path.exists(ruta):
+        print("El archivo no existe.")
+        return
+
+    try:
+        resultado = importar_clientes(ruta, registro, bitacora=bitacora if ALMACEN == "bitacora" else None,
+                                      unicidad=unicidad)
+    except ValueError as error:
+        print(f"No se pudo importar el archivo: {error}")
+        return
+
+    print(f"\nClientes importados: {resultado.aceptados}")
+    print(f"Filas rechazadas: {len(resultado.rechazos)}")
+    for linea, motivo in resultado.rechazos[:20]:
+        print(f"  Línea {linea}: {motivo}")
+    if len(resultado.rechazos) > 20:
+        print(f"  ... y {len(resultado.rechazos) - 20} más.")
+
+def ver_estadisticas():
+    """Muestra las estadísticas de suscriptores sin recorrer el registro."""
+    print("\nSuscriptores activos por tipo:")
+    for codigo, cantidad in analitica.activos_por_tipo().items():
+        print(f"  {TIPOS_MEMBRESIA[codigo].__name__}: {cantidad}")
+    print(f"  Total: {analitica.activos()}")
+
+    for escala, titulo in (("semana", "Esta semana"), ("mes", "Este mes")):
+        resumen = analitica.resumen_periodo(escala=escala)
+        print(f"\n{titulo} ({resumen['periodo']}): {resumen['altas']} altas, {resumen['bajas']} bajas, "
+              f"{resumen['reactivaciones']} reactivaciones, tasa de bajas {resumen['tasa_bajas']:.1%}")
+
+    transiciones = analitica.transiciones()
+    if transiciones:
+        print("\nCambios de membresía:")
+        for (origen, destino), cantidad in sorted(transiciones.items()):
+            print(f"  {TIPOS_MEMBRESIA[origen].__name__} -> {TIPOS_MEMBRESIA[destino].__name__}: {cantidad}")
+
+    cohortes = analitica.cohortes()[-12:]
+    if cohortes:
+        print("\nCohortes mensuales (registrados / siguen activos):")
+        for mes, registrados, activos in cohortes:
+            print(f"  {mes}: {registrados} / {activos}")
+
 # --- Funciones de guardado y carga ---
 
 def guardar_datos():
-    """Guarda los datos en un archivo binario."""
-    with open("datos_clientes.pkl", "wb") as archivo:
-        pickle.dump((clientes_activos, clientes_inactivos), archivo)
+    """Sincroniza a disco las operaciones pendientes y guarda las huellas y las credenciales."""
+    if ALMACEN in ("sqlite", "mapeado"):
+        registro.guardar()
+    elif ALMACEN == "fragmentado":
+        fragmentos.guardar()
+    else:
+        bitacora.sincronizar()
+    unicidad.guardar(archivo_unicidad)
+    credenciales.guardar()
 
 def cargar_datos():
-    """Carga los datos desde un archivo binario."""
-    if os.path.exists("datos_clientes.pkl"):
-        with open("datos_clientes.pkl", "rb") as archivo:
-            global clientes_activos, clientes_inactivos
-            clientes_activos, clientes_inactivos = pickle.load(archivo)
+    """Abre la base SQLite o el archivo mapeado, carga los fragmentos, o carga la última instantánea y reproduce la bitácora."""
+    global registro, indice, unicidad, historial, analitica, credenciales, perfiles, boveda
+    boveda = BovedaTarjetas(archivo_boveda, cargar_clave_boveda(archivo_clave_boveda))
+    if ALMACEN == "sqlite":
+        registro = AlmacenSQLite(archivo_sqlite)
+        registro.proteger_tarjetas(boveda)
+    elif ALMACEN == "fragmentado":
+        registro = fragmentos.cargar()
+        if registro.proteger_tarjetas(boveda):
+            # Reescribe todos los fragmentos para no dejar tarjetas en claro en disco
+            fragmentos.conectar(registro)
+            fragmentos.guardar()
+    elif ALMACEN == "mapeado":
+        registro = AlmacenMapeado(archivo_mapeado)
+        if registro.proteger_tarjetas(boveda):
+            registro.guardar()
+    else:
+        migrar_pickle(archivo_instantanea_pickle, archivo_instantanea)
+        registro = bitacora.cargar()
+        if registro.proteger_tarjetas(boveda):
+            # Reescribe la instantánea y trunca la bitácora para no dejar tarjetas en claro en disco
+            bitacora.compactar()
+    indice = IndiceClientes(registro)
+    unicidad = ControlUnicidad.cargar(archivo_unicidad, cargar_clave_huellas(archivo_clave_huellas))
+    unicidad.conectar(registro)
+    historial = HistorialMembresias(archivo_historial)
+    historial.conectar(registro)
+    # Se reconstruye una sola vez desde el historial y el registro; luego se actualiza con cada operación
+    analitica = AnaliticaSuscriptores(archivo_historial)
+    analitica.conectar(registro)
+    credenciales = AlmacenCredenciales(archivo_credenciales, costo=COSTO_BCRYPT)
+    perfiles = LibroPerfiles(archivo_perfiles)
+    perfiles.conectar(registro)
+
+def activar_metricas():
+    """Activa las métricas si la variable de entorno MEMBRESIAS_METRICAS indica un puerto o un archivo."""
+    destino = os.environ.get("MEMBRESIAS_METRICAS")
+    if not destino:
+        return None
+    registro_metricas = metricas.activar(modulos=[sys.modules[__name__]])
+    if destino.isdigit():
+        registro_metricas.servir_http(int(destino))
+        print(f"Métricas disponibles en http://127.0.0.1:{destino}/metrics")
+    return registro_metricas
+
+def exportar_metricas(registro_metricas):
+    """Escribe las métricas en el archivo indicado por MEMBRESIAS_METRICAS, si corresponde."""
+    destino = os.environ.get("MEMBRESIAS_METRICAS")
+    if registro_metricas is not None and not destino.isdigit():
+        registro_metricas.guardar_texto(destino)
 
 # --- Programa Principal ---
 
-# Inicializa listas
-clientes_activos = []
-clientes_inactivos = []
-
-# Carga datos guardados
-
-## .pem opcional
-cargar_datos()
-
-# Menú principal
-while True:
-    mostrar_opciones()
-    opcion = input("Selecciona una opción: ")
-
-    if opcion == "1":
-        registrar_cliente()
-    elif opcion == "2":
-        mostrar_clientes(clientes_activos)
-    elif opcion == "3":
-        administrar_membresias()
-    elif opcion == "4":
-        guardar_datos()
-        print("Datos guardados. Saliendo del sistema...")
-        break
-    else:
-        print("Opción no válida. Inténtalo de nuevo.")
+def main():
+    """Carga los datos guardados y ejecuta el menú principal."""
+    ## .pem opcional
+    registro_metricas = activar_metricas()
+    cargar_datos()
+    if registro_metricas is not None:
+        registro_metricas.observar(registro)
+
+    # Menú principal
+    while True:
+        mostrar_opciones()
+        opcion = input("Selecciona una opción: ")
+
+        if opcion == "1":
+            registrar_cliente()
+        elif opcion == "2":
+            ver_listado()
+        elif opcion == "3":
+            administrar_membresias()
+        elif opcion == "4":
+            importar_desde_archivo()
+        elif opcion == "5":
+            ver_estadisticas()
+        elif opcion == "6":
+            guardar_datos()
+            if ALMACEN in ("sqlite", "mapeado"):
+                registro.cerrar()
+            elif ALMACEN == "fragmentado":
+                fragmentos.cerrar()
+            else:
+                bitacora.cerrar()
+            historial.cerrar()
+            analitica.cerrar()
+            credenciales.cerrar()
+            perfiles.cerrar()
+            boveda.cerrar()
+            exportar_metricas(registro_metricas)
+            print("Datos guardados. Saliendo del sistema...")
+            break
+        else:
+            print("Opción no válida. Inténtalo de nuevo.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Mide con tracemalloc los bytes por suscriptor de las membresías como objetos y en el almacén compacto."""
+import argparse
+import gc
+import tracemalloc
+
+from almacen_compacto import AlmacenCompacto
+from membresia import TIPOS_MEMBRESIA
+
+
+def generar_datos(cantidad):
+    """Genera correos, tarjetas y tipos de membresía sintéticos."""
+    for i in range(cantidad):
+        yield f"cliente{i}@ejemplo.com", f"{4000000000000000 + i:016d}", i % len(TIPOS_MEMBRESIA)
+
+
+def medir(construir, cantidad):
+    """Devuelve los bytes asignados por construir() según tracemalloc."""
+    gc.collect()
+    tracemalloc.start()
+    inicio, _ = tracemalloc.get_traced_memory()
+    resultado = construir(cantidad)
+    fin, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del resultado
+    return fin - inicio
+
+
+def construir_objetos(cantidad):
+    """Construye una lista de objetos de membresía."""
+    return [TIPOS_MEMBRESIA[tipo](correo, tarjeta) for correo, tarjeta, tipo in generar_datos(cantidad)]
+
+
+def construir_compacto(cantidad):
+    """Construye un almacén compacto con las mismas membresías."""
+    almacen = AlmacenCompacto()
+    for correo, tarjeta, tipo in generar_datos(cantidad):
+        almacen.agregar(TIPOS_MEMBRESIA[tipo](correo, tarjeta))
+    return almacen
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--registros", type=int, default=1_000_000, help="cantidad de suscriptores a generar")
+    args = parser.parse_args()
+
+    bytes_objetos = medir(construir_objetos, args.registros)
+    bytes_compacto = medir(construir_compacto, args.registros)
+
+    print(f"Suscriptores: {args.registros}")
+    print(f"Objetos Membresia: {bytes_objetos / args.registros:.1f} bytes por suscriptor")
+    print(f"Almacén compacto:  {bytes_compacto / args.registros:.1f} bytes por suscriptor")
+    print(f"Reducción: {100 * (1 - bytes_compacto / bytes_objetos):.1f}%")
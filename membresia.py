@@ -64,22 +64,17 @@ class Membresia(ABC):
         Returns:
             Membresia: Nueva membresía creada.
         """
-        if nueva_membresia == 1:
-            return Basica(self.correo, self.numero_tarjeta)
-        elif nueva_membresia == 2:
-            return Familiar(self.correo, self.numero_tarjeta)
-        elif nueva_membresia == 3:
-            return SinConexión(self.correo, self.numero_tarjeta)
-        elif nueva_membresia == 4:
-            return Pro(self.correo, self.numero_tarjeta)
-        else:
+        clase = _CLASES_DESTINO.get(nueva_membresia)
+        if clase is None:
             return self
+        return clase(self.correo, self.numero_tarjeta)
 
 class Gratis(Membresia):
     """
     Clase que representa una membresía gratuita.
     """
 
+    _codigo = 0
     _costo = 0
     _dispositivos = 1
 
@@ -113,6 +108,7 @@ class Basica(Membresia):
     Clase que representa una membresía básica.
     """
 
+    _codigo = 1
     _costo = 3000
     _dispositivos = 2
 
@@ -146,6 +142,7 @@ class Familiar(Membresia):
     Clase que representa una membresía familiar.
     """
 
+    _codigo = 2
     _costo = 5000
     _dispositivos = 5
 
@@ -184,17 +181,12 @@ class Familiar(Membresia):
         """
         return self._crear_nueva_membresia(0)
 
-    def modificar_control_parental(self):
-        """
-        Método para modificar el control parental.
-        """
-        print("Control parental modificado.")
-
 class SinConexión(Membresia):
     """
     Clase que representa una membresía sin conexión.
     """
 
+    _codigo = 3
     _costo = 3500
     _dispositivos = 2
 
@@ -246,6 +238,7 @@ class Pro(Familiar, SinConexión):
     Clase que representa una membresía Pro. Hereda de Familiar y Sin Conexión.
     """
 
+    _codigo = 4
     _costo = 7000
     _dispositivos = 6
 
@@ -282,4 +275,39 @@ class Pro(Familiar, SinConexión):
         Returns:
             Membresia: Nueva membresía gratuita.
         """
-        return self._crear_nueva_membresia(0)
\ No newline at end of file
+        return self._crear_nueva_membresia(0)
+
+
+TIPOS_MEMBRESIA = {
+    Gratis._codigo: Gratis,
+    Basica._codigo: Basica,
+    Familiar._codigo: Familiar,
+    SinConexión._codigo: SinConexión,
+    Pro._codigo: Pro,
+}
+
+# Tipos que _crear_nueva_membresia puede crear. Gratis (0) no está incluido: para ese
+# identificador, igual que para uno desconocido, se devuelve la membresía actual.
+_CLASES_DESTINO = {codigo: clase for codigo, clase in TIPOS_MEMBRESIA.items() if codigo != Gratis._codigo}
+
+
+def crear_membresia(tipo_membresia: int, correo: str, numero_tarjeta: str) -> Membresia:
+    """
+    Crea una membresía a partir de su identificador numérico.
+
+    Args:
+        tipo_membresia (int): Identificador numérico del tipo de membresía (0 a 4).
+        correo (str): Correo electrónico del suscriptor.
+        numero_tarjeta (str): Número de tarjeta del suscriptor.
+
+    Returns:
+        Membresia: Nueva membresía del tipo solicitado.
+
+    Raises:
+        ValueError: Si el identificador no corresponde a ningún tipo de membresía.
+    """
+    try:
+        clase = TIPOS_MEMBRESIA[tipo_membresia]
+    except KeyError:
+        raise ValueError(f"Tipo de membresía desconocido: {tipo_membresia}") from None
+    return clase(correo, numero_tarjeta)
@@ -0,0 +1,339 @@
+"""Métricas de operación (contadores, medidores e histogramas) exportadas en el formato de texto de Prometheus.
+
+La instrumentación no tiene costo mientras está desactivada: activar() reemplaza las
+funciones y métodos medidos por envolturas, y desactivar() restaura los originales.
+"""
+import bisect
+import functools
+import http.server
+import os
+import threading
+import time
+
+import cifrado
+from membresia import TIPOS_MEMBRESIA
+
+LIMITES_LATENCIA = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+
+class Contador:
+    """
+    Valor que solo aumenta.
+    """
+
+    def __init__(self):
+        self.valor = 0.0
+        self._candado = threading.Lock()
+
+    def incrementar(self, cantidad: float = 1):
+        """
+        Suma una cantidad al contador.
+        """
+        with self._candado:
+            self.valor += cantidad
+
+    def muestras(self, nombre, etiquetas):
+        yield nombre, etiquetas, self.valor
+
+
+class Medidor(Contador):
+    """
+    Valor que puede aumentar, disminuir o fijarse.
+    """
+
+    def fijar(self, valor: float):
+        """
+        Fija el valor del medidor.
+        """
+        with self._candado:
+            self.valor = valor
+
+
+class Histograma:
+    """
+    Distribución de observaciones en intervalos acumulativos, con su suma y cantidad.
+    """
+
+    def __init__(self, limites=LIMITES_LATENCIA):
+        """
+        Inicializa el histograma.
+
+        Args:
+            limites (tuple): Límites superiores de los intervalos, en orden creciente.
+        """
+        self._limites = tuple(limites)
+        self._cuentas = [0] * (len(self._limites) + 1)
+        self._suma = 0.0
+        self._candado = threading.Lock()
+
+    def observar(self, valor: float):
+        """
+        Registra una observación.
+        """
+        indice = bisect.bisect_left(self._limites, valor)
+        with self._candado:
+            self._cuentas[indice] += 1
+            self._suma += valor
+
+    def muestras(self, nombre, etiquetas):
+        acumulado = 0
+        for limite, cuenta in zip(self._limites + (float("inf"),), self._cuentas):
+            acumulado += cuenta
+            yield f"{nombre}_bucket", etiquetas + (("le", _formatear(limite)),), acumulado
+        yield f"{nombre}_sum", etiquetas, self._suma
+        yield f"{nombre}_count", etiquetas, acumulado
+
+
+class Familia:
+    """
+    Métrica con nombre, descripción y etiquetas; cada combinación de etiquetas es una serie.
+    """
+
+    def __init__(self, nombre: str, ayuda: str, tipo: str, etiquetas: tuple, fabrica):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.tipo = tipo
+        self.etiquetas = etiquetas
+        self._fabrica = fabrica
+        self._series = {}
+        self._candado = threading.Lock()
+
+    def con(self, *valores):
+        """
+        Devuelve la serie de una combinación de valores de etiquetas, creándola si no existe.
+        """
+        serie = self._series.get(valores)
+        if serie is None:
+            with self._candado:
+                serie = self._series.setdefault(valores, self._fabrica())
+        return serie
+
+    def exportar(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        for valores, serie in sorted(self._series.items()):
+            for nombre, etiquetas, valor in serie.muestras(self.nombre, tuple(zip(self.etiquetas, valores))):
+                texto_etiquetas = ",".join(f'{clave}="{_escapar(str(dato))}"' for clave, dato in etiquetas)
+                lineas.append(f"{nombre}{{{texto_etiquetas}}} {_formatear(valor)}" if etiquetas
+                              else f"{nombre} {_formatear(valor)}")
+        return lineas
+
+
+def _escapar(texto):
+    return texto.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatear(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if valor != int(valor) else str(int(valor))
+
+
+class RegistroMetricas:
+    """
+    Conjunto de métricas con las series de operación del sistema de membresías.
+    """
+
+    def __init__(self):
+        self._familias = {}
+        self.duracion = self.histograma("membresias_duracion_segundos",
+                                        "Duración de las operaciones instrumentadas.", ("funcion",))
+        self.bytes_procesados = self.contador("membresias_bytes_procesados_total",
+                                              "Bytes de entrada procesados por las funciones de cifrado.", ("funcion",))
+        self.transiciones = self.contador("membresias_transiciones_total",
+                                          "Transiciones de membresía por operación, tipo de origen y de destino.",
+                                          ("operacion", "origen", "destino"))
+        self.suscriptores = self.medidor("membresias_suscriptores", "Cantidad de suscriptores por tipo y estado.",
+                                         ("tipo", "estado"))
+
+    def _familia(self, nombre, ayuda, tipo, etiquetas, fabrica):
+        familia = self._familias.get(nombre)
+        if familia is None:
+            familia = self._familias[nombre] = Familia(nombre, ayuda, tipo, tuple(etiquetas), fabrica)
+        return familia
+
+    def contador(self, nombre: str, ayuda: str, etiquetas=()) -> Familia:
+        """
+        Devuelve (o crea) una familia de contadores.
+        """
+        return self._familia(nombre, ayuda, "counter", etiquetas, Contador)
+
+    def medidor(self, nombre: str, ayuda: str, etiquetas=()) -> Familia:
+        """
+        Devuelve (o crea) una familia de medidores.
+        """
+        return self._familia(nombre, ayuda, "gauge", etiquetas, Medidor)
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas=(), limites=LIMITES_LATENCIA) -> Familia:
+        """
+        Devuelve (o crea) una familia de histogramas.
+        """
+        return self._familia(nombre, ayuda, "histogram", etiquetas, lambda: Histograma(limites))
+
+    def exportar_texto(self) -> str:
+        """
+        Devuelve todas las métricas en el formato de texto de Prometheus (versión 0.0.4).
+        """
+        lineas = []
+        for familia in self._familias.values():
+            lineas.extend(familia.exportar())
+        return "\n".join(lineas) + "\n"
+
+    def guardar_texto(self, ruta: str):
+        """
+        Escribe las métricas en un archivo en forma atómica, p. ej. para el textfile collector de node_exporter.
+        """
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            archivo.write(self.exportar_texto())
+        os.replace(temporal, ruta)
+
+    def servir_http(self, puerto: int = 9464, host: str = "127.0.0.1") -> http.server.ThreadingHTTPServer:
+        """
+        Expone las métricas en http://host:puerto/metrics desde un hilo en segundo plano.
+
+        Returns:
+            ThreadingHTTPServer: Servidor iniciado; se detiene con shutdown().
+        """
+        metricas = self
+
+        class Manejador(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                cuerpo = metricas.exportar_texto().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, formato, *args):
+                pass
+
+        servidor = http.server.ThreadingHTTPServer((host, puerto), Manejador)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        return servidor
+
+    def registrar_evento(self, operacion, id_cliente, nombre, anterior, nueva):
+        """
+        Actualiza los medidores de suscriptores y cuenta las reactivaciones. Se usa como oyente del registro.
+
+        Args:
+            operacion (str): "registrar", "cambiar", "cancelar" o "reactivar".
+            id_cliente (int): Identificador del cliente modificado.
+            nombre (str): Nombre del cliente.
+            anterior (Membresia): Membresía previa (None al registrar).
+            nueva (Membresia): Membresía resultante.
+        """
+        if anterior is not None:
+            estado_anterior = "inactivo" if operacion == "reactivar" else "activo"
+            self.suscriptores.con(type(anterior).__name__, estado_anterior).incrementar(-1)
+        estado = "inactivo" if operacion == "cancelar" else "activo"
+        self.suscriptores.con(type(nueva).__name__, estado).incrementar()
+        if operacion in ("registrar", "reactivar"):
+            origen = "ninguno" if anterior is None else type(anterior).__name__
+            self.transiciones.con(operacion, origen, type(nueva).__name__).incrementar()
+
+    def observar(self, registro):
+        """
+        Inicializa los medidores de suscriptores con el estado del registro y se suscribe a sus cambios.
+
+        Args:
+            registro (RegistroClientes): Registro de clientes.
+        """
+        for estado, clientes in (("activo", registro.activos()), ("inactivo", registro.inactivos())):
+            cuentas = {}
+            for _, _, membresia in clientes:
+                cuentas[type(membresia).__name__] = cuentas.get(type(membresia).__name__, 0) + 1
+            for tipo, cantidad in cuentas.items():
+                self.suscriptores.con(tipo, estado).fijar(cantidad)
+        registro.suscribir(self.registrar_evento)
+
+
+def _medir(funcion, nombre, metricas, contar_bytes=False):
+    """Envuelve una función para observar su duración y, opcionalmente, el tamaño de su primer argumento."""
+    duracion = metricas.duracion.con(nombre)
+    procesados = metricas.bytes_procesados.con(nombre) if contar_bytes else None
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            duracion.observar(time.perf_counter() - inicio)
+            if procesados is not None and args:
+                procesados.incrementar(len(args[0]))
+
+    return envoltura
+
+
+def _medir_transicion(metodo, operacion, metricas):
+    """Envuelve un método de transición de Membresia para contar transiciones y medir su duración."""
+    duracion = metricas.duracion.con(metodo.__qualname__)
+
+    @functools.wraps(metodo)
+    def envoltura(self, *args):
+        inicio = time.perf_counter()
+        resultado = metodo(self, *args)
+        duracion.observar(time.perf_counter() - inicio)
+        destino = "rechazado" if resultado is self and operacion == "cambiar" else type(resultado).__name__
+        metricas.transiciones.con(operacion, type(self).__name__, destino).incrementar()
+        return resultado
+
+    return envoltura
+
+
+_FUNCIONES_CIFRADO = ("cifrar_datos_hibrido", "descifrar_datos_hibrido")
+_FUNCIONES_DATOS = ("cargar_datos", "guardar_datos")
+_parches = []
+
+
+def _parchear(objeto, atributo, nuevo):
+    _parches.append((objeto, atributo, getattr(objeto, atributo)))
+    setattr(objeto, atributo, nuevo)
+
+
+def activar(metricas: RegistroMetricas = None, modulos=()) -> RegistroMetricas:
+    """
+    Instala la instrumentación sobre las funciones de cifrado híbrido, los métodos de transición
+    de cada membresía y, en los módulos indicados, cargar_datos y guardar_datos.
+
+    Como los módulos que importan las funciones de cifrado con "from cifrado import ..."
+    guardan su propia referencia, esas referencias también se reemplazan en los módulos indicados.
+
+    Args:
+        metricas (RegistroMetricas, optional): Métricas donde registrar. Por defecto, unas nuevas.
+        modulos (iterable): Módulos adicionales a instrumentar, p. ej. main_interfaz.
+
+    Returns:
+        RegistroMetricas: Métricas en uso.
+    """
+    desactivar()
+    metricas = metricas or RegistroMetricas()
+    for nombre in _FUNCIONES_CIFRADO:
+        original = getattr(cifrado, nombre)
+        envoltura = _medir(original, nombre, metricas, contar_bytes=True)
+        _parchear(cifrado, nombre, envoltura)
+        for modulo in modulos:
+            if getattr(modulo, nombre, None) is original:
+                _parchear(modulo, nombre, envoltura)
+    for modulo in modulos:
+        for nombre in _FUNCIONES_DATOS:
+            if hasattr(modulo, nombre):
+                _parchear(modulo, nombre, _medir(getattr(modulo, nombre), nombre, metricas))
+    for clase in TIPOS_MEMBRESIA.values():
+        for metodo, operacion in (("cambiar_membresia", "cambiar"), ("cancelar_membresia", "cancelar")):
+            if metodo in vars(clase):
+                _parchear(clase, metodo, _medir_transicion(vars(clase)[metodo], operacion, metricas))
+    return metricas
+
+
+def desactivar():
+    """
+    Restaura las funciones y métodos originales.
+    """
+    while _parches:
+        objeto, atributo, original = _parches.pop()
+        setattr(objeto, atributo, original)
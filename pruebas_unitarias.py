@@ -1,4 +1,38 @@
 from membresia import Gratis, Basica, Familiar, SinConexión, Pro
+from registro_clientes import RegistroClientes
+from bitacora import Bitacora
+from almacen_compacto import AlmacenCompacto
+from cifrado import generar_claves_rsa, cifrar_flujo, descifrar_flujo, cifrar_datos_hibrido
+from gestor_claves import GestorClaves
+from validaciones import validar_correo, validar_numero_tarjeta
+from importacion import importar_clientes
+from transiciones import aplicar_transicion
+from facturacion import CicloFacturacion, SEGUNDOS_POR_DIA
+from servidor import ServicioMembresias
+from almacen_fragmentado import AlmacenFragmentado
+from almacen_mapeado import AlmacenMapeado, escribir_mapeado
+from indice_clientes import IndiceClientes
+from unicidad import ControlUnicidad
+import metricas
+from historial import HistorialMembresias
+from credenciales import AlmacenCredenciales, costo_de
+from boveda_tarjetas import BovedaTarjetas, es_token
+from formato_registros import codificar_filas, decodificar_filas, migrar_pickle, cargar_filas
+from almacen_sqlite import AlmacenSQLite
+from registro_concurrente import RegistroConcurrente, ConflictoVersion
+from sesiones import ControlSesiones
+from descargas import LibroDescargas
+from control_parental import Catalogo, LibroPerfiles
+from analitica import AnaliticaSuscriptores
+import asyncio
+import json
+import pickle
+import numpy as np
+import io
+import logging
+import os
+import tempfile
+import threading
 
 def probar_cambio_membresia(membresia, tipos_validos, tipos_invalidos):
     print(f"\nProbando cambios de membresía para {type(membresia).__name__}:")
@@ -16,13 +50,642 @@ def probar_cancelacion_membresia(membresia):
 
 def probar_control_parental(familiar):
     print(f"\nProbando control parental para {type(familiar).__name__}:")
-    familiar.modificar_control_parental()
+    registro = RegistroClientes()
+    id_cliente = registro.registrar("Hogar", familiar)
+    libro = LibroPerfiles()
+    libro.conectar(registro)
+    perfil = libro.modificar(id_cliente, "Niños", "TE+7", ["terror"])
+    print(f"Perfil {perfil.nombre}: hasta {perfil.clasificacion_maxima}, bloqueadas {sorted(perfil.etiquetas_bloqueadas)}")
+    libro.cerrar()
 
 def probar_contenido_sin_conexion(sin_conexion):
     print(f"\nProbando contenido sin conexión para {type(sin_conexion).__name__}:")
     sin_conexion.incrementar_contenido_sin_conexion()
     sin_conexion.incrementar_contenido_sin_conexion()
 
+def probar_registro_clientes():
+    print("\nProbando registro indexado de clientes:")
+    registro = RegistroClientes()
+    id_ana = registro.registrar("Ana Pérez", Basica("ana@ejemplo.com", "1234567890123456"))
+    id_luis = registro.registrar("Luis Soto", Pro("luis@ejemplo.com", "1234567890123456"))
+    print(f"Búsqueda por correo: {registro.buscar_por_correo('luis@ejemplo.com') == id_luis}")
+    registro.cambiar_membresia(id_ana, 4)
+    print(f"Cambio registrado: {type(registro.obtener(id_ana)[1]).__name__}")
+    registro.cancelar(id_luis)
+    print(f"Activos: {registro.total_activos}, inactivos: {registro.total_inactivos}")
+    registro.reactivar(id_luis, Familiar("luis@ejemplo.com", "1234567890123456"))
+    print(f"Reactivado: {registro.esta_activo(id_luis)}")
+    try:
+        registro.registrar("Ana Duplicada", Gratis("ana@ejemplo.com", "1234567890123456"))
+        print("Correo duplicado aceptado (error).")
+    except ValueError:
+        print("Correo duplicado rechazado.")
+
+def probar_bitacora():
+    print("\nProbando bitácora con compactación:")
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_bitacora = os.path.join(carpeta, "datos.log")
+        ruta_instantanea = os.path.join(carpeta, "datos.dat")
+        bitacora = Bitacora(ruta_bitacora, ruta_instantanea, sincronizar_cada=2, compactar_cada=3)
+        registro = bitacora.cargar()
+        id_ana = registro.registrar("Ana Pérez", Basica("ana@ejemplo.com", "1234567890123456"))
+        registro.cambiar_membresia(id_ana, 2)
+        registro.cancelar(id_ana)
+        registro.reactivar(id_ana, Pro("ana@ejemplo.com", "1234567890123456"))
+        bitacora.cerrar()
+
+        recuperado = Bitacora(ruta_bitacora, ruta_instantanea).cargar()
+        nombre, membresia = recuperado.obtener(id_ana)
+        print(f"Recuperado tras reinicio: {nombre} - {type(membresia).__name__} - activo: {recuperado.esta_activo(id_ana)}")
+
+        with open(ruta_instantanea, "wb") as archivo:
+            pickle.dump({"registro": recuperado, "secuencia": 0}, archivo)
+        try:
+            Bitacora(ruta_bitacora, ruta_instantanea).cargar()
+        except ValueError as error:
+            print(f"Instantánea en pickle rechazada: {error}")
+
+def probar_bitacora_interrumpida():
+    print("\nProbando bitácora con una escritura interrumpida:")
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_bitacora = os.path.join(carpeta, "datos.log")
+        ruta_instantanea = os.path.join(carpeta, "datos.dat")
+        bitacora = Bitacora(ruta_bitacora, ruta_instantanea)
+        bitacora.cargar().registrar("Ana Pérez", Basica("ana@ejemplo.com", "1234567890123456"))
+        bitacora.cerrar()
+        with open(ruta_bitacora, "a", encoding="utf-8") as archivo:
+            archivo.write('{"seq": 2, "op": "regis')
+        bitacora = Bitacora(ruta_bitacora, ruta_instantanea)
+        bitacora.cargar().registrar("Luis Soto", Pro("luis@ejemplo.com", "1234567890123456"))
+        bitacora.cerrar()
+        recuperado = Bitacora(ruta_bitacora, ruta_instantanea).cargar()
+        print(f"Clientes tras dos reinicios: {len(recuperado)} (esperados: 2)")
+
+def probar_bitacora_compactacion_fallida():
+    print("\nProbando bitácora cuando falla la instantánea:")
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_bitacora = os.path.join(carpeta, "datos.log")
+        ruta_instantanea = os.path.join(carpeta, "datos.dat")
+        bitacora = Bitacora(ruta_bitacora, ruta_instantanea, compactar_cada=1)
+        registro = bitacora.cargar()
+        # Un texto con el carácter nulo no se puede guardar en la instantánea
+        logging.getLogger("bitacora").disabled = True
+        try:
+            registro.registrar("Ana Pérez", Basica("ana\0@ejemplo.com", "1234567890123456"))
+        finally:
+            logging.getLogger("bitacora").disabled = False
+        bitacora.cerrar()
+        recuperado = Bitacora(ruta_bitacora, ruta_instantanea).cargar()
+        print(f"Operación conservada en la bitácora: {len(recuperado)} cliente(s)")
+
+def probar_almacen_compacto():
+    print("\nProbando almacén compacto de membresías:")
+    almacen = AlmacenCompacto()
+    indice = almacen.agregar(Pro("correo@ejemplo.com", "1234567890123456"))
+    vista = almacen.obtener(indice)
+    print(f"Vista: {type(vista).__name__}, es Familiar: {isinstance(vista, Familiar)}, correo: {vista.correo}")
+    vista.incrementar_contenido_sin_conexion()
+    cambiada = almacen.cambiar_membresia(indice, 1)
+    print(f"Cambio a {type(cambiada).__name__} con correo {cambiada.correo}.")
+
+def probar_cifrado_por_segmentos():
+    print("\nProbando cifrado por segmentos:")
+    clave_privada, clave_publica = generar_claves_rsa()
+    datos = os.urandom(100_000)
+    cifrado = io.BytesIO()
+    cifrar_flujo(io.BytesIO(datos), cifrado, clave_publica, bytes_por_segmento=4096, trabajadores=2)
+    descifrado = io.BytesIO()
+    descifrar_flujo(io.BytesIO(cifrado.getvalue()), descifrado, clave_privada, trabajadores=2)
+    print(f"Datos recuperados: {descifrado.getvalue() == datos}")
+    try:
+        descifrar_flujo(io.BytesIO(cifrado.getvalue()[:-100]), io.BytesIO(), clave_privada)
+        print("Flujo truncado aceptado (error).")
+    except ValueError:
+        print("Flujo truncado rechazado.")
+
+def probar_gestor_claves():
+    print("\nProbando gestor de claves y rotación:")
+    gestor = GestorClaves(max_claves=10, segundos_vigencia=60)
+    clave_privada, clave_publica = generar_claves_rsa()
+    clave_privada_nueva, clave_publica_nueva = generar_claves_rsa()
+    datos_cifrados, clave_cifrada = cifrar_datos_hibrido(b"datos de prueba", clave_publica)
+    print(f"Descifrado con caché: {gestor.descifrar_datos_hibrido(datos_cifrados, clave_cifrada, clave_privada)}")
+    clave_rotada = gestor.rotar([clave_cifrada], clave_privada, clave_publica_nueva)[clave_cifrada]
+    descifrado = GestorClaves().descifrar_datos_hibrido(datos_cifrados, clave_rotada, clave_privada_nueva)
+    print(f"Descifrado tras rotar sin volver a cifrar los datos: {descifrado}")
+    for clave_incorrecta in (clave_privada_nueva, None):
+        try:
+            gestor.desenvolver(clave_cifrada, clave_incorrecta)
+            print("Error: la caché entregó la clave con una clave privada incorrecta.")
+        except (ValueError, TypeError):
+            print("Clave privada incorrecta rechazada aunque la clave esté en caché.")
+    datos_cifrados, clave_cifrada = cifrar_datos_hibrido(b"otros datos", clave_publica)
+    gestor.desenvolver(clave_cifrada, clave_privada)
+    try:
+        gestor.descifrar_datos_hibrido(datos_cifrados, clave_cifrada, clave_publica)
+        print("Error: la caché entregó la clave a quien solo tiene la clave pública.")
+    except TypeError as error:
+        print(f"Clave pública rechazada con la clave en caché: {error}")
+
+def probar_validaciones():
+    print("\nProbando validaciones reutilizables:")
+    for correo in ["ana.perez@ejemplo.com", "sin-arroba.com", "ana@.com"]:
+        try:
+            validar_correo(correo)
+            print(f"Correo {correo} aceptado.")
+        except ValueError as error:
+            print(f"Correo {correo} rechazado: {error}")
+    try:
+        validar_correo("ana\0@ejemplo.com")
+    except ValueError as error:
+        print(f"Correo con carácter nulo rechazado: {error}")
+    for tarjeta in ["4111111111111111", "4111111111111112"]:
+        try:
+            validar_numero_tarjeta(tarjeta)
+            print(f"Tarjeta {tarjeta} aceptada.")
+        except ValueError as error:
+            print(f"Tarjeta {tarjeta} rechazada: {error}")
+
+def probar_importacion_masiva():
+    print("\nProbando importación masiva:")
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "clientes.csv")
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            archivo.write("nombre,correo,numero_tarjeta,tipo_membresia\n")
+            archivo.write("Ana Pérez,ana@ejemplo.com,4111111111111111,1\n")
+            archivo.write("Luis Soto,luis@ejemplo.com,4111111111111112,2\n")
+            archivo.write("Ana Otra,ana@ejemplo.com,4111111111111111,3\n")
+        registro = RegistroClientes()
+        resultado = importar_clientes(ruta, registro, trabajadores=1)
+        print(f"Aceptados: {resultado.aceptados}")
+        for linea, motivo in resultado.rechazos:
+            print(f"Línea {linea} rechazada: {motivo}")
+
+def probar_transiciones_masivas():
+    print("\nProbando transiciones masivas con tabla precalculada:")
+    clases = [Gratis, Basica, Familiar, SinConexión, Pro]
+    codigos = np.array([0, 1, 2, 3, 4], dtype=np.int8)
+    for destino in range(6):
+        nuevos, aceptados, _ = aplicar_transicion(codigos, destino)
+        coincide = all(
+            type(clase("correo@ejemplo.com", "1234567890123456").cambiar_membresia(destino)) is clases[nuevo]
+            for clase, nuevo in zip(clases, nuevos)
+        )
+        print(f"Destino {destino}: aceptados {aceptados.tolist()}, coincide con las clases: {coincide}")
+
+def probar_facturacion():
+    print("\nProbando ciclo de facturación con prorrateo:")
+    momento = [0.0]
+    registro = RegistroClientes()
+    id_ana = registro.registrar("Ana Pérez", Basica("ana@ejemplo.com", "1234567890123456"))
+    registro.registrar("Luis Soto", Pro("luis@ejemplo.com", "1234567890123456"))
+    ciclo = CicloFacturacion.desde_registro(registro, inicio=0, dias_ciclo=30, reloj=lambda: momento[0])
+    momento[0] = 15 * SEGUNDOS_POR_DIA
+    registro.cambiar_membresia(id_ana, 2)  # 15 días de Básica y 15 de Familiar
+    id_eva = registro.registrar("Eva Ríos", Familiar("eva@ejemplo.com", "1234567890123456"))
+    # Cambiar entre Familiar y Pro no renueva los días de regalo: Eva solo tiene los 7 del registro
+    for tipo in (4, 2, 4):
+        momento[0] += SEGUNDOS_POR_DIA
+        registro.cambiar_membresia(id_eva, tipo)
+    resultado = ciclo.cerrar()
+    print(f"Cargo de Ana: {resultado.cargos[id_ana]}")
+    print(f"Cargo de Eva (15 días, 7 de regalo): {resultado.cargos[id_eva]}")
+    print(f"Ingresos por tipo: {resultado.ingresos_por_nombre()}")
+
+    # Un cliente previo al ciclo recibe su saldo explícito y no lo consume mientras está cancelado
+    registro = RegistroClientes()
+    id_leo = registro.registrar("Leo Vera", Pro("leo@ejemplo.com", "1234567890123456"))
+    momento[0] = 0.0
+    ciclo = CicloFacturacion.desde_registro(registro, inicio=0, dias_ciclo=30, reloj=lambda: momento[0],
+                                            dias_gratis={id_leo: 15})
+    registro.cancelar(id_leo)
+    siguiente = ciclo.siguiente_ciclo(registro)
+    momento[0] = 30 * SEGUNDOS_POR_DIA
+    registro.reactivar(id_leo, Pro("leo@ejemplo.com", "1234567890123456"))
+    print(f"Cargo de Leo al reactivar (15 de 30 días de regalo): {siguiente.cerrar().cargos[id_leo]} de {Pro._costo}")
+
+def probar_servicio_asincrono():
+    print("\nProbando servicio asíncrono de membresías:")
+    credenciales = AlmacenCredenciales(costo=4, trabajadores=1)
+    servicio = ServicioMembresias(RegistroClientes(), credenciales=credenciales)
+
+    async def ejecutar():
+        solicitudes = [
+            {"id": 1, "op": "registrar", "nombre": "Ana Pérez", "correo": "ana@ejemplo.com",
+             "numero_tarjeta": "4111111111111111", "tipo_membresia": 1},
+            {"id": 2, "op": "cambiar", "id_cliente": 1, "tipo_membresia": 4},
+            {"id": 3, "op": "cambiar", "id_cliente": 1, "tipo_membresia": 4},
+            {"id": 4, "op": "cancelar", "id_cliente": 1},
+        ]
+        for solicitud in solicitudes:
+            respuesta = await servicio.atender_solicitud(json.dumps(solicitud).encode("utf-8"))
+            print(f"Solicitud {respuesta['id']}: {respuesta.get('resultado') or respuesta.get('error')}")
+        for limite in (0, -1):
+            solicitud = {"id": 5, "op": "listar", "activos": None, "limite": limite}
+            respuesta = await servicio.atender_solicitud(json.dumps(solicitud).encode("utf-8"))
+            print(f"Listado con límite {limite}: {len(respuesta['resultado']['clientes'])} cliente(s)")
+        cambios = [
+            {"id": 6, "op": "establecer_contrasena", "id_cliente": 1, "contrasena": "contraseña de Ana"},
+            {"id": 7, "op": "establecer_contrasena", "id_cliente": 1, "contrasena": "contraseña ajena"},
+            {"id": 8, "op": "establecer_contrasena", "id_cliente": 1, "contrasena": "contraseña nueva",
+             "contrasena_actual": "contraseña de Ana"},
+        ]
+        for solicitud in cambios:
+            respuesta = await servicio.atender_solicitud(json.dumps(solicitud).encode("utf-8"))
+            print(f"Solicitud {respuesta['id']}: {respuesta.get('resultado') or respuesta.get('error')}")
+
+    asyncio.run(ejecutar())
+    credenciales.cerrar()
+
+def probar_almacen_fragmentado():
+    print("\nProbando almacén fragmentado:")
+    with tempfile.TemporaryDirectory() as carpeta:
+        almacen = AlmacenFragmentado(carpeta, fragmentos=4, trabajadores=2)
+        registro = almacen.cargar()
+        for i in range(20):
+            registro.registrar(f"Cliente {i}", Basica(f"cliente{i}@ejemplo.com", "1234567890123456"))
+        print(f"Fragmentos escritos en el primer guardado: {almacen.guardar()}")
+        registro.cancelar(3)
+        print(f"Fragmentos escritos tras una cancelación: {almacen.guardar()}")
+        almacen.cerrar()
+
+        recuperado = AlmacenFragmentado(carpeta).cargar()
+        print(f"Recuperados: {len(recuperado)} clientes, {recuperado.total_inactivos} inactivo(s)")
+
+        os.remove(os.path.join(carpeta, "fragmento_0001.dat"))
+        try:
+            AlmacenFragmentado(carpeta).cargar()
+        except ValueError as error:
+            print(f"Fragmento faltante: {error}")
+
+def probar_almacen_mapeado():
+    print("\nProbando almacén mapeado en memoria:")
+    registro = RegistroClientes()
+    for i in range(100):
+        registro.registrar(f"Cliente {i}", Basica(f"cliente{i}@ejemplo.com", "1234567890123456"))
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "datos.smr")
+        escribir_mapeado(ruta, registro.filas())
+        almacen = AlmacenMapeado(ruta, max_en_memoria=10)
+        id_cliente = almacen.buscar_por_correo("cliente42@ejemplo.com")
+        almacen.cambiar_membresia(id_cliente, 4)
+        for i in range(1, 51):
+            almacen.obtener(i)
+        print(f"Clientes: {len(almacen)}, decodificados en memoria: {almacen.en_memoria}")
+        almacen.guardar()
+        nombre, membresia = almacen.obtener(id_cliente)
+        print(f"Tras guardar: {nombre} - {type(membresia).__name__}")
+        boveda = BovedaTarjetas(os.path.join(carpeta, "boveda.bin"), os.urandom(32))
+        print(f"Tarjetas tokenizadas: {almacen.proteger_tarjetas(boveda)}")
+        almacen.registrar_lote([("Nuevo", Basica("nuevo@ejemplo.com", "4111111111111111"))])
+        almacen.guardar()
+        print(f"Tarjetas en claro tras guardar: {sum(not es_token(fila[3]) for fila in almacen.filas())}")
+        almacen.cerrar()
+        reabierto = AlmacenMapeado(ruta, max_en_memoria=10)
+        print(f"Al reabrir: {reabierto.proteger_tarjetas(boveda)} tarjetas en claro, "
+              f"decodificados en memoria: {reabierto.en_memoria}")
+        reabierto.cerrar()
+        boveda.cerrar()
+
+def probar_listado_paginado():
+    print("\nProbando listado paginado con filtros:")
+    registro = RegistroClientes()
+    indice = IndiceClientes(registro)
+    for i in range(10):
+        dominio = "ejemplo.com" if i % 2 else "otro.com"
+        registro.registrar(f"Cliente {i}", Basica(f"cliente{i}@{dominio}", "1234567890123456"))
+    registro.cambiar_membresia(2, 4)
+    registro.cancelar(4)
+    pagina = indice.pagina(0, 3, activo=True, dominio="ejemplo.com")
+    print(f"Primera página: {[id_cliente for id_cliente, _, _ in pagina.clientes]}, cursor: {pagina.siguiente}")
+    registro.cancelar(1)
+    pagina = indice.pagina(pagina.siguiente, 3, activo=True, dominio="ejemplo.com")
+    print(f"Segunda página tras cancelar al cliente 1: {[id_cliente for id_cliente, _, _ in pagina.clientes]}")
+    print(f"Clientes Pro: {indice.contar(tipo=Pro)}, inactivos: {indice.contar(activo=False)}")
+    try:
+        indice.pagina(0, 0)
+    except ValueError as error:
+        print(f"Límite 0: {error}")
+
+def probar_unicidad():
+    print("\nProbando detección de correos y tarjetas repetidos:")
+    clave = os.urandom(32)
+    control = ControlUnicidad(clave)
+    control.reservar("ana@ejemplo.com", "4111111111111111")
+    for correo, tarjeta in (("ANA@ejemplo.com", "4012888888881881"), ("bob@ejemplo.com", "4111111111111111")):
+        try:
+            control.reservar(correo, tarjeta)
+        except ValueError as error:
+            print(f"{correo}: {error}")
+    print(f"Rechazos del lote: {control.reservar_lote([('c@ejemplo.com', '1'), ('d@ejemplo.com', '1')])}")
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "datos.unq")
+        control.guardar(ruta)
+        recuperado = ControlUnicidad.cargar(ruta, clave)
+        print(f"Tras recargar, tarjeta registrada: {recuperado.tarjeta_registrada('4111111111111111')}")
+
+def probar_metricas():
+    print("\nProbando métricas de operación:")
+    registro = RegistroClientes()
+    registro_metricas = metricas.activar()
+    try:
+        registro_metricas.observar(registro)
+        id_ana = registro.registrar("Ana Pérez", Basica("ana@ejemplo.com", "1234567890123456"))
+        registro.cambiar_membresia(id_ana, 4)
+        registro.cancelar(id_ana)
+    finally:
+        metricas.desactivar()
+    for linea in registro_metricas.exportar_texto().splitlines():
+        if linea.startswith(("membresias_transiciones_total", "membresias_suscriptores")):
+            print(linea)
+
+def probar_historial():
+    print("\nProbando historial de membresías:")
+    instante = [0.0]
+    registro = RegistroClientes()
+    historial = HistorialMembresias(reloj=lambda: instante[0])
+    historial.conectar(registro)
+    id_ana = registro.registrar("Ana Pérez", Basica("ana@ejemplo.com", "1234567890123456"))
+    id_luis = registro.registrar("Luis Soto", Pro("luis@ejemplo.com", "1234567890123456"))
+    instante[0] = 10
+    registro.cambiar_membresia(id_ana, 4)
+    instante[0] = 20
+    registro.cancelar(id_luis)
+    print(f"Tipo de Ana en t=5: {historial.tipo_en(id_ana, 5)}, en t=15: {historial.tipo_en(id_ana, 15)}")
+    print(f"Tipo de Luis en t=25: {historial.tipo_en(id_luis, 25)}")
+    print(f"Suscriptores Pro entre t=0 y t=5: {historial.suscriptores_en(4, 0, 5)}")
+    print(f"Suscriptores Pro entre t=12 y t=30: {historial.suscriptores_en(4, 12, 30)}")
+
+def probar_credenciales():
+    print("\nProbando credenciales con bcrypt:")
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "credenciales.json")
+        credenciales = AlmacenCredenciales(ruta, costo=4, trabajadores=2)
+        credenciales.establecer(1, "contraseña segura").result()
+        print(f"Contraseña correcta: {credenciales.verificar(1, 'contraseña segura').result()}")
+        print(f"Contraseña incorrecta: {credenciales.verificar(1, 'otra contraseña').result()}")
+        print(f"Cliente sin credenciales: {credenciales.verificar(2, 'contraseña segura').result()}")
+        try:
+            credenciales.establecer(2, "corta")
+        except ValueError as error:
+            print(f"Contraseña rechazada: {error}")
+        credenciales.cerrar()
+        credenciales = AlmacenCredenciales(ruta, costo=5, trabajadores=2)
+        print(f"Verificación tras reabrir con otro costo: {credenciales.verificar(1, 'contraseña segura').result()}")
+        print(f"Rehashes: {credenciales.rehashes}, costo actual: {costo_de(credenciales._hashes[1])}")
+        credenciales.establecer(3, "otra contraseña segura").result()
+        # Sin cerrar ni guardar, como tras una interrupción; la bitácora termina en una línea incompleta
+        with open(ruta + ".log", "a", encoding="utf-8") as archivo:
+            archivo.write('{"id": 4, "ha')
+        recuperadas = AlmacenCredenciales(ruta, costo=5, trabajadores=2)
+        print(f"Tras una interrupción, cliente 3 con contraseña: {3 in recuperadas}")
+        recuperadas.cerrar()
+        credenciales.cerrar()
+
+def probar_boveda_tarjetas():
+    print("\nProbando bóveda de tarjetas:")
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "boveda.bin")
+        clave = os.urandom(32)
+        registro = RegistroClientes()
+        registro.registrar("Ana Pérez", Basica("ana@ejemplo.com", "4111111111111111"))
+        boveda = BovedaTarjetas(ruta, clave)
+        print(f"Tarjetas tokenizadas al proteger el registro: {registro.proteger_tarjetas(boveda)}")
+        unicidad = ControlUnicidad(clave)
+        unicidad.conectar(registro)
+        id_luis = registro.registrar("Luis Soto", Pro("luis@ejemplo.com", "5555555555554444"))
+        token = registro.obtener(id_luis)[1].numero_tarjeta
+        print(f"Tarjeta guardada en el registro: {token[:4]}... (token)")
+        print(f"Tarjeta repetida detectada con token: {unicidad.tarjeta_registrada('5555555555554444')}")
+        boveda.cerrar()
+        boveda = BovedaTarjetas(ruta, clave)
+        print(f"Tarjeta revelada tras reabrir: {boveda.revelar(token)}")
+        ciclo = CicloFacturacion.desde_registro(registro, inicio=0, reloj=lambda: 0)
+        print(f"Cobros del ciclo: {ciclo.cerrar().cobros(registro, boveda)}")
+        try:
+            BovedaTarjetas(ruta, os.urandom(32))
+        except ValueError as error:
+            print(f"Clave incorrecta rechazada: {error}")
+        boveda.cerrar()
+
+def probar_formato_registros():
+    print("\nProbando formato binario de registros:")
+    registro = RegistroClientes()
+    registro.registrar("José Núñez", SinConexión("jose@ejemplo.com", "1234567890123456"))
+    id_ana = registro.registrar("Ana Pérez", Basica("ana@ejemplo.com", "1234567890123456"))
+    registro.cancelar(id_ana)
+    datos = codificar_filas(registro.filas(), secuencia=7)
+    filas, secuencia = decodificar_filas(datos)
+    print(f"Filas recuperadas: {filas == list(registro.filas())}, secuencia: {secuencia}")
+    try:
+        decodificar_filas(datos[:-1] + bytes([datos[-1] ^ 1]))
+    except ValueError as error:
+        print(f"Datos dañados rechazados: {error}")
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_pickle = os.path.join(carpeta, "datos.pkl")
+        ruta_destino = os.path.join(carpeta, "datos.dat")
+        with open(ruta_pickle, "wb") as archivo:
+            pickle.dump({"version": 1, "secuencia": 3, "registro": registro}, archivo)
+        print(f"Migración desde pickle: {migrar_pickle(ruta_pickle, ruta_destino)}")
+        filas, secuencia = cargar_filas(ruta_destino)
+        print(f"Clientes migrados: {len(filas)}, secuencia: {secuencia}")
+        print(f"Pickle eliminado tras migrar: {not os.path.exists(ruta_pickle)}")
+        print(f"Segunda migración omitida: {not migrar_pickle(ruta_pickle, ruta_destino)}")
+
+def probar_almacen_sqlite():
+    print("\nProbando almacén SQLite:")
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "datos.db")
+        almacen = AlmacenSQLite(ruta, confirmar_cada=0)
+        with almacen.en_lote():
+            ids = almacen.registrar_lote([(f"Cliente {i}", Basica(f"cliente{i}@ejemplo.com", "1234567890123456"))
+                                          for i in range(100)] + [("Repetido", Pro("cliente0@ejemplo.com", "1"))])
+        print(f"Registrados: {len(almacen)}, correo repetido rechazado: {ids[-1] is None}")
+        almacen.cambiar_membresia(almacen.buscar_por_correo("cliente42@ejemplo.com"), 4)
+        almacen.cancelar(7)
+        print(f"Por tipo: {almacen.contar_por_tipo()}, inactivos: {almacen.total_inactivos}")
+        almacen.cerrar()
+        almacen = AlmacenSQLite(ruta)
+        nombre, membresia = almacen.obtener(43)
+        print(f"Tras reabrir: {nombre} - {type(membresia).__name__}, activos: {almacen.total_activos}")
+        almacen.cerrar()
+
+def probar_registro_concurrente():
+    print("\nProbando registro concurrente con versiones:")
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_bitacora = os.path.join(carpeta, "datos.log")
+        ruta_instantanea = os.path.join(carpeta, "datos.dat")
+        bitacora = Bitacora(ruta_bitacora, ruta_instantanea, sincronizar_cada=0, compactar_cada=50,
+                            compactar_en_segundo_plano=True)
+        registro = bitacora.cargar(RegistroConcurrente)
+        for i in range(10):
+            registro.registrar(f"Cliente {i}", Basica(f"cliente{i}@ejemplo.com", "1234567890123456"))
+        _, _, _, version = registro.leer(1)
+        registro.cambiar_membresia(1, 4)
+        try:
+            registro.cambiar_membresia(1, 2, version=version)
+        except ConflictoVersion as error:
+            print(f"Cambio con versión vieja rechazado: {error}")
+
+        aplicados = []
+
+        def trabajador():
+            cantidad = 0
+            for _ in range(50):
+                for id_cliente in range(1, 11):
+                    while True:
+                        _, membresia, _, version = registro.leer(id_cliente)
+                        destino = 4 if membresia._codigo == 1 else 1
+                        try:
+                            registro.cambiar_membresia(id_cliente, destino, version=version)
+                        except ConflictoVersion:
+                            continue
+                        cantidad += 1
+                        break
+            aplicados.append(cantidad)
+
+        hilos = [threading.Thread(target=trabajador) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        versiones = sum(registro.version(id_cliente) for id_cliente in range(1, 11))
+        print(f"Cambios aplicados: {sum(aplicados)}, sin cambios perdidos: {versiones == 10 + 1 + sum(aplicados)}")
+        bitacora.cerrar()
+        recuperado = Bitacora(ruta_bitacora, ruta_instantanea).cargar()
+        print(f"Bitácora consistente tras compactar en paralelo: {list(recuperado.filas()) == list(registro.filas())}")
+
+def probar_sesiones():
+    print("\nProbando admisión de reproducciones:")
+    registro = RegistroClientes()
+    id_ana = registro.registrar("Ana Pérez", Basica("ana@ejemplo.com", "1234567890123456"))
+    instante = [0.0]
+    sesiones = ControlSesiones(registro, duracion=60, resolucion=1, reloj=lambda: instante[0])
+    televisor = sesiones.iniciar(id_ana, "televisor")
+    sesiones.iniciar(id_ana, "celular")
+    print(f"Mismo dispositivo reutiliza la sesión: {sesiones.iniciar(id_ana, 'televisor') == televisor}")
+    try:
+        sesiones.iniciar(id_ana, "notebook")
+    except ValueError as error:
+        print(f"Tercer dispositivo rechazado: {error}")
+    instante[0] = 50
+    sesiones.latido(televisor)
+    instante[0] = 70
+    print(f"Sesiones activas tras vencer la del celular: {sesiones.activas(id_ana)}")
+    sesiones.iniciar(id_ana, "notebook")
+    registro.cancelar(id_ana)
+    print(f"Sesiones tras cancelar la membresía: {len(sesiones)}")
+
+def probar_descargas():
+    print("\nProbando descargas sin conexión:")
+    registro = RegistroClientes()
+    id_jose = registro.registrar("José Núñez", SinConexión("jose@ejemplo.com", "1234567890123456"))
+    id_ana = registro.registrar("Ana Pérez", Basica("ana@ejemplo.com", "1234567890123456"))
+    instante = [0.0]
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "descargas.log")
+        descargas = LibroDescargas(ruta, reloj=lambda: instante[0])
+        descargas.conectar(registro)
+        for i in range(25):
+            descargas.descargar(id_jose, "tablet", f"titulo-{i}", duracion=100 + i)
+        for id_cliente, titulo in ((id_jose, "titulo-25"), (id_ana, "titulo-0")):
+            try:
+                descargas.descargar(id_cliente, "tablet", titulo)
+            except ValueError as error:
+                print(f"Descarga rechazada: {error}")
+        instante[0] = 110
+        print(f"Títulos en la tablet tras vencer 11 licencias: {len(descargas.disponibles(id_jose, 'tablet'))}")
+        descargas.cerrar()
+        recuperado = LibroDescargas(ruta, reloj=lambda: instante[0])
+        recuperado.conectar(registro)
+        print(f"Descargas recuperadas del archivo: {recuperado.cantidad(id_jose)}")
+        registro.cancelar(id_jose)
+        print(f"Descargas tras cancelar la membresía: {len(recuperado)}")
+        recuperado.cerrar()
+
+def probar_catalogo_parental():
+    print("\nProbando filtrado del catálogo por perfil parental:")
+    catalogo = Catalogo()
+    titulos = [("Machuca", "14", ["drama"]), ("Ogú y Mampato", "TE", ["animación"]),
+               ("Historia de un oso", "TE", ["animación", "drama"]), ("Tony Manero", "18", ["drama"]),
+               ("Papelucho", "TE+7", ["animación"])]
+    for titulo, clasificacion, etiquetas in titulos:
+        catalogo.agregar(titulo, clasificacion, etiquetas)
+    registro = RegistroClientes()
+    id_familia = registro.registrar("Familia Soto", Familiar("familia@ejemplo.com", "1234567890123456"))
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "perfiles.log")
+        perfiles = LibroPerfiles(ruta)
+        perfiles.conectar(registro)
+        ninos = perfiles.modificar(id_familia, "Niños", clasificacion_maxima="TE+7", etiquetas_bloqueadas=["drama"])
+        print(f"Página para Niños: {catalogo.pagina(ninos)[0]}")
+        print(f"Animación para Niños: {catalogo.pagina(ninos, etiqueta='animación', limite=1)}")
+        perfiles.modificar(id_familia, "Niños", clasificacion_maxima="14", etiquetas_bloqueadas=[])
+        print(f"Tras cambiar la regla: {catalogo.pagina(ninos)[0]}, compilaciones: {catalogo.compilaciones}")
+        registro.cancelar(id_familia)
+        registro.reactivar(id_familia, Pro("familia@ejemplo.com", "1234567890123456"))
+        perfiles.cerrar()
+        # Tras un reinicio los perfiles se reconstruyen desde el archivo
+        recuperado = LibroPerfiles(ruta)
+        recuperado.conectar(registro)
+        ninos = recuperado.perfiles(id_familia)["Niños"]
+        print(f"Tras reactivar y reiniciar: {ninos.clasificacion_maxima}, bloqueadas: {sorted(ninos.etiquetas_bloqueadas)}")
+        registro.cambiar_membresia(id_familia, 1)
+        try:
+            recuperado.modificar(id_familia, "Niños", clasificacion_maxima="TE")
+        except ValueError as error:
+            print(f"Con membresía Básica: {error}")
+        recuperado.cerrar()
+
+def probar_analitica():
+    print("\nProbando estadísticas incrementales de suscriptores:")
+    # 15 de enero y 10 de marzo de 2024 (mediodía, para no depender de la zona horaria)
+    enero, marzo = 1705320000.0, 1710072000.0
+    instante = [enero]
+    registro = RegistroClientes()
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "historial.log")
+        historial = HistorialMembresias(ruta, reloj=lambda: instante[0])
+        historial.conectar(registro)
+        id_ana = registro.registrar("Ana Pérez", Pro("ana@ejemplo.com", "1234567890123456"))
+        id_luis = registro.registrar("Luis Soto", Familiar("luis@ejemplo.com", "1234567890123456"))
+        instante[0] = marzo
+        registro.cambiar_membresia(id_ana, 1)
+        registro.cancelar(id_luis)
+        registro.registrar("Eva Ríos", Basica("eva@ejemplo.com", "1234567890123456"))
+        historial.cerrar()
+        # Reconstruida desde el historial, como al iniciar el programa
+        analitica = AnaliticaSuscriptores(ruta, reloj=lambda: instante[0])
+        analitica.conectar(registro)
+    print(f"Activos por tipo: {analitica.activos_por_tipo()}")
+    print(f"Cambios de Pro a Básica: {analitica.transiciones(4, 1)}")
+    print(f"Marzo: {analitica.resumen_periodo(marzo)}")
+    print(f"Cohortes: {analitica.cohortes()}")
+    registro.reactivar(id_luis, Pro("luis@ejemplo.com", "1234567890123456"))
+    print(f"Tras reactivar a Luis: Pro activos {analitica.activos(4)}, cohorte de enero {analitica.cohorte('2024-01')}")
+    analitica.cerrar()
+
+    # Registro con clientes anteriores al historial: se incorporan sin contarse como altas
+    registro = RegistroClientes()
+    for i in range(3):
+        registro.registrar(f"Cliente {i}", Basica(f"cliente{i}@ejemplo.com", "1234567890123456"))
+    instante[0] = enero
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "historial.log")
+        historial = HistorialMembresias(ruta, reloj=lambda: instante[0])
+        historial.conectar(registro)
+        instante[0] = marzo
+        registro.registrar("Eva Ríos", Basica("eva@ejemplo.com", "1234567890123456"))
+        registro.cancelar(1)
+        historial.cerrar()
+        analitica = AnaliticaSuscriptores(ruta, reloj=lambda: instante[0])
+        analitica.conectar(registro)
+    print(f"Enero con clientes anteriores: {analitica.resumen_periodo(enero)['altas']} altas")
+    resumen = analitica.resumen_periodo(marzo)
+    print(f"Marzo: {resumen['altas']} alta, {resumen['bajas']} baja, activos al inicio {resumen['activos_al_inicio']}")
+    print(f"Tipo del cliente 2 en marzo: {historial.tipo_en(2, marzo)}")
+    analitica.cerrar()
+
 if __name__ == "__main__":
     # Crea una instancia de cada tipo de membresía
     gratis = Gratis("correo@ejemplo.com", "1234567890123456")
@@ -50,4 +713,83 @@ if __name__ == "__main__":
 
     # Prueba contenido sin conexión (solo para SinConexión y Pro)
     probar_contenido_sin_conexion(sin_conexion)
-    probar_contenido_sin_conexion(pro)
\ No newline at end of file
+    probar_contenido_sin_conexion(pro)
+
+    # Prueba registro indexado de clientes
+    probar_registro_clientes()
+
+    # Prueba bitácora de operaciones
+    probar_bitacora()
+
+    # Prueba bitácora con una escritura interrumpida
+    probar_bitacora_interrumpida()
+
+    # Prueba almacén compacto
+    probar_almacen_compacto()
+
+    # Prueba cifrado por segmentos
+    probar_cifrado_por_segmentos()
+
+    # Prueba gestor de claves
+    probar_gestor_claves()
+
+    # Prueba validaciones e importación masiva
+    probar_validaciones()
+    probar_importacion_masiva()
+
+    # Prueba transiciones masivas
+    probar_transiciones_masivas()
+
+    # Prueba facturación
+    probar_facturacion()
+
+    # Prueba servicio asíncrono
+    probar_servicio_asincrono()
+
+    # Prueba almacén fragmentado
+    probar_almacen_fragmentado()
+
+    # Prueba almacén mapeado en memoria
+    probar_almacen_mapeado()
+
+    # Prueba listado paginado con filtros
+    probar_listado_paginado()
+
+    # Prueba detección de correos y tarjetas repetidos
+    probar_unicidad()
+
+    # Prueba métricas de operación
+    probar_metricas()
+
+    # Prueba historial de membresías
+    probar_historial()
+
+    # Prueba credenciales
+    probar_credenciales()
+
+    # Prueba bóveda de tarjetas
+    probar_boveda_tarjetas()
+
+    # Prueba formato binario de registros
+    probar_formato_registros()
+
+    # Prueba almacén SQLite
+    probar_almacen_sqlite()
+
+    # Prueba registro concurrente
+    probar_registro_concurrente()
+
+    # Prueba admisión de reproducciones
+    probar_sesiones()
+
+    # Prueba descargas sin conexión
+    probar_descargas()
+
+    # Prueba filtrado del catálogo por perfil parental
+    probar_catalogo_parental()
+
+    # Prueba estadísticas incrementales de suscriptores
+    probar_analitica()
+
+    # Prueba de la bitácora cuando falla la instantánea
+    probar_bitacora_compactacion_fallida()
\ No newline at end of file
@@ -0,0 +1,406 @@
+import contextlib
+
+from boveda_tarjetas import es_token
+from membresia import Membresia, TIPOS_MEMBRESIA, crear_membresia
+
+
+def fila_cliente(id_cliente: int, nombre: str, membresia: Membresia, activo: bool) -> tuple:
+    """
+    Convierte un cliente en una tupla de valores simples, apta para serializar.
+
+    Args:
+        id_cliente (int): Identificador del cliente.
+        nombre (str): Nombre completo del cliente.
+        membresia (Membresia): Membresía del cliente.
+        activo (bool): Si el cliente está activo.
+
+    Returns:
+        tuple: Tupla (id_cliente, nombre, correo, numero_tarjeta, tipo, activo, contenido_sin_conexion).
+    """
+    return (id_cliente, nombre, membresia.correo, membresia.numero_tarjeta, membresia._codigo, activo,
+            getattr(membresia, "_contenido_sin_conexion", 0))
+
+
+def cliente_desde_fila(fila: tuple) -> tuple:
+    """
+    Reconstruye un cliente a partir de una tupla generada por fila_cliente.
+
+    Args:
+        fila (tuple): Tupla (id_cliente, nombre, correo, numero_tarjeta, tipo, activo, contenido_sin_conexion).
+
+    Returns:
+        tuple: Tupla (id_cliente, nombre, membresia, activo).
+    """
+    id_cliente, nombre, correo, numero_tarjeta, tipo, activo, contenido_sin_conexion = fila
+    membresia = crear_membresia(tipo, correo, numero_tarjeta)
+    if contenido_sin_conexion:
+        membresia._contenido_sin_conexion = contenido_sin_conexion
+    return id_cliente, nombre, membresia, activo
+
+
+class RegistroClientes:
+    """
+    Registro indexado de clientes activos e inactivos.
+
+    Cada cliente recibe un identificador estable al registrarse. Los índices por
+    identificador y por correo permiten búsquedas en O(1), y los conjuntos de activos
+    e inactivos se guardan como diccionarios (que preservan el orden de inserción),
+    de modo que mover un cliente entre ellos también cuesta O(1).
+    """
+
+    def __init__(self):
+        """
+        Inicializa un registro vacío.
+        """
+        self._clientes = {}
+        self._por_correo = {}
+        self._activos = {}
+        self._inactivos = {}
+        self._siguiente_id = 1
+        self._oyentes = []
+        self._boveda = None
+
+    @classmethod
+    def desde_listas(cls, clientes_activos: list, clientes_inactivos: list) -> 'RegistroClientes':
+        """
+        Construye un registro a partir de las listas de tuplas (nombre, membresia) usadas
+        por las versiones anteriores del sistema.
+
+        Args:
+            clientes_activos (list): Lista de tuplas (nombre, membresia) de clientes activos.
+            clientes_inactivos (list): Lista de tuplas (nombre, membresia) de clientes inactivos.
+
+        Returns:
+            RegistroClientes: Registro con todos los clientes cargados.
+        """
+        registro = cls()
+        for nombre, membresia in clientes_activos:
+            registro.registrar(nombre, membresia)
+        for nombre, membresia in clientes_inactivos:
+            id_cliente = registro.registrar(nombre, membresia)
+            del registro._activos[id_cliente]
+            registro._inactivos[id_cliente] = None
+        return registro
+
+    @classmethod
+    def desde_filas(cls, filas) -> 'RegistroClientes':
+        """
+        Construye un registro a partir de tuplas generadas por fila_cliente.
+
+        Args:
+            filas (iterable): Tuplas de clientes.
+
+        Returns:
+            RegistroClientes: Registro con todos los clientes cargados.
+        """
+        registro = cls()
+        clientes, por_correo = registro._clientes, registro._por_correo
+        activos, inactivos = registro._activos, registro._inactivos
+        # Se llenan los diccionarios directamente: es el camino de carga de todo el registro
+        for id_cliente, nombre, correo, numero_tarjeta, tipo, activo, contenido_sin_conexion in filas:
+            membresia = TIPOS_MEMBRESIA[tipo](correo, numero_tarjeta)
+            if contenido_sin_conexion:
+                membresia._contenido_sin_conexion = contenido_sin_conexion
+            clientes[id_cliente] = (nombre, membresia)
+            por_correo[correo] = id_cliente
+            if activo:
+                activos[id_cliente] = None
+            else:
+                inactivos[id_cliente] = None
+        registro._siguiente_id = max(clientes, default=0) + 1
+        return registro
+
+    def filas(self):
+        """
+        Recorre todos los clientes como tuplas de valores simples (ver fila_cliente).
+
+        Yields:
+            tuple: Una tupla por cliente.
+        """
+        for id_cliente, (nombre, membresia) in self._clientes.items():
+            yield fila_cliente(id_cliente, nombre, membresia, id_cliente in self._activos)
+
+    def pausar_cambios(self):
+        """
+        Devuelve un administrador de contexto durante el cual ninguna modificación se aplica
+        ni se notifica a los oyentes. Este registro se usa desde un solo hilo, por lo que no
+        hace nada; RegistroConcurrente lo implementa con su candado de cambios.
+        """
+        return contextlib.nullcontext()
+
+    def __getstate__(self):
+        estado = self.__dict__.copy()
+        # Los oyentes son objetos de la sesión (archivos, sockets, etc.) y no se persisten
+        estado["_oyentes"] = []
+        estado["_boveda"] = None
+        return estado
+
+    def __setstate__(self, estado):
+        # Las instantáneas anteriores a la bóveda de tarjetas no tienen el atributo
+        estado.setdefault("_boveda", None)
+        self.__dict__.update(estado)
+
+    def __len__(self):
+        return len(self._clientes)
+
+    def __contains__(self, id_cliente):
+        return id_cliente in self._clientes
+
+    @property
+    def total_activos(self) -> int:
+        """
+        Devuelve la cantidad de clientes activos.
+        """
+        return len(self._activos)
+
+    @property
+    def total_inactivos(self) -> int:
+        """
+        Devuelve la cantidad de clientes inactivos.
+        """
+        return len(self._inactivos)
+
+    @property
+    def boveda(self):
+        """
+        Devuelve la bóveda de tarjetas en uso, o None si las tarjetas no se tokenizan.
+        """
+        return self._boveda
+
+    def proteger_tarjetas(self, boveda) -> int:
+        """
+        Tokeniza las tarjetas en claro del registro y las de todos los clientes que se registren después.
+
+        Las membresías se modifican en el lugar y sin notificar a los oyentes, ya que el
+        cliente no cambia; conviene guardar una instantánea nueva si se tokenizó alguna.
+
+        Args:
+            boveda (BovedaTarjetas): Bóveda donde se guardan las tarjetas cifradas.
+
+        Returns:
+            int: Cantidad de tarjetas que estaban en claro.
+        """
+        self._boveda = boveda
+        return self._tokenizar(membresia for _, membresia in self._clientes.values())
+
+    def _tokenizar(self, membresias):
+        pendientes = [membresia for membresia in membresias if not es_token(membresia.numero_tarjeta)]
+        if pendientes:
+            tokens = self._boveda.tokenizar_lote([membresia.numero_tarjeta for membresia in pendientes])
+            for membresia, token in zip(pendientes, tokens):
+                membresia._numero_tarjeta = token
+        return len(pendientes)
+
+    def suscribir(self, oyente):
+        """
+        Registra una función que será notificada después de cada modificación.
+
+        El oyente se llama como ``oyente(operacion, id_cliente, nombre, anterior, nueva)``,
+        donde ``operacion`` es "registrar", "cambiar", "cancelar" o "reactivar", y
+        ``anterior`` es None al registrar.
+
+        Args:
+            oyente (callable): Función a notificar.
+        """
+        self._oyentes.append(oyente)
+
+    def desuscribir(self, oyente):
+        """
+        Elimina un oyente previamente registrado.
+
+        Args:
+            oyente (callable): Función a eliminar.
+        """
+        self._oyentes.remove(oyente)
+
+    def _notificar(self, operacion, id_cliente, nombre, anterior, nueva):
+        for oyente in self._oyentes:
+            oyente(operacion, id_cliente, nombre, anterior, nueva)
+
+    def _guardar(self, operacion, id_cliente, nombre, anterior, nueva):
+        """Aplica una modificación ya validada a los índices y notifica a los oyentes."""
+        self._clientes[id_cliente] = (nombre, nueva)
+        if operacion == "registrar":
+            self._por_correo[nueva.correo] = id_cliente
+            self._activos[id_cliente] = None
+        elif operacion == "cancelar":
+            del self._activos[id_cliente]
+            self._inactivos[id_cliente] = None
+        elif operacion == "reactivar":
+            del self._inactivos[id_cliente]
+            self._activos[id_cliente] = None
+        self._notificar(operacion, id_cliente, nombre, anterior, nueva)
+
+    def registrar(self, nombre: str, membresia: Membresia, id_cliente: int = None) -> int:
+        """
+        Registra un nuevo cliente activo.
+
+        Args:
+            nombre (str): Nombre completo del cliente.
+            membresia (Membresia): Membresía inicial del cliente.
+            id_cliente (int, optional): Identificador a asignar. Si se omite se usa el siguiente libre.
+
+        Returns:
+            int: Identificador asignado al cliente.
+
+        Raises:
+            ValueError: Si el correo o el identificador ya están registrados.
+        """
+        if membresia.correo in self._por_correo:
+            raise ValueError(f"El correo {membresia.correo} ya está registrado.")
+        if id_cliente is None:
+            id_cliente = self._siguiente_id
+        elif id_cliente in self._clientes:
+            raise ValueError(f"El identificador {id_cliente} ya está registrado.")
+        self._siguiente_id = max(self._siguiente_id, id_cliente + 1)
+        if self._boveda is not None:
+            self._tokenizar([membresia])
+
+        self._guardar("registrar", id_cliente, nombre, None, membresia)
+        return id_cliente
+
+    def registrar_lote(self, clientes: list) -> list:
+        """
+        Registra varios clientes activos de una vez.
+
+        Args:
+            clientes (list): Lista de tuplas (nombre, membresia).
+
+        Returns:
+            list: Identificador asignado a cada cliente, o None si su correo ya estaba registrado.
+        """
+        if self._boveda is not None:
+            # Una sola escritura en la bóveda para todo el lote
+            self._tokenizar(membresia for _, membresia in clientes if membresia.correo not in self._por_correo)
+        ids = []
+        for nombre, membresia in clientes:
+            if membresia.correo in self._por_correo:
+                ids.append(None)
+            else:
+                ids.append(self.registrar(nombre, membresia))
+        return ids
+
+    def obtener(self, id_cliente: int) -> tuple:
+        """
+        Devuelve el cliente asociado a un identificador.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+
+        Returns:
+            tuple: Tupla (nombre, membresia).
+
+        Raises:
+            KeyError: Si el identificador no existe.
+        """
+        return self._clientes[id_cliente]
+
+    def buscar_por_correo(self, correo: str):
+        """
+        Busca el identificador de un cliente por su correo electrónico.
+
+        Args:
+            correo (str): Correo electrónico del cliente.
+
+        Returns:
+            int: Identificador del cliente, o None si no existe.
+        """
+        return self._por_correo.get(correo)
+
+    def esta_activo(self, id_cliente: int) -> bool:
+        """
+        Indica si un cliente está activo.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+
+        Returns:
+            bool: True si el cliente está en el conjunto de activos.
+        """
+        return id_cliente in self._activos
+
+    def activos(self):
+        """
+        Recorre los clientes activos en orden de llegada.
+
+        Yields:
+            tuple: Tuplas (id_cliente, nombre, membresia).
+        """
+        for id_cliente in self._activos:
+            nombre, membresia = self._clientes[id_cliente]
+            yield id_cliente, nombre, membresia
+
+    def inactivos(self):
+        """
+        Recorre los clientes inactivos en orden de llegada.
+
+        Yields:
+            tuple: Tuplas (id_cliente, nombre, membresia).
+        """
+        for id_cliente in self._inactivos:
+            nombre, membresia = self._clientes[id_cliente]
+            yield id_cliente, nombre, membresia
+
+    def _obtener_activo(self, id_cliente):
+        if id_cliente not in self._activos:
+            raise KeyError(f"No existe un cliente activo con identificador {id_cliente}.")
+        return self._clientes[id_cliente]
+
+    def cambiar_membresia(self, id_cliente: int, tipo_membresia: int) -> Membresia:
+        """
+        Cambia la membresía de un cliente activo según las reglas de su membresía actual.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            tipo_membresia (int): Identificador numérico del tipo de membresía deseado.
+
+        Returns:
+            Membresia: Nueva membresía, si el cambio fue exitoso.
+                        Membresía actual, si el cambio no fue exitoso.
+
+        Raises:
+            KeyError: Si el cliente no existe o no está activo.
+        """
+        nombre, membresia_actual = self._obtener_activo(id_cliente)
+        nueva_membresia = membresia_actual.cambiar_membresia(tipo_membresia)
+        if nueva_membresia is not membresia_actual:
+            self._guardar("cambiar", id_cliente, nombre, membresia_actual, nueva_membresia)
+        return nueva_membresia
+
+    def cancelar(self, id_cliente: int) -> Membresia:
+        """
+        Cancela la membresía de un cliente activo y lo mueve a los inactivos.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+
+        Returns:
+            Membresia: Membresía resultante de la cancelación.
+
+        Raises:
+            KeyError: Si el cliente no existe o no está activo.
+        """
+        nombre, membresia_actual = self._obtener_activo(id_cliente)
+        cancelada = membresia_actual.cancelar_membresia()
+        self._guardar("cancelar", id_cliente, nombre, membresia_actual, cancelada)
+        return cancelada
+
+    def reactivar(self, id_cliente: int, nueva_membresia: Membresia) -> Membresia:
+        """
+        Reactiva a un cliente inactivo con una nueva membresía.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            nueva_membresia (Membresia): Membresía con la que se reactiva al cliente.
+
+        Returns:
+            Membresia: Membresía asignada al cliente.
+
+        Raises:
+            KeyError: Si el cliente no existe o no está inactivo.
+        """
+        if id_cliente not in self._inactivos:
+            raise KeyError(f"No existe un cliente inactivo con identificador {id_cliente}.")
+        nombre, membresia_actual = self._clientes[id_cliente]
+        self._guardar("reactivar", id_cliente, nombre, membresia_actual, nueva_membresia)
+        return nueva_membresia
@@ -0,0 +1,226 @@
+import threading
+
+from membresia import Membresia
+from registro_clientes import RegistroClientes
+
+FRANJAS_POR_DEFECTO = 64
+
+
+class ConflictoVersion(ValueError):
+    """
+    El cliente fue modificado por otro trabajador después de leerlo.
+    """
+
+    def __init__(self, id_cliente: int, esperada: int, actual: int):
+        super().__init__(f"El cliente {id_cliente} fue modificado por otro trabajador "
+                         f"(versión esperada {esperada}, actual {actual}).")
+        self.id_cliente = id_cliente
+        self.esperada = esperada
+        self.actual = actual
+
+
+class RegistroConcurrente(RegistroClientes):
+    """
+    Registro de clientes que varios hilos pueden modificar a la vez.
+
+    Cada cliente tiene un número de versión que aumenta con cada modificación. Un
+    trabajador lee el cliente con su versión (leer()), decide el cambio sin retener
+    ningún candado y lo aplica indicando esa versión: si otro trabajador modificó al
+    cliente entretanto, la operación falla con ConflictoVersion en lugar de pisar el
+    cambio ajeno (compare-and-swap), y el trabajador puede volver a leer y reintentar.
+
+    Las operaciones sobre un mismo cliente se serializan con un candado por franja
+    (el identificador elige uno de un conjunto fijo de candados), por lo que clientes
+    distintos casi nunca se esperan entre sí. Solo la escritura final en los índices y
+    el aviso a los oyentes, ambos O(1), pasan por un candado común: así los oyentes
+    (bitácora, índices, historial) reciben los eventos en el mismo orden en que se
+    aplicaron y una compactación nunca ve un cambio que aún no llegó a la bitácora.
+    """
+
+    def __init__(self, franjas: int = FRANJAS_POR_DEFECTO):
+        """
+        Inicializa un registro vacío.
+
+        Args:
+            franjas (int): Cantidad de candados entre los que se reparten los clientes.
+        """
+        super().__init__()
+        self._versiones = {}
+        self._cantidad_franjas = franjas
+        self._crear_candados()
+
+    def _crear_candados(self):
+        self._franjas = [threading.Lock() for _ in range(self._cantidad_franjas)]
+        # Reentrante: registrar_lote llama a registrar, y la bitácora compacta (y lee
+        # filas()) desde el aviso de un cambio
+        self._candado_altas = threading.RLock()
+        self._candado_cambios = threading.RLock()
+
+    def __getstate__(self):
+        estado = super().__getstate__()
+        for atributo in ("_franjas", "_candado_altas", "_candado_cambios"):
+            del estado[atributo]
+        return estado
+
+    def __setstate__(self, estado):
+        super().__setstate__(estado)
+        self._crear_candados()
+
+    def _franja(self, id_cliente):
+        return self._franjas[hash(id_cliente) % self._cantidad_franjas]
+
+    def pausar_cambios(self):
+        """
+        Devuelve el candado de cambios: mientras se retiene, ninguna modificación se aplica
+        ni se notifica, lo que permite tomar una foto del registro junto con el número de
+        secuencia de la bitácora.
+        """
+        return self._candado_cambios
+
+    def version(self, id_cliente: int) -> int:
+        """
+        Devuelve la versión actual de un cliente (0 si no se modificó desde que se cargó).
+
+        Raises:
+            KeyError: Si el identificador no existe.
+        """
+        if id_cliente not in self._clientes:
+            raise KeyError(id_cliente)
+        return self._versiones.get(id_cliente, 0)
+
+    def leer(self, id_cliente: int) -> tuple:
+        """
+        Lee un cliente junto con su versión, en forma consistente.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+
+        Returns:
+            tuple: Tupla (nombre, membresia, activo, version).
+
+        Raises:
+            KeyError: Si el identificador no existe.
+        """
+        with self._franja(id_cliente):
+            nombre, membresia = self._clientes[id_cliente]
+            return nombre, membresia, id_cliente in self._activos, self._versiones.get(id_cliente, 0)
+
+    def _comprobar_version(self, id_cliente, version):
+        if version is not None and id_cliente in self._clientes:
+            actual = self._versiones.get(id_cliente, 0)
+            if actual != version:
+                raise ConflictoVersion(id_cliente, version, actual)
+
+    def _guardar(self, operacion, id_cliente, nombre, anterior, nueva):
+        with self._candado_cambios:
+            self._versiones[id_cliente] = self._versiones.get(id_cliente, 0) + 1
+            super()._guardar(operacion, id_cliente, nombre, anterior, nueva)
+
+    def registrar(self, nombre: str, membresia: Membresia, id_cliente: int = None) -> int:
+        """
+        Registra un nuevo cliente activo (ver RegistroClientes.registrar); su versión inicial es 1.
+        """
+        # La comprobación del correo y la asignación del identificador deben ser atómicas
+        with self._candado_altas:
+            return super().registrar(nombre, membresia, id_cliente)
+
+    def registrar_lote(self, clientes: list) -> list:
+        """
+        Registra varios clientes activos de una vez (ver RegistroClientes.registrar_lote).
+        """
+        with self._candado_altas:
+            return super().registrar_lote(clientes)
+
+    def cambiar_membresia(self, id_cliente: int, tipo_membresia: int, version: int = None) -> Membresia:
+        """
+        Cambia la membresía de un cliente activo según las reglas de su membresía actual.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            tipo_membresia (int): Identificador numérico del tipo de membresía deseado.
+            version (int, optional): Versión leída por el trabajador; si se indica, el cambio solo
+                                     se aplica si el cliente sigue en esa versión.
+
+        Returns:
+            Membresia: Nueva membresía, si el cambio fue exitoso.
+                        Membresía actual, si el cambio no fue exitoso.
+
+        Raises:
+            KeyError: Si el cliente no existe o no está activo.
+            ConflictoVersion: Si el cliente ya no está en la versión indicada.
+        """
+        with self._franja(id_cliente):
+            self._comprobar_version(id_cliente, version)
+            return super().cambiar_membresia(id_cliente, tipo_membresia)
+
+    def cancelar(self, id_cliente: int, version: int = None) -> Membresia:
+        """
+        Cancela la membresía de un cliente activo y lo mueve a los inactivos.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            version (int, optional): Versión leída por el trabajador (ver cambiar_membresia).
+
+        Returns:
+            Membresia: Membresía resultante de la cancelación.
+
+        Raises:
+            KeyError: Si el cliente no existe o no está activo.
+            ConflictoVersion: Si el cliente ya no está en la versión indicada.
+        """
+        with self._franja(id_cliente):
+            self._comprobar_version(id_cliente, version)
+            return super().cancelar(id_cliente)
+
+    def reactivar(self, id_cliente: int, nueva_membresia: Membresia, version: int = None) -> Membresia:
+        """
+        Reactiva a un cliente inactivo con una nueva membresía.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            nueva_membresia (Membresia): Membresía con la que se reactiva al cliente.
+            version (int, optional): Versión leída por el trabajador (ver cambiar_membresia).
+
+        Returns:
+            Membresia: Membresía asignada al cliente.
+
+        Raises:
+            KeyError: Si el cliente no existe o no está inactivo.
+            ConflictoVersion: Si el cliente ya no está en la versión indicada.
+        """
+        with self._franja(id_cliente):
+            self._comprobar_version(id_cliente, version)
+            return super().reactivar(id_cliente, nueva_membresia)
+
+    def filas(self):
+        """
+        Recorre todos los clientes como tuplas de valores simples, según una foto consistente del registro.
+
+        Yields:
+            tuple: Una tupla por cliente.
+        """
+        with self._candado_cambios:
+            filas = list(super().filas())
+        yield from filas
+
+    def activos(self):
+        """
+        Recorre los clientes que estaban activos al comenzar el recorrido.
+
+        Yields:
+            tuple: Tuplas (id_cliente, nombre, membresia).
+        """
+        for id_cliente in list(self._activos):
+            nombre, membresia = self._clientes[id_cliente]
+            yield id_cliente, nombre, membresia
+
+    def inactivos(self):
+        """
+        Recorre los clientes que estaban inactivos al comenzar el recorrido.
+
+        Yields:
+            tuple: Tuplas (id_cliente, nombre, membresia).
+        """
+        for id_cliente in list(self._inactivos):
+            nombre, membresia = self._clientes[id_cliente]
+            yield id_cliente, nombre, membresia
@@ -0,0 +1,425 @@
+"""Servicio de red asíncrono que expone las operaciones de membresías como JSON por líneas sobre TCP.
+
+Cada solicitud es una línea con un objeto JSON, por ejemplo:
+
+    {"id": 1, "op": "registrar", "nombre": "Ana Pérez", "correo": "ana@ejemplo.com",
+     "numero_tarjeta": "4111111111111111", "tipo_membresia": 2}
+
+y cada respuesta es una línea {"id": 1, "ok": true, "resultado": ...} o
+{"id": 1, "ok": false, "error": "..."}. Operaciones: registrar, buscar, listar, cambiar,
+cancelar, reactivar, establecer_contrasena, autenticar, iniciar_reproduccion, latido,
+detener_reproduccion, descargar, devolver_descarga y descargas.
+
+Con un RegistroConcurrente, cada cliente descrito incluye su "version"; cambiar, cancelar
+y reactivar aceptan un campo "version" opcional y fallan si otro trabajador modificó al
+cliente después de esa lectura.
+
+establecer_contrasena exige la contraseña vigente en "contrasena_actual" cuando el
+cliente ya tiene una.
+"""
+import argparse
+import asyncio
+import errno
+import json
+import logging
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from bitacora import Bitacora
+from registro_concurrente import RegistroConcurrente
+from formato_registros import migrar_pickle
+from boveda_tarjetas import BovedaTarjetas, cargar_clave_boveda
+from credenciales import AlmacenCredenciales, COSTO_POR_DEFECTO
+from descargas import LibroDescargas
+from indice_clientes import IndiceClientes
+from sesiones import ControlSesiones
+from unicidad import ControlUnicidad, cargar_clave_huellas
+from membresia import crear_membresia
+from validaciones import validar_nombre, validar_correo, validar_numero_tarjeta, validar_tipo_membresia
+
+LARGO_MAXIMO_LINEA = 64 * 1024
+LIMITE_LISTADO = 100
+
+_avisos = logging.getLogger(__name__)
+
+
+def _describir(id_cliente, nombre, membresia, activo):
+    """Representa un cliente como diccionario serializable en JSON."""
+    return {
+        "id": id_cliente,
+        "nombre": nombre,
+        "correo": membresia.correo,
+        "membresia": type(membresia).__name__,
+        "activo": activo,
+    }
+
+
+class ServicioMembresias:
+    """
+    Servicio asíncrono de membresías sobre un RegistroClientes.
+
+    Las modificaciones del registro se hacen en el hilo del bucle de eventos (son
+    operaciones O(1) sobre diccionarios), mientras que el trabajo bloqueante o costoso
+    (fsync de la bitácora, cifrado, hashing) se ejecuta en un grupo de hilos. Las
+    operaciones sobre un mismo suscriptor se serializan con un candado propio de ese
+    suscriptor, de modo que clientes distintos nunca esperan entre sí. La confirmación
+    en disco se agrupa: todas las operaciones que terminan mientras otro fsync está en
+    curso se confirman con el siguiente (group commit).
+    """
+
+    def __init__(self, registro, bitacora: Bitacora = None, ejecutor: ThreadPoolExecutor = None,
+                 unicidad: ControlUnicidad = None, credenciales: AlmacenCredenciales = None,
+                 descargas: LibroDescargas = None):
+        """
+        Inicializa el servicio.
+
+        Args:
+            registro (RegistroClientes): Registro de clientes.
+            bitacora (Bitacora, optional): Bitácora del registro. Debe crearse con sincronizar_cada=0,
+                                           ya que el servicio agrupa las sincronizaciones.
+            ejecutor (ThreadPoolExecutor, optional): Grupo de hilos para el trabajo bloqueante.
+            unicidad (ControlUnicidad, optional): Control de correos y tarjetas repetidos.
+            credenciales (AlmacenCredenciales, optional): Contraseñas de los suscriptores. Tiene su
+                                                          propio grupo de hilos, para que el hashing
+                                                          no demore el resto del trabajo bloqueante.
+            descargas (LibroDescargas, optional): Descargas sin conexión, ya conectado al registro.
+        """
+        self._registro = registro
+        self._versionado = isinstance(registro, RegistroConcurrente)
+        self._indice = IndiceClientes(registro)
+        self._sesiones = ControlSesiones(registro)
+        self._bitacora = bitacora
+        self._unicidad = unicidad
+        self._credenciales = credenciales
+        self._descargas = descargas
+        self._ejecutor = ejecutor or ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4))
+        self._candados = weakref.WeakValueDictionary()
+        self._sincronizacion = None
+        self._operaciones = {
+            "registrar": self.registrar,
+            "buscar": self.buscar,
+            "listar": self.listar,
+            "cambiar": self.cambiar,
+            "cancelar": self.cancelar,
+            "reactivar": self.reactivar,
+            "establecer_contrasena": self.establecer_contrasena,
+            "autenticar": self.autenticar,
+            "iniciar_reproduccion": self.iniciar_reproduccion,
+            "latido": self.latido,
+            "detener_reproduccion": self.detener_reproduccion,
+            "descargar": self.descargar,
+            "devolver_descarga": self.devolver_descarga,
+            "descargas": self.listar_descargas,
+        }
+
+    def _candado(self, clave):
+        """Devuelve el candado del suscriptor; se libera solo cuando nadie lo usa."""
+        candado = self._candados.get(clave)
+        if candado is None:
+            candado = asyncio.Lock()
+            self._candados[clave] = candado
+        return candado
+
+    async def en_hilo(self, funcion, *args):
+        """
+        Ejecuta trabajo bloqueante o intensivo en CPU fuera del bucle de eventos.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._ejecutor, funcion, *args)
+
+    async def _confirmar(self):
+        """Espera a que las operaciones ya escritas en la bitácora lleguen al disco."""
+        if self._bitacora is None:
+            return
+        if self._sincronizacion is None:
+            self._sincronizacion = asyncio.ensure_future(self._sincronizar())
+        await asyncio.shield(self._sincronizacion)
+
+    async def _sincronizar(self):
+        # Cede el control una vez para que las operaciones listas en esta vuelta del bucle
+        # se escriban antes y compartan el mismo fsync
+        await asyncio.sleep(0)
+        self._sincronizacion = None
+        descriptor = self._bitacora.vaciar()
+        try:
+            await self.en_hilo(os.fsync, descriptor)
+        except OSError as error:
+            # Si una compactación cerró el archivo, la instantánea ya quedó sincronizada
+            if error.errno != errno.EBADF:
+                raise
+
+    def _cliente(self, id_cliente):
+        nombre, membresia = self._registro.obtener(id_cliente)
+        cliente = _describir(id_cliente, nombre, membresia, self._registro.esta_activo(id_cliente))
+        if self._versionado:
+            cliente["version"] = self._registro.version(id_cliente)
+        return cliente
+
+    def _version(self, solicitud):
+        """Devuelve la versión esperada de la solicitud como argumento para el registro, si se indicó."""
+        version = solicitud.get("version")
+        if version is None:
+            return {}
+        if not self._versionado:
+            raise ValueError("El registro no maneja versiones.")
+        return {"version": int(version)}
+
+    async def registrar(self, solicitud):
+        """Registra un cliente nuevo."""
+        nombre = validar_nombre(str(solicitud.get("nombre", "")))
+        correo = validar_correo(str(solicitud.get("correo", "")))
+        numero_tarjeta = validar_numero_tarjeta(str(solicitud.get("numero_tarjeta", "")))
+        tipo_membresia = validar_tipo_membresia(solicitud.get("tipo_membresia"))
+        async with self._candado(("correo", correo)):
+            if self._unicidad is not None:
+                # La reserva es atómica, por lo que dos registros concurrentes con la misma
+                # tarjeta y distinto correo no pueden aceptarse ambos
+                self._unicidad.reservar(correo, numero_tarjeta)
+            try:
+                tarjeta = numero_tarjeta
+                boveda = self._registro.boveda
+                if boveda is not None:
+                    # La bóveda escribe y sincroniza a disco cada tarjeta nueva; se tokeniza en un
+                    # hilo para que el registro no haga esa escritura en el bucle de eventos
+                    tarjeta = await self.en_hilo(boveda.tokenizar, numero_tarjeta)
+                id_cliente = self._registro.registrar(nombre, crear_membresia(tipo_membresia, correo, tarjeta))
+            except (ValueError, OSError):
+                if self._unicidad is not None:
+                    self._unicidad.liberar(correo, numero_tarjeta)
+                raise
+            await self._confirmar()
+        return self._cliente(id_cliente)
+
+    async def buscar(self, solicitud):
+        """Busca un cliente por identificador o por correo."""
+        id_cliente = solicitud.get("id_cliente")
+        if id_cliente is None:
+            id_cliente = self._registro.buscar_por_correo(str(solicitud.get("correo", "")))
+            if id_cliente is None:
+                raise KeyError("No existe un cliente con ese correo.")
+        return self._cliente(int(id_cliente))
+
+    async def listar(self, solicitud):
+        """
+        Lista una página de clientes filtrada por estado, tipo de membresía y dominio.
+
+        El campo "desde" recibe el cursor "siguiente" de la página anterior; "activos"
+        puede ser null para listar clientes en cualquier estado.
+        """
+        desde = int(solicitud.get("desde", 0))
+        limite = max(1, min(int(solicitud.get("limite", LIMITE_LISTADO)), LIMITE_LISTADO))
+        activos = solicitud.get("activos", True)
+        tipo = solicitud.get("tipo_membresia")
+        dominio = solicitud.get("dominio")
+        pagina = self._indice.pagina(desde, limite, tipo=None if tipo is None else int(tipo),
+                                     activo=None if activos is None else bool(activos),
+                                     dominio=None if dominio is None else str(dominio))
+        return {
+            "clientes": [_describir(id_cliente, nombre, membresia, self._registro.esta_activo(id_cliente))
+                         for id_cliente, nombre, membresia in pagina.clientes],
+            "siguiente": pagina.siguiente,
+        }
+
+    async def cambiar(self, solicitud):
+        """Cambia la membresía de un cliente activo."""
+        id_cliente = int(solicitud["id_cliente"])
+        tipo_membresia = validar_tipo_membresia(solicitud.get("tipo_membresia"))
+        async with self._candado(("id", id_cliente)):
+            _, membresia_actual = self._registro.obtener(id_cliente)
+            if self._registro.cambiar_membresia(id_cliente, tipo_membresia,
+                                                **self._version(solicitud)) is membresia_actual:
+                raise ValueError("Cambio de membresía no válido.")
+            await self._confirmar()
+        return self._cliente(id_cliente)
+
+    async def cancelar(self, solicitud):
+        """Cancela la membresía de un cliente activo."""
+        id_cliente = int(solicitud["id_cliente"])
+        async with self._candado(("id", id_cliente)):
+            self._registro.cancelar(id_cliente, **self._version(solicitud))
+            await self._confirmar()
+        return self._cliente(id_cliente)
+
+    async def reactivar(self, solicitud):
+        """Reactiva a un cliente inactivo con un nuevo tipo de membresía."""
+        id_cliente = int(solicitud["id_cliente"])
+        tipo_membresia = validar_tipo_membresia(solicitud.get("tipo_membresia"))
+        async with self._candado(("id", id_cliente)):
+            _, membresia_actual = self._registro.obtener(id_cliente)
+            nueva_membresia = crear_membresia(tipo_membresia, membresia_actual.correo, membresia_actual.numero_tarjeta)
+            self._registro.reactivar(id_cliente, nueva_membresia, **self._version(solicitud))
+            await self._confirmar()
+        return self._cliente(id_cliente)
+
+    def _credenciales_activas(self):
+        if self._credenciales is None:
+            raise ValueError("El servicio no tiene credenciales configuradas.")
+        return self._credenciales
+
+    async def establecer_contrasena(self, solicitud):
+        """
+        Establece la contraseña de un cliente.
+
+        Si el cliente ya tiene contraseña, la solicitud debe incluirla en "contrasena_actual";
+        de lo contrario cualquiera podría reemplazarla y autenticarse como ese cliente.
+        """
+        credenciales = self._credenciales_activas()
+        id_cliente = int(solicitud["id_cliente"])
+        self._registro.obtener(id_cliente)
+        async with self._candado(("contrasena", id_cliente)):
+            if id_cliente in credenciales and not await credenciales.verificar_async(
+                    id_cliente, str(solicitud.get("contrasena_actual", ""))):
+                raise ValueError("Credenciales inválidas.")
+            await credenciales.establecer_async(id_cliente, str(solicitud.get("contrasena", "")))
+        return {"id": id_cliente}
+
+    async def autenticar(self, solicitud):
+        """Verifica la contraseña de un cliente identificado por id_cliente o por correo."""
+        credenciales = self._credenciales_activas()
+        id_cliente = solicitud.get("id_cliente")
+        if id_cliente is None:
+            # Un correo desconocido se verifica igual (contra un hash ficticio) para no revelar si existe
+            id_cliente = self._registro.buscar_por_correo(str(solicitud.get("correo", "")))
+        valido = await credenciales.verificar_async(-1 if id_cliente is None else int(id_cliente),
+                                                    str(solicitud.get("contrasena", "")))
+        if not valido:
+            raise ValueError("Credenciales inválidas.")
+        return self._cliente(int(id_cliente))
+
+    async def iniciar_reproduccion(self, solicitud):
+        """Admite una reproducción si el cliente no superó el límite de dispositivos de su membresía."""
+        id_cliente = int(solicitud["id_cliente"])
+        id_sesion = self._sesiones.iniciar(id_cliente, str(solicitud.get("dispositivo", "")))
+        return {"sesion": id_sesion, "activas": self._sesiones.activas(id_cliente)}
+
+    async def latido(self, solicitud):
+        """Mantiene viva una sesión de reproducción."""
+        if not self._sesiones.latido(int(solicitud["sesion"])):
+            raise KeyError("La sesión venció o no existe.")
+        return {"sesion": int(solicitud["sesion"])}
+
+    async def detener_reproduccion(self, solicitud):
+        """Termina una sesión de reproducción."""
+        return {"detenida": self._sesiones.detener(int(solicitud["sesion"]))}
+
+    def _descargas_activas(self):
+        if self._descargas is None:
+            raise ValueError("El servicio no tiene descargas sin conexión configuradas.")
+        return self._descargas
+
+    async def descargar(self, solicitud):
+        """Registra la descarga de un título si la membresía tiene cuota disponible."""
+        descargas = self._descargas_activas()
+        id_cliente = int(solicitud["id_cliente"])
+        vencimiento = descargas.descargar(id_cliente, str(solicitud.get("dispositivo", "")),
+                                          str(solicitud.get("titulo", "")))
+        return {"vence": vencimiento, "cantidad": descargas.cantidad(id_cliente)}
+
+    async def devolver_descarga(self, solicitud):
+        """Elimina una descarga y libera su lugar en la cuota."""
+        devuelta = self._descargas_activas().devolver(int(solicitud["id_cliente"]),
+                                                      str(solicitud.get("dispositivo", "")),
+                                                      str(solicitud.get("titulo", "")))
+        return {"devuelta": devuelta}
+
+    async def listar_descargas(self, solicitud):
+        """Lista los títulos que un dispositivo puede conservar sin conexión."""
+        titulos = self._descargas_activas().disponibles(int(solicitud["id_cliente"]),
+                                                         str(solicitud.get("dispositivo", "")))
+        return {"titulos": [{"titulo": titulo, "vence": vencimiento} for titulo, vencimiento in titulos]}
+
+    async def atender_solicitud(self, linea: bytes) -> dict:
+        """
+        Procesa una línea de solicitud y devuelve la respuesta.
+        """
+        try:
+            solicitud = json.loads(linea)
+            if not isinstance(solicitud, dict):
+                raise ValueError("La solicitud debe ser un objeto JSON.")
+        except ValueError as error:
+            return {"id": None, "ok": False, "error": f"Solicitud inválida: {error}"}
+
+        respuesta = {"id": solicitud.get("id")}
+        operacion = self._operaciones.get(solicitud.get("op"))
+        if operacion is None:
+            respuesta.update(ok=False, error=f"Operación desconocida: {solicitud.get('op')}")
+            return respuesta
+        try:
+            respuesta.update(ok=True, resultado=await operacion(solicitud))
+        except KeyError as error:
+            respuesta.update(ok=False, error=str(error.args[0]) if error.args else "Cliente no encontrado.")
+        except (TypeError, ValueError) as error:
+            respuesta.update(ok=False, error=str(error))
+        except Exception:
+            # Un error inesperado (p. ej. de disco) no debe cerrar la conexión del cliente
+            _avisos.exception("Error al atender la operación %s.", solicitud.get("op"))
+            respuesta.update(ok=False, error="Error interno del servicio.")
+        return respuesta
+
+    async def atender_conexion(self, lector: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        """
+        Atiende las solicitudes de una conexión hasta que el cliente la cierre.
+        """
+        try:
+            while True:
+                try:
+                    linea = await lector.readline()
+                except ValueError:
+                    # La línea superó LARGO_MAXIMO_LINEA
+                    break
+                if not linea:
+                    break
+                if not linea.strip():
+                    continue
+                respuesta = await self.atender_solicitud(linea)
+                escritor.write(json.dumps(respuesta, ensure_ascii=False).encode("utf-8") + b"\n")
+                await escritor.drain()
+        except ConnectionError:
+            pass
+        finally:
+            escritor.close()
+
+    async def servir(self, host: str = "127.0.0.1", puerto: int = 8765):
+        """
+        Inicia el servidor TCP y atiende conexiones indefinidamente.
+        """
+        servidor = await asyncio.start_server(self.atender_conexion, host, puerto, limit=LARGO_MAXIMO_LINEA,
+                                              backlog=4096)
+        async with servidor:
+            await servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--costo-bcrypt", type=int, default=COSTO_POR_DEFECTO,
+                        help="factor de costo de bcrypt; las contraseñas se actualizan al verificarse")
+    args = parser.parse_args()
+
+    migrar_pickle("datos_clientes.pkl", "datos_clientes.dat")
+    # La compactación se hace en un hilo propio para no detener el bucle de eventos
+    bitacora = Bitacora("datos_clientes.log", "datos_clientes.dat", sincronizar_cada=0, compactar_cada=10000,
+                        compactar_en_segundo_plano=True)
+    registro = bitacora.cargar(RegistroConcurrente)
+    boveda = BovedaTarjetas("boveda_tarjetas.bin", cargar_clave_boveda("clave_boveda.bin"))
+    if registro.proteger_tarjetas(boveda):
+        bitacora.compactar()
+    unicidad = ControlUnicidad.cargar("datos_clientes.unq", cargar_clave_huellas("clave_huellas.bin"))
+    unicidad.conectar(registro)
+    credenciales = AlmacenCredenciales("credenciales.json", costo=args.costo_bcrypt)
+    descargas = LibroDescargas("descargas_sin_conexion.log")
+    descargas.conectar(registro)
+    servicio = ServicioMembresias(registro, bitacora, unicidad=unicidad, credenciales=credenciales,
+                                  descargas=descargas)
+    print(f"Servicio de membresías escuchando en {args.host}:{args.puerto}")
+    try:
+        asyncio.run(servicio.servir(args.host, args.puerto))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bitacora.cerrar()
+        unicidad.guardar("datos_clientes.unq")
+        credenciales.cerrar()
+        descargas.cerrar()
+        boveda.cerrar()
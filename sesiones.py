@@ -0,0 +1,203 @@
+import itertools
+import math
+import threading
+import time
+
+DURACION_POR_DEFECTO = 90.0
+RESOLUCION_POR_DEFECTO = 1.0
+
+
+class _Sesion:
+    """Sesión de reproducción activa."""
+
+    __slots__ = ("id_cliente", "dispositivo", "vencimiento", "ranura")
+
+    def __init__(self, id_cliente, dispositivo, vencimiento, ranura):
+        self.id_cliente = id_cliente
+        self.dispositivo = dispositivo
+        self.vencimiento = vencimiento
+        self.ranura = ranura
+
+
+class ControlSesiones:
+    """
+    Control de admisión de reproducciones según el límite de dispositivos de cada membresía.
+
+    Cada reproducción abre una sesión que el dispositivo mantiene viva con latidos; una
+    sesión sin latidos durante la duración configurada vence y libera su lugar. Admitir,
+    latir y detener cuestan O(1): la cantidad de sesiones de un cliente se obtiene de su
+    índice por dispositivo, y el límite, de su membresía.
+
+    Los vencimientos se llevan en una rueda de tiempo (timing wheel): un arreglo circular
+    de ranuras, cada una de `resolucion` segundos, que cubre una duración completa. Cada
+    sesión está en una sola ranura; un latido solo actualiza su vencimiento, y cuando la
+    rueda pasa por la ranura, la sesión vence o se mueve a la ranura de su nuevo
+    vencimiento. Así nunca se recorren todas las sesiones, y la memoria es proporcional a
+    las sesiones activas. Una sesión puede vencer hasta `resolucion` segundos tarde.
+    """
+
+    def __init__(self, registro, duracion: float = DURACION_POR_DEFECTO, resolucion: float = RESOLUCION_POR_DEFECTO,
+                 reloj=time.monotonic):
+        """
+        Inicializa el control y se suscribe a los cambios del registro.
+
+        Args:
+            registro (RegistroClientes): Registro de clientes.
+            duracion (float): Segundos sin latidos tras los cuales una sesión vence.
+            resolucion (float): Segundos que cubre cada ranura de la rueda de tiempo.
+            reloj (callable): Función que devuelve el instante actual en segundos.
+        """
+        self._registro = registro
+        self._duracion = duracion
+        self._resolucion = resolucion
+        self._reloj = reloj
+        self._ranuras = [set() for _ in range(math.ceil(duracion / resolucion) + 1)]
+        self._tic = self._tic_de(reloj())
+        self._sesiones = {}
+        self._por_cliente = {}
+        self._ids = itertools.count(1)
+        self._candado = threading.Lock()
+        self.vencidas = 0
+        self.rechazadas = 0
+        registro.suscribir(self.registrar_evento)
+
+    def __len__(self):
+        return len(self._sesiones)
+
+    def _tic_de(self, instante):
+        return int(instante // self._resolucion)
+
+    def _programar(self, id_sesion, sesion):
+        sesion.ranura = self._ranuras[self._tic_de(sesion.vencimiento) % len(self._ranuras)]
+        sesion.ranura.add(id_sesion)
+
+    def _quitar(self, id_sesion):
+        sesion = self._sesiones.pop(id_sesion)
+        sesion.ranura.discard(id_sesion)
+        dispositivos = self._por_cliente[sesion.id_cliente]
+        del dispositivos[sesion.dispositivo]
+        if not dispositivos:
+            del self._por_cliente[sesion.id_cliente]
+
+    def _avanzar(self, ahora):
+        """Procesa las ranuras que la rueda dejó atrás desde la última operación."""
+        objetivo = self._tic_de(ahora)
+        if objetivo - self._tic > len(self._ranuras):
+            # El reloj saltó más de una vuelta: basta con revisar cada ranura una vez
+            self._tic = objetivo - len(self._ranuras)
+        while self._tic < objetivo:
+            ranura = self._ranuras[self._tic % len(self._ranuras)]
+            for id_sesion in list(ranura):
+                sesion = self._sesiones[id_sesion]
+                if sesion.vencimiento <= ahora:
+                    self._quitar(id_sesion)
+                    self.vencidas += 1
+                else:
+                    ranura.discard(id_sesion)
+                    self._programar(id_sesion, sesion)
+            self._tic += 1
+
+    def iniciar(self, id_cliente: int, dispositivo: str) -> int:
+        """
+        Admite una reproducción en un dispositivo del cliente.
+
+        Si el dispositivo ya tiene una sesión, se renueva y se devuelve la misma, sin ocupar
+        otro lugar.
+
+        Args:
+            id_cliente (int): Identificador del cliente.
+            dispositivo (str): Identificador del dispositivo.
+
+        Returns:
+            int: Identificador de la sesión.
+
+        Raises:
+            KeyError: Si el cliente no existe o no está activo.
+            ValueError: Si el cliente ya usa todos los dispositivos de su membresía.
+        """
+        if not self._registro.esta_activo(id_cliente):
+            raise KeyError(f"No existe un cliente activo con identificador {id_cliente}.")
+        _, membresia = self._registro.obtener(id_cliente)
+        with self._candado:
+            ahora = self._reloj()
+            self._avanzar(ahora)
+            dispositivos = self._por_cliente.get(id_cliente)
+            if dispositivos is None:
+                dispositivos = self._por_cliente[id_cliente] = {}
+            id_sesion = dispositivos.get(dispositivo)
+            if id_sesion is not None:
+                self._sesiones[id_sesion].vencimiento = ahora + self._duracion
+                return id_sesion
+            if len(dispositivos) >= membresia._dispositivos:
+                self.rechazadas += 1
+                raise ValueError(f"Se alcanzó el límite de {membresia._dispositivos} dispositivo(s) "
+                                 f"de la membresía {type(membresia).__name__}.")
+            id_sesion = next(self._ids)
+            sesion = _Sesion(id_cliente, dispositivo, ahora + self._duracion, None)
+            self._sesiones[id_sesion] = sesion
+            dispositivos[dispositivo] = id_sesion
+            self._programar(id_sesion, sesion)
+            return id_sesion
+
+    def latido(self, id_sesion: int) -> bool:
+        """
+        Mantiene viva una sesión.
+
+        Args:
+            id_sesion (int): Identificador de la sesión.
+
+        Returns:
+            bool: True si la sesión seguía activa; False si ya venció o no existe.
+        """
+        with self._candado:
+            ahora = self._reloj()
+            self._avanzar(ahora)
+            sesion = self._sesiones.get(id_sesion)
+            if sesion is None:
+                return False
+            sesion.vencimiento = ahora + self._duracion
+            return True
+
+    def detener(self, id_sesion: int) -> bool:
+        """
+        Termina una sesión y libera su lugar.
+
+        Args:
+            id_sesion (int): Identificador de la sesión.
+
+        Returns:
+            bool: True si la sesión estaba activa.
+        """
+        with self._candado:
+            self._avanzar(self._reloj())
+            if id_sesion not in self._sesiones:
+                return False
+            self._quitar(id_sesion)
+            return True
+
+    def activas(self, id_cliente: int) -> int:
+        """
+        Devuelve la cantidad de sesiones activas de un cliente.
+        """
+        with self._candado:
+            self._avanzar(self._reloj())
+            return len(self._por_cliente.get(id_cliente, ()))
+
+    def registrar_evento(self, operacion, id_cliente, nombre, anterior, nueva):
+        """
+        Termina las sesiones de un cliente cuya membresía se cancela. Se usa como oyente del registro.
+
+        Un cambio a una membresía con menos dispositivos no corta las sesiones en curso; el
+        nuevo límite se aplica a las reproducciones siguientes.
+        """
+        if operacion != "cancelar":
+            return
+        with self._candado:
+            for id_sesion in list(self._por_cliente.get(id_cliente, {}).values()):
+                self._quitar(id_sesion)
+
+    def cerrar(self):
+        """
+        Deja de seguir los cambios del registro.
+        """
+        self._registro.desuscribir(self.registrar_evento)
@@ -0,0 +1,73 @@
+import numpy as np
+
+from membresia import TIPOS_MEMBRESIA
+
+CANTIDAD_TIPOS = len(TIPOS_MEMBRESIA)
+
+
+def _derivar_tablas():
+    """
+    Deriva las tablas de transición consultando las reglas de cada clase de membresía.
+
+    Returns:
+        tuple: (matriz de cambios permitidos, tabla de resultados de cambio, resultados de cancelación,
+                días de regalo por tipo).
+    """
+    permitidos = np.zeros((CANTIDAD_TIPOS, CANTIDAD_TIPOS), dtype=bool)
+    resultados = np.zeros((CANTIDAD_TIPOS, CANTIDAD_TIPOS), dtype=np.int8)
+    cancelaciones = np.zeros(CANTIDAD_TIPOS, dtype=np.int8)
+    dias_regalo = np.zeros(CANTIDAD_TIPOS, dtype=np.uint16)
+
+    for origen, clase in TIPOS_MEMBRESIA.items():
+        membresia = clase("", "")
+        dias_regalo[origen] = getattr(membresia, "_dias_regalo", 0)
+        for destino in TIPOS_MEMBRESIA:
+            nueva_membresia = membresia.cambiar_membresia(destino)
+            permitidos[origen, destino] = nueva_membresia is not membresia
+            resultados[origen, destino] = nueva_membresia._codigo
+        cancelaciones[origen] = membresia.cancelar_membresia()._codigo
+
+    for tabla in (permitidos, resultados, cancelaciones, dias_regalo):
+        tabla.setflags(write=False)
+    return permitidos, resultados, cancelaciones, dias_regalo
+
+
+# MATRIZ_TRANSICIONES[origen, destino] indica si cambiar_membresia(destino) acepta el cambio
+# para una membresía de tipo origen; RESULTADOS_TRANSICION guarda el tipo resultante.
+MATRIZ_TRANSICIONES, RESULTADOS_TRANSICION, RESULTADOS_CANCELACION, DIAS_REGALO = _derivar_tablas()
+
+
+def aplicar_transicion(codigos, tipo_destino) -> tuple:
+    """
+    Aplica un cambio de membresía a un arreglo de tipos, con la misma semántica que cambiar_membresia.
+
+    Args:
+        codigos (np.ndarray): Tipos de membresía actuales (0 a 4).
+        tipo_destino (int | np.ndarray): Tipo solicitado, para todos o uno por suscriptor.
+                                         Los tipos fuera de rango se rechazan.
+
+    Returns:
+        tuple: (nuevos códigos, máscara de aceptados, máscara de rechazados).
+    """
+    codigos = np.asarray(codigos)
+    destinos = np.broadcast_to(np.asarray(tipo_destino), codigos.shape)
+    en_rango = (destinos >= 0) & (destinos < CANTIDAD_TIPOS)
+    destinos_validos = np.where(en_rango, destinos, 0)
+
+    aceptados = en_rango & MATRIZ_TRANSICIONES[codigos, destinos_validos]
+    nuevos = np.where(aceptados, RESULTADOS_TRANSICION[codigos, destinos_validos], codigos).astype(codigos.dtype)
+    return nuevos, aceptados, ~aceptados
+
+
+def aplicar_cancelacion(codigos) -> np.ndarray:
+    """
+    Aplica cancelar_membresia a un arreglo de tipos.
+
+    Args:
+        codigos (np.ndarray): Tipos de membresía actuales.
+
+    Returns:
+        np.ndarray: Tipos resultantes de la cancelación.
+    """
+    codigos = np.asarray(codigos)
+    return RESULTADOS_CANCELACION[codigos].astype(codigos.dtype)
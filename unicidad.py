@@ -0,0 +1,465 @@
+import hashlib
+import hmac
+import math
+import os
+import struct
+import threading
+
+import numpy as np
+
+from boveda_tarjetas import es_token
+
+MAGIA = b"SMUQ"
+VERSION_UNICIDAD = 1
+# Cabecera: magia, versión, mayor identificador incluido, verificador de la clave
+_CABECERA = struct.Struct("<4sBQ8s")
+# Conjunto: bits del filtro, funciones hash, cantidad de huellas
+_CONJUNTO = struct.Struct("<QQQ")
+_MASCARA_64 = (1 << 64) - 1
+
+
+def cargar_clave_huellas(ruta: str = "clave_huellas.bin") -> bytes:
+    """
+    Carga la clave secreta de las huellas; si no existe, la genera con permisos restringidos.
+
+    Args:
+        ruta (str): Archivo de la clave.
+
+    Returns:
+        bytes: Clave de 32 bytes.
+    """
+    if not os.path.exists(ruta):
+        descriptor = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, "wb") as archivo:
+            archivo.write(os.urandom(32))
+    with open(ruta, "rb") as archivo:
+        return archivo.read()
+
+
+class FiltroBloom:
+    """
+    Filtro de Bloom sobre huellas de 128 bits.
+
+    Responde "seguro que no está" o "puede estar". Las posiciones se obtienen por doble
+    hashing a partir de las dos mitades de la huella, que ya es uniforme por venir de HMAC.
+    Las consultas individuales se calculan con enteros de Python y las cargas masivas con
+    NumPy sobre el mismo búfer.
+    """
+
+    def __init__(self, capacidad: int, tasa_falsos_positivos: float = 0.01, bits: bytearray = None,
+                 funciones: int = None):
+        """
+        Inicializa un filtro vacío dimensionado para una capacidad, o uno existente.
+
+        Args:
+            capacidad (int): Cantidad de elementos esperada.
+            tasa_falsos_positivos (float): Tasa de falsos positivos deseada a plena capacidad.
+            bits (bytearray, optional): Búfer de un filtro existente.
+            funciones (int, optional): Cantidad de funciones hash de un filtro existente.
+        """
+        if bits is None:
+            capacidad = max(capacidad, 1024)
+            cantidad_bits = math.ceil(-capacidad * math.log(tasa_falsos_positivos) / math.log(2) ** 2)
+            bits = bytearray((cantidad_bits + 7) // 8)
+            funciones = max(1, round(cantidad_bits / capacidad * math.log(2)))
+        self._bits = bits
+        self._cantidad_bits = len(bits) * 8
+        self._funciones = funciones
+        self._capacidad = capacidad
+
+    @property
+    def capacidad(self) -> int:
+        """
+        Devuelve la cantidad de elementos para la que fue dimensionado el filtro.
+        """
+        return self._capacidad
+
+    def _posiciones(self, alta, baja):
+        # Se reduce módulo 2**64 para coincidir con la aritmética de uint64 de agregar_lote()
+        return [((alta + i * baja) & _MASCARA_64) % self._cantidad_bits for i in range(self._funciones)]
+
+    def agregar(self, alta: int, baja: int):
+        """
+        Agrega una huella dada por sus mitades alta y baja.
+        """
+        bits = self._bits
+        for posicion in self._posiciones(alta, baja):
+            bits[posicion >> 3] |= 1 << (posicion & 7)
+
+    def agregar_lote(self, altas: np.ndarray, bajas: np.ndarray):
+        """
+        Agrega muchas huellas, dadas como arreglos uint64 de mitades altas y bajas.
+        """
+        funciones = np.arange(self._funciones, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            posiciones = ((altas[:, None] + bajas[:, None] * funciones) % np.uint64(self._cantidad_bits)).reshape(-1)
+        np.bitwise_or.at(np.frombuffer(self._bits, dtype=np.uint8), posiciones >> np.uint64(3),
+                         np.left_shift(1, posiciones & np.uint64(7)).astype(np.uint8))
+
+    def contiene(self, alta: int, baja: int) -> bool:
+        """
+        Indica si una huella puede estar en el filtro.
+        """
+        bits = self._bits
+        return all(bits[posicion >> 3] & (1 << (posicion & 7)) for posicion in self._posiciones(alta, baja))
+
+
+class ConjuntoHuellas:
+    """
+    Conjunto de huellas de 128 bits con un filtro de Bloom delante de un índice exacto.
+
+    El índice exacto son dos arreglos ordenados (mitad alta y baja) más un conjunto con
+    las huellas agregadas desde la última vez que se guardó. La mayoría de las consultas
+    por elementos nuevos se resuelven con el filtro, sin tocar el índice exacto.
+    """
+
+    def __init__(self, capacidad: int = 100_000, tasa_falsos_positivos: float = 0.01):
+        """
+        Inicializa un conjunto vacío.
+
+        Args:
+            capacidad (int): Cantidad de huellas esperada; el filtro se redimensiona al superarla.
+            tasa_falsos_positivos (float): Tasa de falsos positivos del filtro.
+        """
+        self._tasa = tasa_falsos_positivos
+        self._filtro = FiltroBloom(capacidad, tasa_falsos_positivos)
+        self._altas = np.zeros(0, dtype=np.uint64)
+        self._bajas = np.zeros(0, dtype=np.uint64)
+        self._nuevas = set()
+        self.consultas_exactas = 0
+
+    def __len__(self):
+        return len(self._altas) + len(self._nuevas)
+
+    def __contains__(self, huella):
+        alta, baja = huella
+        if not self._filtro.contiene(alta, baja):
+            return False
+        self.consultas_exactas += 1
+        if huella in self._nuevas:
+            return True
+        inicio = np.searchsorted(self._altas, np.uint64(alta), side="left")
+        fin = np.searchsorted(self._altas, np.uint64(alta), side="right")
+        return bool(np.any(self._bajas[inicio:fin] == np.uint64(baja)))
+
+    def agregar(self, huella):
+        """
+        Agrega una huella (alta, baja). Debe llamarse solo si la huella no está en el conjunto.
+        """
+        self._nuevas.add(huella)
+        self._filtro.agregar(*huella)
+        if len(self) > self._filtro.capacidad:
+            self._consolidar()
+            self._reconstruir_filtro(2 * len(self))
+
+    def agregar_lote(self, huellas: list):
+        """
+        Agrega muchas huellas (alta, baja) de una vez, incorporándolas directamente al índice ordenado.
+        """
+        if not huellas:
+            return
+        self._nuevas.update(huellas)
+        self._consolidar()
+        if len(self) > self._filtro.capacidad:
+            self._reconstruir_filtro(2 * len(self))
+        else:
+            nuevas = np.array(huellas, dtype=np.uint64).reshape(-1, 2)
+            self._filtro.agregar_lote(nuevas[:, 0].copy(), nuevas[:, 1].copy())
+
+    def quitar(self, huella):
+        """
+        Quita una huella del índice exacto; el filtro conserva sus bits (solo aumenta los falsos positivos).
+        """
+        if huella in self._nuevas:
+            self._nuevas.discard(huella)
+            return
+        coincidencias = np.flatnonzero((self._altas == np.uint64(huella[0])) & (self._bajas == np.uint64(huella[1])))
+        self._altas = np.delete(self._altas, coincidencias)
+        self._bajas = np.delete(self._bajas, coincidencias)
+
+    def _consolidar(self):
+        """Incorpora las huellas nuevas a los arreglos ordenados."""
+        if not self._nuevas:
+            return
+        nuevas = np.array(sorted(self._nuevas), dtype=np.uint64).reshape(-1, 2)
+        altas = np.concatenate([self._altas, nuevas[:, 0]])
+        bajas = np.concatenate([self._bajas, nuevas[:, 1]])
+        orden = np.lexsort((bajas, altas))
+        self._altas, self._bajas = altas[orden], bajas[orden]
+        self._nuevas.clear()
+
+    def _reconstruir_filtro(self, capacidad):
+        self._filtro = FiltroBloom(capacidad, self._tasa)
+        self._filtro.agregar_lote(self._altas, self._bajas)
+
+    def a_bytes(self) -> bytes:
+        """
+        Serializa el filtro y el índice exacto.
+        """
+        self._consolidar()
+        return (_CONJUNTO.pack(len(self._filtro._bits) * 8, self._filtro._funciones, len(self._altas))
+                + bytes(self._filtro._bits) + self._altas.astype("<u8").tobytes()
+                + self._bajas.astype("<u8").tobytes())
+
+    @classmethod
+    def desde_bytes(cls, datos, posicion: int = 0, tasa_falsos_positivos: float = 0.01) -> tuple:
+        """
+        Reconstruye un conjunto serializado con a_bytes, sin recalcular el filtro.
+
+        Returns:
+            tuple: (conjunto, posición siguiente en los datos).
+        """
+        cantidad_bits, funciones, cantidad = _CONJUNTO.unpack_from(datos, posicion)
+        posicion += _CONJUNTO.size
+        bits = bytearray(datos[posicion:posicion + cantidad_bits // 8])
+        posicion += cantidad_bits // 8
+        altas = np.frombuffer(datos, dtype="<u8", count=cantidad, offset=posicion).astype(np.uint64)
+        posicion += 8 * cantidad
+        bajas = np.frombuffer(datos, dtype="<u8", count=cantidad, offset=posicion).astype(np.uint64)
+        posicion += 8 * cantidad
+
+        conjunto = cls.__new__(cls)
+        conjunto._tasa = tasa_falsos_positivos
+        capacidad = math.floor(-cantidad_bits * math.log(2) ** 2 / math.log(tasa_falsos_positivos))
+        conjunto._filtro = FiltroBloom(capacidad, tasa_falsos_positivos, bits, funciones)
+        conjunto._altas = altas
+        conjunto._bajas = bajas
+        conjunto._nuevas = set()
+        conjunto.consultas_exactas = 0
+        return conjunto, posicion
+
+
+class ControlUnicidad:
+    """
+    Control de unicidad de correos y tarjetas de los clientes.
+
+    Los correos (normalizados a minúsculas) y los números de tarjeta nunca se guardan en
+    claro: se guarda una huella HMAC-SHA256 con una clave secreta, truncada a 128 bits.
+    Cada tipo de dato tiene su propio ConjuntoHuellas, y el control se persiste junto a
+    los datos de los clientes para no tener que recalcular las huellas al iniciar.
+
+    Todas las operaciones están protegidas por un candado, por lo que comprobar y
+    reservar un correo y una tarjeta es atómico aun con registros concurrentes.
+    """
+
+    def __init__(self, clave: bytes, capacidad: int = 100_000, tasa_falsos_positivos: float = 0.01):
+        """
+        Inicializa un control vacío.
+
+        Args:
+            clave (bytes): Clave secreta de las huellas (ver cargar_clave_huellas).
+            capacidad (int): Cantidad de clientes esperada.
+            tasa_falsos_positivos (float): Tasa de falsos positivos de los filtros de Bloom.
+        """
+        self._clave = clave
+        self._tasa = tasa_falsos_positivos
+        self._correos = ConjuntoHuellas(capacidad, tasa_falsos_positivos)
+        self._tarjetas = ConjuntoHuellas(capacidad, tasa_falsos_positivos)
+        self._hasta_id = 0
+        self._boveda = None
+        self._candado = threading.Lock()
+
+    def _verificador(self):
+        return hmac.new(self._clave, b"verificador", hashlib.sha256).digest()[:8]
+
+    @classmethod
+    def cargar(cls, ruta: str, clave: bytes, tasa_falsos_positivos: float = 0.01) -> 'ControlUnicidad':
+        """
+        Carga un control guardado con guardar(); si el archivo no existe, devuelve uno vacío.
+
+        Args:
+            ruta (str): Archivo del control.
+            clave (bytes): Clave secreta con la que se calcularon las huellas.
+            tasa_falsos_positivos (float): Tasa de falsos positivos de los filtros de Bloom.
+
+        Returns:
+            ControlUnicidad: Control cargado.
+
+        Raises:
+            ValueError: Si el archivo no tiene el formato esperado o fue creado con otra clave.
+        """
+        control = cls(clave, tasa_falsos_positivos=tasa_falsos_positivos)
+        if not os.path.exists(ruta):
+            return control
+        with open(ruta, "rb") as archivo:
+            datos = archivo.read()
+        magia, version, hasta_id, verificador = _CABECERA.unpack_from(datos, 0)
+        if magia != MAGIA or version != VERSION_UNICIDAD:
+            raise ValueError(f"{ruta} no es un archivo de unicidad válido (versión {VERSION_UNICIDAD}).")
+        if not hmac.compare_digest(verificador, control._verificador()):
+            raise ValueError(f"{ruta} fue creado con otra clave de huellas.")
+        control._hasta_id = hasta_id
+        control._correos, posicion = ConjuntoHuellas.desde_bytes(datos, _CABECERA.size, tasa_falsos_positivos)
+        control._tarjetas, _ = ConjuntoHuellas.desde_bytes(datos, posicion, tasa_falsos_positivos)
+        return control
+
+    def guardar(self, ruta: str):
+        """
+        Guarda el control en forma atómica (archivo temporal y reemplazo).
+
+        Args:
+            ruta (str): Archivo de destino.
+        """
+        with self._candado:
+            contenido = (_CABECERA.pack(MAGIA, VERSION_UNICIDAD, self._hasta_id, self._verificador())
+                         + self._correos.a_bytes() + self._tarjetas.a_bytes())
+        temporal = ruta + ".tmp"
+        with open(temporal, "wb") as archivo:
+            archivo.write(contenido)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(temporal, ruta)
+
+    def _huella(self, texto):
+        resumen = hmac.digest(self._clave, texto.encode("utf-8"), "sha256")
+        return int.from_bytes(resumen[:8], "little"), int.from_bytes(resumen[8:16], "little")
+
+    def huella_tarjeta(self, numero_tarjeta: str) -> tuple:
+        """
+        Calcula la huella de un número de tarjeta.
+
+        Args:
+            numero_tarjeta (str): Número de tarjeta.
+
+        Returns:
+            tuple: Mitades (alta, baja) de la huella de 128 bits.
+        """
+        if es_token(numero_tarjeta):
+            # Las huellas se calculan siempre sobre el número en claro, con o sin bóveda
+            numero_tarjeta = self._revelar(numero_tarjeta)
+        return self._huella("tarjeta:" + numero_tarjeta.strip())
+
+    def _revelar(self, token):
+        if self._boveda is None:
+            raise ValueError("Se necesita la bóveda de tarjetas para calcular la huella de un token.")
+        return self._boveda.revelar(token)
+
+    def huella_correo(self, correo: str) -> tuple:
+        """
+        Calcula la huella de un correo normalizado.
+
+        Args:
+            correo (str): Correo electrónico.
+
+        Returns:
+            tuple: Mitades (alta, baja) de la huella de 128 bits.
+        """
+        return self._huella("correo:" + correo.strip().lower())
+
+    def correo_registrado(self, correo: str) -> bool:
+        """
+        Indica si un correo ya está registrado (sin distinguir mayúsculas).
+        """
+        huella = self.huella_correo(correo)
+        with self._candado:
+            return huella in self._correos
+
+    def tarjeta_registrada(self, numero_tarjeta: str) -> bool:
+        """
+        Indica si un número de tarjeta ya está registrado.
+        """
+        huella = self.huella_tarjeta(numero_tarjeta)
+        with self._candado:
+            return huella in self._tarjetas
+
+    def _reservar(self, huella_correo, huella_tarjeta):
+        if huella_correo in self._correos:
+            return "El correo electrónico ya está registrado."
+        if huella_tarjeta in self._tarjetas:
+            return "El número de tarjeta ya está registrado."
+        self._correos.agregar(huella_correo)
+        self._tarjetas.agregar(huella_tarjeta)
+        return None
+
+    def reservar(self, correo: str, numero_tarjeta: str):
+        """
+        Comprueba y reserva en una sola operación atómica un correo y una tarjeta.
+
+        Args:
+            correo (str): Correo electrónico.
+            numero_tarjeta (str): Número de tarjeta.
+
+        Raises:
+            ValueError: Si el correo o la tarjeta ya están registrados.
+        """
+        huellas = self.huella_correo(correo), self.huella_tarjeta(numero_tarjeta)
+        with self._candado:
+            motivo = self._reservar(*huellas)
+        if motivo:
+            raise ValueError(motivo)
+
+    def reservar_lote(self, pares: list) -> list:
+        """
+        Reserva varios pares (correo, numero_tarjeta) tomando el candado una sola vez.
+
+        Los repetidos dentro del mismo lote también se rechazan.
+
+        Args:
+            pares (list): Tuplas (correo, numero_tarjeta).
+
+        Returns:
+            list: Por cada par, None si se reservó o el motivo del rechazo.
+        """
+        huellas = [(self.huella_correo(correo), self.huella_tarjeta(numero)) for correo, numero in pares]
+        with self._candado:
+            return [self._reservar(*par) for par in huellas]
+
+    def liberar(self, correo: str, numero_tarjeta: str):
+        """
+        Libera una reserva cuyo registro no llegó a concretarse.
+        """
+        huellas = self.huella_correo(correo), self.huella_tarjeta(numero_tarjeta)
+        with self._candado:
+            self._correos.quitar(huellas[0])
+            self._tarjetas.quitar(huellas[1])
+
+    def conectar(self, registro):
+        """
+        Incorpora los clientes registrados después del último guardado y se suscribe a los nuevos registros.
+
+        Solo se recorren los identificadores posteriores al mayor incluido en el archivo,
+        por lo que no se recalculan las huellas de todo el registro al iniciar.
+
+        Args:
+            registro (RegistroClientes): Registro de clientes. Si tokeniza las tarjetas, se usa su bóveda.
+        """
+        self._boveda = getattr(registro, "boveda", None)
+        correos = []
+        numeros = []
+        for id_cliente in range(self._hasta_id + 1, registro._siguiente_id):
+            if id_cliente in registro:
+                _, membresia = registro.obtener(id_cliente)
+                correos.append(self.huella_correo(membresia.correo))
+                numeros.append(membresia.numero_tarjeta)
+                self._hasta_id = id_cliente
+        if self._boveda is not None:
+            numeros = self._boveda.revelar_lote(numeros)
+        tarjetas = [self.huella_tarjeta(numero) for numero in numeros]
+        with self._candado:
+            # Los datos anteriores a este control pueden tener repetidos; se guardan una sola vez
+            self._correos.agregar_lote([huella for huella in dict.fromkeys(correos) if huella not in self._correos])
+            self._tarjetas.agregar_lote([huella for huella in dict.fromkeys(tarjetas) if huella not in self._tarjetas])
+        registro.suscribir(self.registrar_evento)
+
+    def registrar_evento(self, operacion, id_cliente, nombre, anterior, nueva):
+        """
+        Incorpora los clientes registrados por otras vías. Se usa como oyente del registro.
+
+        Args:
+            operacion (str): "registrar", "cambiar", "cancelar" o "reactivar".
+            id_cliente (int): Identificador del cliente modificado.
+            nombre (str): Nombre del cliente.
+            anterior (Membresia): Membresía previa (None al registrar).
+            nueva (Membresia): Membresía resultante.
+        """
+        if operacion != "registrar":
+            return
+        huella_correo = self.huella_correo(nueva.correo)
+        huella_tarjeta = self.huella_tarjeta(nueva.numero_tarjeta)
+        with self._candado:
+            # Si el cliente ya se había reservado con reservar(), las huellas ya están presentes
+            if huella_correo not in self._correos:
+                self._correos.agregar(huella_correo)
+            if huella_tarjeta not in self._tarjetas:
+                self._tarjetas.agregar(huella_tarjeta)
+            self._hasta_id = max(self._hasta_id, id_cliente)
@@ -0,0 +1,135 @@
+def validar_nombre(nombre: str, campo: str = "El nombre", opcional: bool = False) -> str:
+    """
+    Valida un nombre o apellido.
+
+    Args:
+        nombre (str): Texto ingresado.
+        campo (str): Descripción del campo usada en los mensajes de error.
+        opcional (bool): Si es True, se acepta un texto vacío.
+
+    Returns:
+        str: El nombre validado.
+
+    Raises:
+        ValueError: Si el nombre está vacío (y no es opcional) o contiene caracteres que no son letras o espacios.
+    """
+    if nombre.strip() == "":
+        if opcional:
+            return nombre
+        raise ValueError(f"{campo} no puede estar vacío.")
+    if not all(c.isalpha() or c.isspace() for c in nombre):
+        raise ValueError(f"{campo} solo debe contener letras y espacios.")
+    return nombre
+
+
+def validar_correo(correo: str) -> str:
+    """
+    Valida un correo electrónico.
+
+    Args:
+        correo (str): Correo ingresado.
+
+    Returns:
+        str: El correo validado.
+
+    Raises:
+        ValueError: Si el correo no cumple el formato esperado.
+    """
+    if correo.strip() == "":
+        raise ValueError("El correo electrónico no puede estar vacío.")
+    if len(correo) < 6 or "@" not in correo:
+        raise ValueError("El correo electrónico debe tener al menos 6 caracteres e incluir '@'.")
+    arroba = correo.index("@")
+    punto = correo.find(".", arroba)
+    if punto == -1 or punto <= arroba + 1:
+        raise ValueError("El correo electrónico debe tener un '.' al menos dos posiciones después del '@'.")
+    if " " in correo:
+        raise ValueError("El correo electrónico no puede contener espacios.")
+    if not correo.isprintable():
+        raise ValueError("El correo electrónico no puede contener caracteres de control.")
+    return correo
+
+
+def luhn_valido(numero: str) -> bool:
+    """
+    Verifica el dígito verificador de un número de tarjeta con el algoritmo de Luhn.
+
+    Args:
+        numero (str): Número de tarjeta compuesto solo por dígitos.
+
+    Returns:
+        bool: True si el dígito verificador es correcto.
+    """
+    suma = 0
+    for posicion, caracter in enumerate(reversed(numero)):
+        digito = ord(caracter) - 48
+        if posicion % 2 == 1:
+            digito *= 2
+            if digito > 9:
+                digito -= 9
+        suma += digito
+    return suma % 10 == 0
+
+
+def validar_numero_tarjeta(numero_tarjeta: str) -> str:
+    """
+    Valida un número de tarjeta de 16 dígitos.
+
+    Args:
+        numero_tarjeta (str): Número ingresado.
+
+    Returns:
+        str: El número validado.
+
+    Raises:
+        ValueError: Si el número está vacío, no tiene 16 dígitos o su dígito verificador es incorrecto.
+    """
+    if numero_tarjeta.strip() == "":
+        raise ValueError("El número de tarjeta no puede estar vacío.")
+    if not numero_tarjeta.isdigit() or len(numero_tarjeta) != 16 or not numero_tarjeta.isascii():
+        raise ValueError("El número de tarjeta debe tener 16 dígitos sin espacios.")
+    if not luhn_valido(numero_tarjeta):
+        raise ValueError("El número de tarjeta no es válido (dígito verificador incorrecto).")
+    return numero_tarjeta
+
+
+def validar_tipo_membresia(tipo_membresia) -> int:
+    """
+    Valida el tipo de membresía elegido al registrar o reactivar un cliente.
+
+    Args:
+        tipo_membresia (int | str): Identificador numérico del tipo de membresía (1 a 4).
+
+    Returns:
+        int: El tipo de membresía como entero.
+
+    Raises:
+        ValueError: Si no es un número o está fuera del rango 1 a 4.
+    """
+    try:
+        tipo_membresia = int(tipo_membresia)
+    except (TypeError, ValueError):
+        raise ValueError("Ingresa un número válido.") from None
+    if not 1 <= tipo_membresia <= 4:
+        raise ValueError("Tipo de membresía inválido.")
+    return tipo_membresia
+
+
+def validar_contrasena(contrasena: str) -> str:
+    """
+    Valida una contraseña de suscriptor.
+
+    Args:
+        contrasena (str): Contraseña ingresada.
+
+    Returns:
+        str: La contraseña validada.
+
+    Raises:
+        ValueError: Si tiene menos de 8 caracteres o más de 72 bytes (el límite de bcrypt).
+    """
+    if len(contrasena) < 8:
+        raise ValueError("La contraseña debe tener al menos 8 caracteres.")
+    if len(contrasena.encode("utf-8")) > 72:
+        raise ValueError("La contraseña no puede superar los 72 bytes.")
+    return contrasena